@@ -1,3 +1,20 @@
-from .rclone import router as RcloneRouter
-from .wireguard import router as WireGuardRouter
-from .restapi import app
+import importlib
+
+# routers load through the plugin registry; importing api alone must not pull in every feature
+_exports = {
+    "WireGuardRouter": (".wireguard", "router"),
+    "RcloneRouter": (".rclone", "router"),
+    "app": (".restapi", "app"),
+}
+
+
+def __getattr__(name: str):
+    if (target := _exports.get(name, None)) is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(target[0], __name__), target[1])
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted([*globals(), *_exports])
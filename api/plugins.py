@@ -0,0 +1,67 @@
+import importlib
+from typing import Callable
+from fastapi import APIRouter
+from utils import Settings, StartupProfile
+
+
+class Plugin:
+    def __init__(self, name: str, router: APIRouter, prefix: str, state: str, manager: str = None,
+                 tags: list[str] = None, order: int = 100) -> None:
+        self.name = name
+        self.router = router
+        self.prefix = prefix
+        self.state = state
+        self.manager_path = manager
+        self.tags = tags if tags is not None else [name]
+        # lower orders restore first and shut down last
+        self.order = order
+        self.__manager = None
+
+    @property
+    def manager(self) -> Callable | None:
+        if self.manager_path is None:
+            return None
+        if self.__manager is None:
+            module, _, attr = self.manager_path.partition(":")
+            with StartupProfile.phase("import", module):
+                self.__manager = getattr(importlib.import_module(module), attr)
+        return self.__manager
+
+
+class PluginRegistry:
+    BUILTIN = {
+        "wireguard": "api.wireguard",
+        "rclone": "api.rclone",
+    }
+
+    def __init__(self, names: str | list[str] = None) -> None:
+        names = Settings.PLUGINS if names is None else names
+        if isinstance(names, str):
+            names = [x.strip() for x in names.split(",")]
+        self.names = [x for x in names if x]
+        self.__plugins = None
+
+    def __load(self, name: str) -> Plugin:
+        # builtins by short name, anything else as an importable module defining `plugin`
+        module = self.BUILTIN.get(name, name)
+        with StartupProfile.phase("import", module):
+            try:
+                plugin = importlib.import_module(module).plugin
+            except ModuleNotFoundError as e:
+                e.add_note(f"Unknown plugin [ {name} ], expected one of {', '.join(self.BUILTIN)} or an importable module")
+                raise e
+            except AttributeError as e:
+                raise ValueError(f"Module [ {module} ] does not define a plugin") from e
+        return plugin
+
+    @property
+    def plugins(self) -> list[Plugin]:
+        if self.__plugins is None:
+            self.__plugins = sorted([self.__load(name) for name in self.names], key=lambda x: x.order)
+        return self.__plugins
+
+    def __iter__(self):
+        return iter(self.plugins)
+
+    def __contains__(self, name: str) -> bool:
+        return any(x.name == name for x in self.plugins)
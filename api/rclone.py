@@ -1,47 +1,152 @@
-from fastapi import APIRouter, Request, HTTPException
-from .response import PostResponse, GetResponse, HttpCodes as codes
+import time
+from fastapi import APIRouter, Request, Response, HTTPException, Query
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from .plugins import Plugin
+from .response import (
+    PostResponse, GetResponse, StatusResponse, StatsResponse, BatchResponse, JobResponse, RcloneOp, PrewarmRequest,
+    HttpCodes as codes, batch_result, error_detail, resolve, split_tags, sse, status_response,
+)
+from core import BatchRunner, RcloneProfile
+from utils import Settings
 
 
 router = APIRouter()
 
 @router.post("/add", response_model=PostResponse, status_code=201)
-def add(request: Request, remote_name: str, mount_path: str, automount: bool = False) -> dict:
+async def add(request: Request, remote_name: str, mount_path: str, automount: bool = False, profile: str = None, tags: str = None,
+              prewarm: str = None, prewarm_contents: bool = False) -> dict:
     try:
-        request.app.state.rcm.add(remote_name=remote_name, mount_path=mount_path)
+        await resolve(request.app.state.rcm.add(remote_name=remote_name, mount_path=mount_path, profile=profile, tags=split_tags(tags),
+                                                prewarm=split_tags(prewarm), prewarm_contents=prewarm_contents))
         if automount:
-            retval = mount(request=request, remote_name=remote_name)
+            retval = await mount(request=request, remote_name=remote_name)
             retval["action"] = "add"
             return retval
         else:
             return {"action": "add", "message": f"Remote [ {remote_name} ] added"}
     except KeyError as e:
         raise HTTPException(status_code=codes.CONFLICT, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=codes.BAD_REQUEST, detail=str(e))
 
 @router.post("/mount", response_model=PostResponse, status_code=200)
-def mount(request: Request, remote_name: str) -> dict:
+async def mount(request: Request, remote_name: str) -> dict:
     try:
-        request.app.state.rcm[remote_name].mount()
-        return {"action": "mount", "message": f"Drive [ {remote_name} ] mounted"}
+        latency = await request.app.state.rcm.amount(remote_name)
+        return {"action": "mount", "message": f"Drive [ {remote_name} ] mounted", "latency": latency}
     except KeyError as e:
         raise HTTPException(status_code=codes.NOT_FOUND, detail=str(e))
 
 @router.post("/unmount", response_model=PostResponse, status_code=200)
-def unmount(request: Request, remote_name: str) -> dict:
+async def unmount(request: Request, remote_name: str) -> dict:
     try:
-        request.app.state.rcm[remote_name].unmount()
+        await request.app.state.rcm.aunmount(remote_name)
         return {"action": "unmount", "message": f"Drive [ {remote_name} ] unmounted"}
     except KeyError as e:
         raise HTTPException(status_code=codes.NOT_FOUND, detail=str(e))
 
 @router.post("/remove", response_model=PostResponse, status_code=201)
-def remove(request: Request, remote_name: str) -> dict:
+async def remove(request: Request, remote_name: str) -> dict:
     try:
-        request.app.state.rcm.remove(remote_name=remote_name)
+        await request.app.state.rcm.aremove(remote_name=remote_name)
         return {"action": "remove", "message": f"Drive [ {remote_name} ] removed"}
     except KeyError as e:
         raise HTTPException(status_code=codes.NOT_FOUND, detail=str(e))
 
-@router.get("/status", response_model=GetResponse, status_code=200)
-def list_drives(request: Request) -> dict:
-    drives = request.app.state.rcm.status
-    return {"action": "status", "instances": drives}
+@router.get("/status", response_model=StatusResponse, status_code=200)
+async def list_drives(request: Request, since: int = Query(None, ge=0), boot: str = None, fields: str = None,
+                      state: str = None, tag: str = None) -> Response:
+    drives, cache = await request.app.state.rcm.acached_status(state=state, tag=tag)
+    return status_response(request, "status", drives, cache, since=since, boot=boot, fields=fields, state=state, tag=tag)
+
+@router.get("/stats", response_model=StatsResponse, status_code=200)
+async def stats(request: Request, window: float = Query(300.0, gt=0), resolution: float = Query(0.0, ge=0)) -> dict:
+    instances, total = await resolve(request.app.state.rcm.stats(window=window, resolution=resolution))
+    return {"action": "stats", "instances": instances, "total": total}
+
+@router.post("/prewarm", response_model=JobResponse, status_code=202)
+async def prewarm(request: Request, job: PrewarmRequest) -> dict:
+    try:
+        status = await request.app.state.rcm.aprewarm(
+            job.remote_name, job.paths, contents=job.contents, budget=job.budget, parallelism=job.parallelism
+        )
+        return {"action": "prewarm", "job": status}
+    except KeyError as e:
+        raise HTTPException(status_code=codes.NOT_FOUND, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=codes.BAD_REQUEST, detail=str(e))
+
+@router.get("/prewarm", response_model=GetResponse, status_code=200)
+async def prewarm_jobs(request: Request, remote_name: str = None) -> dict:
+    return {"action": "prewarm", "instances": await resolve(request.app.state.rcm.prewarm_jobs(remote_name=remote_name))}
+
+@router.get("/prewarm/{job_id}", response_model=JobResponse, status_code=200)
+async def prewarm_job(request: Request, job_id: str) -> dict:
+    try:
+        return {"action": "prewarm", "job": (await resolve(request.app.state.rcm.prewarm_jobs(job_id=job_id)))[job_id]}
+    except KeyError as e:
+        raise HTTPException(status_code=codes.NOT_FOUND, detail=error_detail(e))
+
+@router.post("/prewarm/cancel", response_model=JobResponse, status_code=200)
+async def cancel_prewarm(request: Request, job_id: str) -> dict:
+    try:
+        return {"action": "cancel", "job": await request.app.state.rcm.acancel_prewarm(job_id)}
+    except KeyError as e:
+        raise HTTPException(status_code=codes.NOT_FOUND, detail=error_detail(e))
+
+@router.get("/profiles", response_model=GetResponse, status_code=200)
+async def profiles(request: Request) -> dict:
+    return {"action": "profiles", "instances": {name: profile.to_dict() for name, profile in RcloneProfile.presets().items()}}
+
+@router.post("/batch", response_model=BatchResponse, status_code=200)
+async def batch(request: Request, ops: list[RcloneOp], parallelism: int = Query(Settings.BATCH_PARALLELISM, ge=1)) -> dict:
+    async def execute(op: RcloneOp) -> dict:
+        if op.action == "add":
+            if op.mount_path is None:
+                return {"ok": False, "status": codes.BAD_REQUEST, "error": "mount_path is required for add"}
+            call = add(request=request, remote_name=op.remote_name, mount_path=op.mount_path, profile=op.profile, tags=op.tags)
+        else:
+            call = {"mount": mount, "unmount": unmount, "remove": remove}[op.action](request=request, remote_name=op.remote_name)
+        return await batch_result(call)
+
+    tic = time.perf_counter()
+    results = await BatchRunner(parallelism).run(
+        ops,
+        key=lambda op: op.remote_name,
+        execute=execute,
+        describe=lambda op: {"remote_name": op.remote_name, "action": op.action},
+    )
+    return {"action": "batch", "results": results, "elapsed": time.perf_counter() - tic}
+
+@router.get("/logs/{remote_name}", status_code=200)
+async def logs(request: Request, remote_name: str, lines: int = Query(100, ge=0), follow: bool = False):
+    rcm = request.app.state.rcm
+    try:
+        data, offset = await rcm.alogs(remote_name, lines=lines)
+        if follow and (last_id := request.headers.get("last-event-id", "")).isdigit():
+            data, offset = await rcm.alogs(remote_name, since=int(last_id))
+    except KeyError as e:
+        raise HTTPException(status_code=codes.NOT_FOUND, detail=str(e))
+    if not follow:
+        return PlainTextResponse(data.decode(errors="replace"))
+
+    async def stream():
+        nonlocal data, offset
+        while True:
+            # only complete lines are sent; the event id is the byte offset to resume from
+            pos = offset - len(data)
+            *complete, data = data.split(b"\n")
+            for line in complete:
+                pos += len(line) + 1
+                yield sse(line.decode(errors="replace"), id=pos)
+            if await request.is_disconnected():
+                return
+            chunk, latest = await rcm.alogs(remote_name, since=offset, wait=Settings.SSE_KEEPALIVE)
+            if latest == offset:
+                yield ": keepalive\n\n"
+            data, offset = data + chunk, latest
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+plugin = Plugin(name="rclone", router=router, prefix="/rclone", state="rcm", manager="core.rclone:RcloneManager", tags=["rclone"], order=20)
@@ -1,11 +1,16 @@
-from pydantic import BaseModel
+import asyncio, inspect, json, zlib
+import subprocess as sp
+from fastapi import HTTPException, Request, Response
+from pydantic import BaseModel, Field
 from argparse import Namespace
+from typing import Any, Awaitable, Literal
 
 
 HttpCodes = Namespace(**{
     "OK": 200,
     "CREATED": 201,
     "NO_CONTENT": 204,
+    "NOT_MODIFIED": 304,
     "BAD_REQUEST": 400,
     "UNAUTHORIZED": 401,
     "FORBIDDEN": 403,
@@ -13,12 +18,114 @@ HttpCodes = Namespace(**{
     "CONFLICT": 409,
     "INTERNAL_SERVER_ERROR": 500,
     "SERVICE_UNAVAILABLE": 503,
+    "GATEWAY_TIMEOUT": 504,
 })
 
 class PostResponse(BaseModel):
     action: str
     message: str
+    latency: float | None = None
 
 class GetResponse(BaseModel):
     action: str
     instances: dict
+
+class StatusResponse(GetResponse):
+    cache: dict
+    boot: str
+    generation: int
+    delta: bool
+    removed: list[str] | None = None
+
+class StatsResponse(GetResponse):
+    total: dict
+
+class JobResponse(BaseModel):
+    action: str
+    job: dict
+
+class OverlapsResponse(BaseModel):
+    action: str
+    overlaps: list[dict]
+
+class BatchResponse(BaseModel):
+    action: str
+    results: list[dict]
+    elapsed: float
+
+class WireGuardOp(BaseModel):
+    action: Literal["add", "start", "stop", "remove"]
+    config: str
+
+class RcloneOp(BaseModel):
+    action: Literal["add", "mount", "unmount", "remove"]
+    remote_name: str
+    mount_path: str | None = None
+    profile: str | None = None
+    tags: str | None = None
+
+class PrewarmRequest(BaseModel):
+    remote_name: str
+    paths: list[str]
+    contents: bool = False
+    budget: int | None = Field(None, ge=0)
+    parallelism: int | None = Field(None, ge=1)
+
+def sse(data: str, id: int | str = None, event: str = None) -> str:
+    head = (f"id: {id}\n" if id is not None else "") + (f"event: {event}\n" if event else "")
+    return head + "".join(f"data: {line}\n" for line in data.split("\n")) + "\n"
+
+def split_tags(tags: str | None) -> list[str]:
+    return [x.strip() for x in (tags or "").split(",") if x.strip()]
+
+def status_response(request: Request, action: str, instances: dict, meta: dict, since: int = None, boot: str = None,
+                    fields: str = None, state: str = None, tag: str = None) -> Response:
+    # serialised here rather than through StatusResponse: status is plain data, and validating every
+    # instance on every poll cost more than producing it
+    versions = meta["versions"]
+    selected = [x for x in (fields or "").split(",") if x]
+    filtered = state is not None or tag is not None
+    variant = f"{','.join(selected)}|{state}|{tag}|{','.join(instances) if filtered else ''}"
+    etag = f'W/"{versions["boot"]}-{versions["generation"]}' + (f'-{zlib.crc32(variant.encode()):x}"' if selected or filtered else '"')
+    matches = [x.strip() for x in request.headers.get("if-none-match", "").split(",")]
+    if etag in matches or "*" in matches:
+        return Response(status_code=HttpCodes.NOT_MODIFIED, headers={"ETag": etag})
+    # a cursor from another run, from the future, or older than the retained tombstones gets everything
+    delta = since is not None and boot in (None, versions["boot"]) and versions["floor"] <= since <= versions["generation"]
+    content = {"action": action, "boot": versions["boot"], "generation": versions["generation"], "delta": delta}
+    if delta:
+        changed = versions["instances"]
+        instances = {key: value for key, value in instances.items() if changed.get(key, 0) > since}
+        content["removed"] = [key for key, generation in versions["removed"].items() if generation > since]
+        if filtered:
+            # entries that changed and no longer match are gone from this view too
+            content["removed"] += [key for key, generation in changed.items() if generation > since and key not in instances]
+    if selected:
+        instances = {key: {x: value[x] for x in selected if x in value} for key, value in instances.items()}
+    content["instances"] = instances
+    content["cache"] = {key: value for key, value in meta.items() if key != "versions"}
+    return Response(json.dumps(content, default=str), media_type="application/json", headers={"ETag": etag})
+
+async def resolve(value: Any) -> Any:
+    # worker-mode proxies answer every manager call with an awaitable, the managers themselves answer sync calls directly
+    return await value if inspect.isawaitable(value) else value
+
+def error_detail(e: Exception) -> str:
+    return "\n".join(getattr(e, "__notes__", [])) or str(e)
+
+async def batch_result(call: Awaitable[dict]) -> dict:
+    try:
+        return await call
+    except HTTPException as e:
+        return {"ok": False, "status": e.status_code, "error": e.detail}
+    except sp.CalledProcessError as e:
+        return {"ok": False, "status": HttpCodes.INTERNAL_SERVER_ERROR, "error": error_detail(e)}
+    except sp.TimeoutExpired as e:
+        return {"ok": False, "status": HttpCodes.GATEWAY_TIMEOUT, "error": error_detail(e)}
+    except ConnectionError as e:
+        return {"ok": False, "status": HttpCodes.SERVICE_UNAVAILABLE, "error": error_detail(e)}
+    except (asyncio.TimeoutError, TimeoutError) as e:
+        return {"ok": False, "status": HttpCodes.GATEWAY_TIMEOUT, "error": error_detail(e) or "timed out"}
+    except Exception as e:
+        # one item's failure stays with that item; the rest of the batch has already run
+        return {"ok": False, "status": HttpCodes.INTERNAL_SERVER_ERROR, "error": error_detail(e) or type(e).__name__}
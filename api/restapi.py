@@ -1,18 +1,135 @@
-from fastapi import FastAPI
-from contextlib import asynccontextmanager
+import asyncio, json, signal, time
+import subprocess as sp
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from contextlib import asynccontextmanager, AsyncExitStack
 
-from api import WireGuardRouter, RcloneRouter
-from core import WireGuardManager, RcloneManager
+from api.plugins import PluginRegistry
+from api.response import HttpCodes as codes, error_detail, sse
+from core import StatusCache, CommandRunner, StateJournal, EventBus, Coordinator, CoordinatorClient
+from utils import Settings, Histogram, MetricsRegistry, StartupProfile
+
+
+ROUTE_SECONDS = Histogram("delos_http_request_seconds", "API request latency", ("method", "route", "status"))
 
 
+@asynccontextmanager
+async def managers(plugins: PluginRegistry):
+    cache = StatusCache(ttl=Settings.STATUS_TTL)
+    runner = CommandRunner(concurrency=Settings.SUBPROCESS_CONCURRENCY, timeout=Settings.COMMAND_TIMEOUT)
+    journal = StateJournal(Settings.STATE_PATH) if Settings.STATE_PATH is not None else None
+    events = EventBus(Settings.EVENT_HISTORY)
+    plugins = [x for x in plugins if x.manager is not None]
+    async with AsyncExitStack() as stack:
+        managed = {"events": events}
+        for plugin in plugins:
+            with StartupProfile.phase("init", plugin.name):
+                managed[plugin.state] = await stack.enter_async_context(
+                    plugin.manager(cache=cache, runner=runner, journal=journal, events=events)
+                )
+        # plugins restore in order (tunnels first: remotes may only be reachable through them)
+        for plugin in plugins:
+            with StartupProfile.phase("restore", plugin.name):
+                await managed[plugin.state].arestore()
+        yield managed
+        # one budget for the whole teardown, in reverse order so pending writes can still reach remotes over the tunnels
+        deadline = time.monotonic() + Settings.SHUTDOWN_DEADLINE
+        for plugin in reversed(plugins):
+            await managed[plugin.state].ashutdown(deadline)
+        if journal is not None:
+            await asyncio.to_thread(journal.flush)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    with WireGuardManager() as wgm, RcloneManager() as rcm:
-        app.state.wgm = wgm
-        app.state.rcm = rcm
+    if Settings.COORDINATOR_SOCKET is not None:
+        # worker mode: the coordinator process owns the managers, app.state holds proxies to them
+        async with CoordinatorClient(Settings.COORDINATOR_SOCKET, Settings.SNAPSHOT_PATH) as client:
+            app.state.events = client.proxy("events")
+            for plugin in app.state.plugins:
+                if plugin.manager_path is not None:
+                    setattr(app.state, plugin.state, client.proxy(plugin.state))
+            StartupProfile.ready()
+            yield
+        return
+    async with managers(app.state.plugins) as managed:
+        for state, manager in managed.items():
+            setattr(app.state, state, manager)
+        StartupProfile.ready()
         yield
 
 
+def coordinate(socket_path: str, snapshot_path: str = None, ready=None) -> None:
+    async def serve() -> None:
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(signum, stop.set)
+        async with managers(PluginRegistry()) as managed:
+            await Coordinator(managed, socket_path, snapshot_path).aserve(stop, ready=ready.set if ready is not None else None)
+
+    asyncio.run(serve())
+
+
 app = FastAPI(lifespan=lifespan)
-app.include_router(WireGuardRouter, prefix="/vpn", tags=["vpn"])
-app.include_router(RcloneRouter, prefix="/rclone", tags=["rclone"])
+app.state.plugins = PluginRegistry()
+for plugin in app.state.plugins:
+    app.include_router(plugin.router, prefix=plugin.prefix, tags=plugin.tags)
+
+
+@app.middleware("http")
+async def observe_latency(request: Request, call_next):
+    tic = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route", None)
+    ROUTE_SECONDS.labels(
+        request.method, route.path if route is not None else "<unmatched>", str(response.status_code)
+    ).observe(time.perf_counter() - tic)
+    return response
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics() -> PlainTextResponse:
+    return PlainTextResponse(MetricsRegistry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/startup", include_in_schema=False)
+async def startup() -> dict:
+    return {"plugins": [x.name for x in app.state.plugins], **StartupProfile.report()}
+
+
+@app.get("/events", tags=["events"])
+async def events(request: Request, since: int = None, source: str = None) -> StreamingResponse:
+    bus = request.app.state.events
+    if (last_id := request.headers.get("last-event-id", "")).isdigit():
+        since = int(last_id)
+    # pin "from now on" before the response starts so nothing published in between is missed
+    cursor = (await bus.aread(since))["latest"] if since is None else since
+
+    async def stream():
+        nonlocal cursor
+        while True:
+            result = await bus.aread(cursor, Settings.SSE_KEEPALIVE)
+            if result["gap"]:
+                # the history no longer reaches back to the cursor; clients re-read status and carry on from here
+                yield sse(json.dumps({"since": cursor, "latest": result["latest"]}), event="reset")
+            for event in result["events"]:
+                if source is None or event["source"] == source:
+                    yield sse(json.dumps(event), id=event["seq"], event=event["type"])
+            if not result["events"]:
+                yield ": keepalive\n\n"
+            cursor = result["latest"]
+            if await request.is_disconnected():
+                return
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.exception_handler(sp.CalledProcessError)
+async def command_failed(request: Request, e: sp.CalledProcessError) -> JSONResponse:
+    return JSONResponse(status_code=codes.INTERNAL_SERVER_ERROR, content={"detail": error_detail(e)})
+
+@app.exception_handler(sp.TimeoutExpired)
+async def command_timed_out(request: Request, e: sp.TimeoutExpired) -> JSONResponse:
+    return JSONResponse(status_code=codes.GATEWAY_TIMEOUT, content={"detail": error_detail(e)})
+
+@app.exception_handler(ConnectionError)
+async def backend_unreachable(request: Request, e: ConnectionError) -> JSONResponse:
+    return JSONResponse(status_code=codes.SERVICE_UNAVAILABLE, content={"detail": error_detail(e)})
@@ -1,15 +1,22 @@
-from fastapi import APIRouter, Request, HTTPException
-from .response import PostResponse, GetResponse, HttpCodes as codes
+import time
+from fastapi import APIRouter, Request, Response, HTTPException, Query
+from .plugins import Plugin
+from .response import (
+    PostResponse, GetResponse, StatusResponse, BatchResponse, OverlapsResponse, WireGuardOp,
+    HttpCodes as codes, batch_result, resolve, split_tags, status_response,
+)
+from core import BatchRunner
+from utils import Settings
 
 
 router = APIRouter()
 
 @router.post("/add", response_model=PostResponse, status_code=201)
-def add(request: Request, config: str, autostart: bool = False) -> dict:
+async def add(request: Request, config: str, autostart: bool = False, tags: str = None) -> dict:
     try:
-        request.app.state.wgm.add(config=config)
+        await resolve(request.app.state.wgm.add(config=config, tags=split_tags(tags)))
         if autostart:
-            retval = start(request=request, config=config)
+            retval = await start(request=request, config=config)
             retval["action"] = "add"
             return retval
         else:
@@ -18,29 +25,64 @@ def add(request: Request, config: str, autostart: bool = False) -> dict:
         raise HTTPException(status_code=codes.CONFLICT, detail=str(e))
 
 @router.post("/start", response_model=PostResponse, status_code=200)
-def start(request: Request, config: str) -> dict:
+async def start(request: Request, config: str) -> dict:
     try:
-        request.app.state.wgm.start(config=config)
+        await request.app.state.wgm.astart(config=config)
         return {"action": "start", "message": f"VPN [ {config} ] started."}
     except KeyError as e:
         raise HTTPException(status_code=codes.NOT_FOUND, detail=str(e))
 
 @router.post("/stop", response_model=PostResponse, status_code=200)
-def stop(request: Request, config: str) -> dict:
+async def stop(request: Request, config: str) -> dict:
     try:
-        request.app.state.wgm.stop(config=config)
+        await request.app.state.wgm.astop(config=config)
         return {"action": "stop", "message": f"VPN [ {config} ] stopped."}
     except KeyError as e:
         raise HTTPException(status_code=codes.NOT_FOUND, detail=str(e))
 
 @router.post("/remove", response_model=PostResponse, status_code=201)
-def remove(request: Request, config: str) -> dict:
+async def remove(request: Request, config: str) -> dict:
     try:
-        request.app.state.wgm.remove(config=config)
+        await request.app.state.wgm.aremove(config=config)
         return {"action": "remove", "message": f"VPN [ {config} ] removed."}
     except KeyError as e:
         raise HTTPException(status_code=codes.NOT_FOUND, detail=str(e))
 
-@router.get("/status", response_model=GetResponse, status_code=200)
-def status(request: Request) -> dict:
-    return {"action": "status", "instances": request.app.state.wgm.status}
+@router.get("/status", response_model=StatusResponse, status_code=200)
+async def status(request: Request, since: int = Query(None, ge=0), boot: str = None, fields: str = None,
+                 state: str = None, tag: str = None) -> Response:
+    instances, cache = await request.app.state.wgm.acached_status(state=state, tag=tag)
+    return status_response(request, "status", instances, cache, since=since, boot=boot, fields=fields, state=state, tag=tag)
+
+@router.get("/stats", response_model=GetResponse, status_code=200)
+async def stats(request: Request, window: float = Query(300.0, gt=0), resolution: float = Query(0.0, ge=0)) -> dict:
+    return {"action": "stats", "instances": await resolve(request.app.state.wgm.stats(window=window, resolution=resolution))}
+
+@router.get("/route", response_model=GetResponse, status_code=200)
+async def route(request: Request, ip: str) -> dict:
+    try:
+        return {"action": "route", "instances": await resolve(request.app.state.wgm.route(ip))}
+    except KeyError as e:
+        raise HTTPException(status_code=codes.NOT_FOUND, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=codes.BAD_REQUEST, detail=str(e))
+
+@router.get("/overlaps", response_model=OverlapsResponse, status_code=200)
+async def overlaps(request: Request) -> dict:
+    return {"action": "overlaps", "overlaps": await resolve(request.app.state.wgm.overlaps())}
+
+@router.post("/batch", response_model=BatchResponse, status_code=200)
+async def batch(request: Request, ops: list[WireGuardOp], parallelism: int = Query(Settings.BATCH_PARALLELISM, ge=1)) -> dict:
+    routes = {"add": add, "start": start, "stop": stop, "remove": remove}
+
+    tic = time.perf_counter()
+    results = await BatchRunner(parallelism).run(
+        ops,
+        key=lambda op: op.config,
+        execute=lambda op: batch_result(routes[op.action](request=request, config=op.config)),
+        describe=lambda op: {"config": op.config, "action": op.action},
+    )
+    return {"action": "batch", "results": results, "elapsed": time.perf_counter() - tic}
+
+
+plugin = Plugin(name="wireguard", router=router, prefix="/vpn", state="wgm", manager="core.wireguard:WireGuardManager", tags=["vpn"], order=10)
@@ -0,0 +1,72 @@
+#!/usr/bin/python
+
+import sys
+sys.dont_write_bytecode = True
+
+import json
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils import (
+    Format, LogParent as log,
+    CliArgs,
+)
+
+
+def load(path: str) -> tuple[dict, dict]:
+    data = json.loads(Path(path).read_text())
+    rows = {(r["mode"], r["instances"], r["concurrency"], r["endpoint"]): r for r in data["results"]}
+    return data["meta"], rows
+
+
+def delta(base: float, new: float) -> float:
+    return (new - base) / base if base else 0.0
+
+
+def arg_defs() -> CliArgs:
+    cliargs = CliArgs(args_width = 50, total_width = 150)
+    cliargs.description = f"{Format.BOLD}{Format.DARK_GREEN}Delos Benchmark Comparison{Format.END}"
+    cliargs.epilog = f"Exits non-zero when any shared row regressed past the threshold."
+
+    args = cliargs.add_arg_group("Arguments")
+    args.add_argument("base", type=str, help="Baseline result file")
+    args.add_argument("new", type=str, help="Result file to compare against the baseline")
+    args.add_argument("-t", "--threshold", type=float, default=0.10, help="Relative change counted as a regression")
+    args.add_argument("-a", "--all", action="store_true", help="Show unchanged rows too")
+
+    return cliargs
+
+def main(args) -> int:
+    base_meta, base = load(args.base)
+    new_meta, new = load(args.new)
+    log.info(f"{Format.BOLD}{base_meta.get('commit')} -> {new_meta.get('commit')}{Format.END}", called_name="compare")
+
+    regressions = 0
+    header = "{:<7} {:>5} {:>4}  {:<22} {:>10} {:>10} {:>8}  {:>10} {:>10} {:>8}  {:>9} {:>9} {:>8}".format(
+        "mode", "inst", "conc", "endpoint", "p50 base", "p50 new", "", "p99 base", "p99 new", "", "rps base", "rps new", ""
+    )
+    log.info(header, called_name="compare")
+    for key in sorted(base.keys() & new.keys()):
+        b, n = base[key], new[key]
+        changes = (delta(b["p50_ms"], n["p50_ms"]), delta(b["p99_ms"], n["p99_ms"]), delta(b["throughput_rps"], n["throughput_rps"]))
+        # latency going up or throughput going down is worse
+        worse = changes[0] > args.threshold or changes[1] > args.threshold or changes[2] < -args.threshold
+        better = changes[0] < -args.threshold and changes[1] < args.threshold and changes[2] > -args.threshold
+        regressions += worse
+        if not (worse or better or args.all):
+            continue
+        color = Format.RED if worse else Format.GREEN if better else ""
+        log.info("{}{:<7} {:>5} {:>4}  {:<22} {:>10.2f} {:>10.2f} {:>+7.0%}  {:>10.2f} {:>10.2f} {:>+7.0%}  {:>9.1f} {:>9.1f} {:>+7.0%}{}".format(
+            color, *key, b["p50_ms"], n["p50_ms"], changes[0], b["p99_ms"], n["p99_ms"], changes[1],
+            b["throughput_rps"], n["throughput_rps"], changes[2], Format.END if color else "",
+        ), called_name="compare")
+
+    for key in sorted(base.keys() ^ new.keys()):
+        log.warning(f"{' '.join(map(str, key))} only in {'base' if key in base else 'new'}", called_name="compare")
+    log.info(f"{regressions} regression(s) over {args.threshold:.0%}", called_name="compare")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    args, nargs, kwargs = arg_defs().parse_args()
+    sys.exit(main(args))
@@ -0,0 +1,58 @@
+import base64, json, os, sys, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import ThreadingUnixStreamServer
+
+# stand-in for `rclone rcd`: answers the rc calls delos makes, keeping mounts in memory; given unix://PATH it is
+# the private listener of a single `rclone mount` instead. Like rclone, it wants RCLONE_RC_USER/PASS when set
+DELAY = float(os.environ.get("BENCH_LAT_RC", "0") or 0)
+AUTH = "Basic " + base64.b64encode(f"{os.environ['RCLONE_RC_USER']}:{os.environ.get('RCLONE_RC_PASS', '')}".encode()).decode() \
+    if os.environ.get("RCLONE_RC_USER") else None
+mounts = {}
+single = False
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_POST(self) -> None:
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        method, status, reply = self.path.strip("/"), 200, {}
+        if DELAY:
+            time.sleep(DELAY)
+        if AUTH is not None and self.headers.get("Authorization") != AUTH:
+            status, reply = 401, {"error": "authentication required"}
+        elif method == "mount/mount":
+            mounts[body["mountPoint"]] = body["fs"]
+        elif method == "mount/unmount":
+            if mounts.pop(body["mountPoint"], None) is None:
+                status, reply = 500, {"error": f"mount point {body['mountPoint']} not found"}
+        elif method == "mount/listmounts":
+            reply = {"mountPoints": [{"Fs": fs, "MountPoint": path} for path, fs in mounts.items()]}
+        elif method == "core/stats":
+            # server-wide, as in rcd: nothing is ever transferred here
+            reply = {"bytes": 0, "transfers": 0, "errors": 0, "transferring": [], "lastError": ""}
+        elif method == "vfs/stats":
+            if not single and (fs := body.get("fs", None)) not in mounts.values():
+                status, reply = 500, {"error": f"no VFS found with name {fs!r}"}
+            else:
+                reply = {"inUse": 1, "diskCache": {
+                    "bytesUsed": 4096, "files": 1, "uploadsQueued": 0, "uploadsInProgress": 0, "outOfSpace": False,
+                }}
+        data = json.dumps(reply).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def address_string(self) -> str:
+        return "local"
+
+    def log_message(self, *nargs) -> None:
+        pass
+
+
+if __name__ == "__main__":
+    if sys.argv[1].startswith("unix://"):
+        single = True
+        ThreadingUnixStreamServer(sys.argv[1].removeprefix("unix://"), Handler).serve_forever()
+    host, _, port = sys.argv[1].rpartition(":")
+    ThreadingHTTPServer((host or "127.0.0.1", int(port)), Handler).serve_forever()
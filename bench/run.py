@@ -0,0 +1,307 @@
+#!/usr/bin/python
+
+import sys
+sys.dont_write_bytecode = True
+
+import argparse, asyncio, datetime, json, os, platform, shutil, socket, subprocess, tempfile, time
+from pathlib import Path
+from urllib.parse import urlencode
+
+benchdir = Path(__file__).resolve().parent
+sys.path.insert(0, str(benchdir.parent))
+
+from utils import (
+    Format, LogParent as log,
+    CliArgs,
+)
+
+
+class InProcessClient:
+    # drives the ASGI app directly: no sockets, no HTTP parsing, just the app's own cost
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def close(self) -> None:
+        pass
+
+    async def request(self, method: str, path: str, params: dict = None, body=None) -> int:
+        data = json.dumps(body).encode() if body is not None else b""
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+            "method": method, "scheme": "http", "path": path, "raw_path": path.encode(),
+            "query_string": urlencode(params or {}).encode(), "root_path": "",
+            "headers": [(b"host", b"bench"), (b"content-type", b"application/json"), (b"content-length", str(len(data)).encode())],
+            "client": ("127.0.0.1", 0), "server": ("bench", 80), "state": {},
+        }
+        sent, status = False, None
+
+        async def receive() -> dict:
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": data, "more_body": False}
+            await asyncio.Event().wait()  # the client never disconnects early
+
+        async def send(message: dict) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+        await self.app(scope, receive, send)
+        return status
+
+
+class HttpClient:
+    # one keep-alive HTTP/1.1 connection per worker against a real uvicorn
+    def __init__(self, host: str, port: int) -> None:
+        self.host, self.port = host, port
+        self.reader = self.writer = None
+
+    async def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+
+    async def request(self, method: str, path: str, params: dict = None, body=None) -> int:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        data = json.dumps(body).encode() if body is not None else b""
+        target = path + ("?" + urlencode(params) if params else "")
+        self.writer.write(
+            f"{method} {target} HTTP/1.1\r\nHost: bench\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(data)}\r\n\r\n".encode() + data
+        )
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        length, chunked = 0, False
+        while (line := await self.reader.readline()) not in (b"\r\n", b""):
+            name, _, value = line.decode("latin-1").partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+            elif name.lower() == "transfer-encoding" and "chunked" in value:
+                chunked = True
+        if chunked:
+            while (size := int((await self.reader.readline()).strip(), 16)) > 0:
+                await self.reader.readexactly(size + 2)
+            await self.reader.readline()
+        else:
+            await self.reader.readexactly(length)
+        return status
+
+
+class Phase:
+    def __init__(self, name: str, requests: list[tuple]) -> None:
+        self.name = name
+        self.requests = requests
+
+    async def run(self, clients: list) -> dict:
+        pending = iter(self.requests)
+        latencies, errors = [], 0
+
+        async def worker(client) -> None:
+            nonlocal errors
+            for method, path, params, body in pending:
+                tic = time.perf_counter()
+                try:
+                    status = await client.request(method, path, params, body)
+                except (OSError, asyncio.IncompleteReadError, ValueError):
+                    status = None
+                latencies.append(time.perf_counter() - tic)
+                errors += status is None or status >= 400
+
+        tic = time.perf_counter()
+        await asyncio.gather(*(worker(client) for client in clients))
+        return self.summary(latencies, errors, time.perf_counter() - tic)
+
+    def summary(self, latencies: list[float], errors: int, elapsed: float) -> dict:
+        ordered = sorted(latencies)
+
+        def pct(q: float) -> float:
+            return ordered[min(len(ordered) - 1, round(q * (len(ordered) - 1)))] * 1000 if ordered else 0.0
+
+        return {
+            "endpoint": self.name,
+            "count": len(ordered),
+            "errors": errors,
+            "p50_ms": pct(0.50),
+            "p99_ms": pct(0.99),
+            "mean_ms": sum(ordered) / len(ordered) * 1000 if ordered else 0.0,
+            "max_ms": ordered[-1] * 1000 if ordered else 0.0,
+            "throughput_rps": len(ordered) / elapsed if elapsed > 0 else 0.0,
+        }
+
+
+def phases(instances: int, requests: int, mountdir: Path) -> list[Phase]:
+    configs = [f"bench{i}" for i in range(instances)]
+    remotes = [f"remote{i}" for i in range(instances)]
+
+    def each(method: str, path: str, key: str, names: list[str], extra=lambda name: {}) -> list[tuple]:
+        return [(method, path, {key: name, **extra(name)}, None) for name in names]
+
+    def repeat(method: str, path: str, params: dict = None) -> list[tuple]:
+        return [(method, path, params, None)] * requests
+
+    return [
+        Phase("POST /vpn/add", each("POST", "/vpn/add", "config", configs)),
+        Phase("POST /vpn/start", each("POST", "/vpn/start", "config", configs)),
+        Phase("POST /rclone/add", each("POST", "/rclone/add", "remote_name", remotes, lambda r: {"mount_path": str(mountdir / r)})),
+        Phase("POST /rclone/mount", each("POST", "/rclone/mount", "remote_name", remotes)),
+        Phase("GET /vpn/status", repeat("GET", "/vpn/status")),
+        Phase("GET /vpn/stats", repeat("GET", "/vpn/stats", {"window": 60})),
+        Phase("GET /rclone/status", repeat("GET", "/rclone/status")),
+        Phase("GET /metrics", repeat("GET", "/metrics")),
+        Phase("POST /rclone/unmount", each("POST", "/rclone/unmount", "remote_name", remotes)),
+        Phase("POST /vpn/stop", each("POST", "/vpn/stop", "config", configs)),
+        Phase("POST /rclone/remove", each("POST", "/rclone/remove", "remote_name", remotes)),
+        Phase("POST /vpn/remove", each("POST", "/vpn/remove", "config", configs)),
+    ]
+
+
+def reset_state(state: Path) -> None:
+    shutil.rmtree(state, ignore_errors=True)
+    (state / "wg").mkdir(parents=True)
+    (state / "mnt").mkdir()
+    (state / "mountinfo").touch()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def run_scenario(mode: str, instances: int, concurrency: int, requests: int, state: Path) -> list[dict]:
+    reset_state(state)
+    scenario = phases(instances, requests, state / "mnt")
+    if mode == "inproc":
+        from api.restapi import app
+        async with app.router.lifespan_context(app):
+            clients = [InProcessClient(app)] * concurrency
+            return [await phase.run(clients) for phase in scenario]
+
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=benchdir.parent, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                probe = HttpClient("127.0.0.1", port)
+                await probe.request("GET", "/metrics")
+                await probe.close()
+                break
+            except OSError:
+                if server.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError(f"uvicorn did not come up on port {port}")
+                await asyncio.sleep(0.05)
+        clients = [HttpClient("127.0.0.1", port) for _ in range(concurrency)]
+        try:
+            return [await phase.run(clients) for phase in scenario]
+        finally:
+            for client in clients:
+                await client.close()
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=benchdir.parent,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def arg_defs() -> CliArgs:
+    cliargs = CliArgs(args_width = 50, total_width = 150)
+    cliargs.description = f"{Format.BOLD}{Format.DARK_GREEN}Delos Benchmark{Format.END}"
+    cliargs.epilog = f"Fake wg, wg-quick, sudo, rclone and fusermount from bench/fakes are put first on PATH."
+
+    args = cliargs.add_arg_group("Arguments")
+    args.add_argument("-m", "--modes", type=str, default="inproc,http", help="Comma separated drivers: inproc, http")
+    args.add_argument("-n", "--instances", type=str, default="1,10,50", help="Comma separated instance counts")
+    args.add_argument("-c", "--concurrency", type=str, default="1,8,32", help="Comma separated client concurrency levels")
+    args.add_argument("-r", "--requests", type=int, default=200, help="Requests per read-only endpoint")
+    args.add_argument("-b", "--backend", type=str, default="process", help="Rclone backend: process or rcd")
+    args.add_argument("-o", "--output", type=str, default=None, help="Result file (default: bench/results/<time>-<commit>.json)")
+    args.add_argument("--scenario", type=str, default=None, help=argparse.SUPPRESS)
+
+    lat = cliargs.add_arg_group("Fake Latency (seconds)")
+    lat.add_argument("--lat-sudo", type=float, default=0.0, help="Added to every sudo call")
+    lat.add_argument("--lat-wg", type=float, default=0.002, help="Added to every wg call")
+    lat.add_argument("--lat-wg-quick", type=float, default=0.05, help="Added to every wg-quick call")
+    lat.add_argument("--lat-rclone-mount", type=float, default=0.1, help="Time until a fake mount appears")
+    lat.add_argument("--lat-fusermount", type=float, default=0.01, help="Added to every fusermount call")
+    lat.add_argument("--lat-rc", type=float, default=0.01, help="Added to every fake rc call")
+    lat.add_argument("--wg-peers", type=int, default=4, help="Peers reported per fake interface")
+
+    return cliargs
+
+def main(args) -> None:
+    state = Path(tempfile.mkdtemp(prefix="delos-bench-")).resolve()
+    os.environ.update({
+        "PATH": f"{benchdir / 'fakes'}{os.pathsep}{os.environ.get('PATH', '')}",
+        "BENCH_STATE": str(state),
+        "BENCH_LAT_SUDO": str(args.lat_sudo),
+        "BENCH_LAT_WG": str(args.lat_wg),
+        "BENCH_LAT_WG_QUICK": str(args.lat_wg_quick),
+        "BENCH_LAT_RCLONE_MOUNT": str(args.lat_rclone_mount),
+        "BENCH_LAT_FUSERMOUNT": str(args.lat_fusermount),
+        "BENCH_LAT_RC": str(args.lat_rc),
+        "BENCH_WG_PEERS": str(args.wg_peers),
+        "DELOS_MOUNTINFO": str(state / "mountinfo"),
+        "DELOS_MOUNT_POLL_INTERVAL": "0.005",
+        "DELOS_RCLONE_BACKEND": args.backend,
+        "DELOS_RCLONE_RC_ADDR": f"127.0.0.1:{free_port()}",
+        "DELOS_STATE_PATH": "",
+        "DELOS_WG_HELPER_SOCKET": "",
+    })
+
+    results = []
+    try:
+        for mode in args.modes.split(","):
+            for instances in [int(x) for x in args.instances.split(",")]:
+                for concurrency in [int(x) for x in args.concurrency.split(",")]:
+                    log.info(f"{Format.PURPLE}{mode}{Format.END} instances={instances} concurrency={concurrency}",
+                             called_name="bench", timestamp=True)
+                    # each scenario gets a fresh interpreter so Settings see the fake environment and
+                    # metrics/caches from earlier scenarios do not leak into later ones
+                    proc = subprocess.run(
+                        [sys.executable, __file__, "--scenario", f"{mode}:{instances}:{concurrency}", "--requests", str(args.requests)],
+                        stdout=subprocess.PIPE, check=True,
+                    )
+                    for row in json.loads(proc.stdout):
+                        results.append({"mode": mode, "instances": instances, "concurrency": concurrency, **row})
+                        log.info("  {:<22} n={:<5} err={:<3} p50={:>8.2f}ms p99={:>8.2f}ms {:>9.1f} req/s".format(
+                            row["endpoint"], row["count"], row["errors"], row["p50_ms"], row["p99_ms"], row["throughput_rps"]
+                        ), called_name="bench")
+    finally:
+        shutil.rmtree(state, ignore_errors=True)
+
+    commit = git_commit()
+    stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    output = Path(args.output) if args.output else benchdir / "results" / f"{stamp}-{commit or 'unknown'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({
+        "meta": {
+            "commit": commit, "time": stamp, "python": platform.python_version(), "platform": platform.platform(),
+            "backend": args.backend, "requests": args.requests,
+            "latency": {k: v for k, v in vars(args).items() if k.startswith("lat_")}, "wg_peers": args.wg_peers,
+        },
+        "results": results,
+    }, indent=2))
+    log.info(f"Results written to [ {output} ]", called_name="bench", timestamp=True)
+
+if __name__ == "__main__":
+    args, nargs, kwargs = arg_defs().parse_args()
+    if args.scenario is not None:
+        mode, instances, concurrency = args.scenario.split(":")
+        with open(os.devnull, "w") as devnull:
+            stdout, sys.stdout = sys.stdout, devnull  # keep the managers' logging out of the result stream
+            rows = asyncio.run(run_scenario(mode, int(instances), int(concurrency), args.requests, Path(os.environ["BENCH_STATE"])))
+            sys.stdout = stdout
+        print(json.dumps(rows))
+    else:
+        main(args)
@@ -1,6 +1,29 @@
-from .cmds import (
-    WireGuard as WireGuardCmds,
-    Rclone as RcloneCmds,
-)
-from .wireguard import WireGuardManager
-from .rclone import RcloneManager
+import importlib
+
+# resolved on first access so a process only pays for the managers it actually uses
+_exports = {
+    "WireGuardCmds": (".cmds", "WireGuard"),
+    "RcloneCmds": (".cmds", "Rclone"),
+    "StatusCache": (".cache", "StatusCache"),
+    "CommandRunner": (".runner", "CommandRunner"),
+    "BatchRunner": (".batch", "BatchRunner"),
+    "StateJournal": (".journal", "StateJournal"),
+    "EventBus": (".events", "EventBus"),
+    "RcloneProfile": (".profiles", "RcloneProfile"),
+    "WireGuardManager": (".wireguard", "WireGuardManager"),
+    "RcloneManager": (".rclone", "RcloneManager"),
+    "Coordinator": (".coordinator", "Coordinator"),
+    "CoordinatorClient": (".coordinator", "CoordinatorClient"),
+}
+
+
+def __getattr__(name: str):
+    if (target := _exports.get(name, None)) is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(target[0], __name__), target[1])
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted([*globals(), *_exports])
@@ -0,0 +1,40 @@
+import asyncio, time
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class BatchRunner:
+    def __init__(self, parallelism: int = 8) -> None:
+        self.parallelism = max(1, parallelism)
+
+    async def run(
+        self,
+        items: list[Any],
+        key: Callable[[Any], Hashable],
+        execute: Callable[[Any], Awaitable[dict]],
+        describe: Callable[[Any], dict] = lambda item: {},
+    ) -> list[dict]:
+        groups = {}
+        for index, item in enumerate(items):
+            groups.setdefault(key(item), []).append(index)
+
+        results = [None] * len(items)
+        semaphore = asyncio.Semaphore(self.parallelism)
+
+        async def run_group(indices: list[int]) -> None:
+            # operations on one resource stay ordered; a failure skips the rest of them
+            async with semaphore:
+                failed = False
+                for index in indices:
+                    if failed:
+                        results[index] = {"index": index, **describe(items[index]), "ok": False, "skipped": True, "elapsed": 0.0}
+                        continue
+                    tic = time.perf_counter()
+                    result = await execute(items[index])
+                    failed = not result.get("ok", True)
+                    results[index] = {
+                        "index": index, **describe(items[index]), "ok": not failed, **result,
+                        "elapsed": time.perf_counter() - tic,
+                    }
+
+        await asyncio.gather(*(run_group(indices) for indices in groups.values()))
+        return results
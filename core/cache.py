@@ -0,0 +1,120 @@
+import asyncio, secrets, threading, time
+from typing import Any, Awaitable, Callable, Hashable, Iterable
+
+
+class StatusCache:
+    def __init__(self, ttl: float = 1.0) -> None:
+        self.ttl = ttl
+        self.__entries = {}
+        self.__generations = {}
+        self.__locks = {}
+        self.__alocks = {}
+        self.__guard = threading.Lock()
+
+    def __lock(self, key: Hashable) -> threading.Lock:
+        with self.__guard:
+            return self.__locks.setdefault(key, threading.Lock())
+
+    def __fresh(self, key: Hashable) -> tuple[Any, dict] | None:
+        if (entry := self.__entries.get(key, None)) is not None:
+            age = time.monotonic() - entry[1]
+            if age < self.ttl:
+                return entry[0], {"hit": True, "age": age}
+        return None
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> tuple[Any, dict]:
+        if (cached := self.__fresh(key)) is not None:
+            return cached
+        with self.__lock(key):
+            # another reader may have refreshed the entry while we waited
+            if (cached := self.__fresh(key)) is not None:
+                return cached
+            generation = self.__generations.get(key, 0)
+            value = loader()
+            if self.__generations.get(key, 0) == generation:
+                self.__entries[key] = (value, time.monotonic())
+            return value, {"hit": False, "age": 0.0}
+
+    async def aget(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> tuple[Any, dict]:
+        if (cached := self.__fresh(key)) is not None:
+            return cached
+        async with self.__alocks.setdefault(key, asyncio.Lock()):
+            if (cached := self.__fresh(key)) is not None:
+                return cached
+            generation = self.__generations.get(key, 0)
+            value = await loader()
+            if self.__generations.get(key, 0) == generation:
+                self.__entries[key] = (value, time.monotonic())
+            return value, {"hit": False, "age": 0.0}
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        # the last loaded value whatever its age, for readers that must not block on a reload
+        if (entry := self.__entries.get(key, None)) is not None:
+            return entry[0]
+        return default
+
+    def invalidate(self, *keys: Hashable) -> None:
+        with self.__guard:
+            for key in keys or list(self.__entries.keys()):
+                self.__entries.pop(key, None)
+                self.__generations[key] = self.__generations.get(key, 0) + 1
+
+    @classmethod
+    def merge(cls, metas: list[dict]) -> dict:
+        if not metas:
+            return {"hit": True, "age": 0.0}
+        return {"hit": all(m["hit"] for m in metas), "age": max(m["age"] for m in metas)}
+
+
+class StatusVersions:
+    # content-based generations for a status dict: every observation that differs from the last one
+    # bumps the generation and stamps the entries that changed, so readers can ask "what changed since N".
+    # The published view is replaced, never mutated, and can be handed out (or pickled into a snapshot) as is.
+    def __init__(self, removed: int = 1024) -> None:
+        self.boot = secrets.token_hex(4)
+        self.removed = removed
+        self.__values = {}
+        self.__view = {"boot": self.boot, "generation": 0, "floor": 0, "instances": {}, "removed": {}}
+        self.__guard = threading.Lock()
+
+    @property
+    def generation(self) -> int:
+        return self.__view["generation"]
+
+    def observe(self, status: dict, partial: bool = False) -> dict:
+        # a partial observation (a filtered query) only speaks for the entries it contains
+        with self.__guard:
+            previous = self.__values
+            changed = [key for key, value in status.items() if key not in previous or previous[key] != value]
+            gone = [] if partial else [key for key in previous if key not in status]
+            if changed or gone:
+                self.__values = {**previous, **status} if partial else dict(status)
+                self.__publish(changed, gone)
+            return self.__view
+
+    def touch(self, *keys: Hashable) -> None:
+        # changes the status dict cannot show on its own, e.g. an entry entering or leaving a filter
+        with self.__guard:
+            self.__publish(keys, ())
+
+    def discard(self, key: Hashable) -> None:
+        with self.__guard:
+            if key in self.__values or key in self.__view["instances"]:
+                self.__values.pop(key, None)
+                self.__publish((), (key,))
+
+    def __publish(self, changed: Iterable[Hashable], gone: Iterable[Hashable]) -> None:
+        view = self.__view
+        generation = view["generation"] + 1
+        instances, removed, floor = dict(view["instances"]), dict(view["removed"]), view["floor"]
+        for key in changed:
+            instances[key] = generation
+            removed.pop(key, None)
+        for key in gone:
+            instances.pop(key, None)
+            removed.pop(key, None)
+            removed[key] = generation
+        # tombstones are bounded; a reader older than the last one dropped has to start over
+        while len(removed) > self.removed:
+            floor = removed.pop(next(iter(removed)))
+        self.__view = {"boot": self.boot, "generation": generation, "floor": floor, "instances": instances, "removed": removed}
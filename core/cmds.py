@@ -26,24 +26,45 @@ class WireGuard(OsCmds):
         }.get(system(), None))
 
     @classmethod
-    def status(cls, config: str) -> str:
+    def dump(cls) -> str:
         return super()._return_cmd({
-            "Linux": f"sudo wg show {config}",
-            "Darwin": f"sudo wg show {config}",
-            "Windows": f"wg show {config}",
+            "Linux": "sudo wg show all dump",
+            "Darwin": "sudo wg show all dump",
+            "Windows": "wg show all dump",
         }.get(system(), None))
 
 
 class Rclone(OsCmds):
     @classmethod
-    def mount(cls, name: str, path: str) -> str:
+    def mount(cls, name: str, path: str, flags: list[str] = None) -> str:
+        flags = ["--vfs-cache-mode", "writes"] if flags is None else flags
         return super()._return_cmd(
-            f"rclone mount {name}: {path} --vfs-cache-mode writes"
+            " ".join([f"rclone mount {name}: {path}", *flags])
         )
 
+    @classmethod
+    def rc_listen(cls, socket: str) -> list[str]:
+        return ["--rc", "--rc-addr", f"unix://{socket}"]
+
+    @classmethod
+    def rcd(cls, addr: str) -> str:
+        return super()._return_cmd(f"rclone rcd --rc-addr {addr}")
+
+    @classmethod
+    def rc_mount(cls, name: str, path: str, options: dict = None) -> dict:
+        options = {"vfsOpt": {"CacheMode": "writes"}} if options is None else options
+        return {"fs": f"{name}:", "mountPoint": path, **options}
+
     @classmethod
     def unmount(cls, path: str) -> str:
         return super()._return_cmd({
             "Linux": f"fusermount -u {path}",
             "Darwin": f"umount {path}",
         }.get(system(), None))
+
+    @classmethod
+    def force_unmount(cls, path: str) -> str:
+        return super()._return_cmd({
+            "Linux": f"fusermount -uz {path}",
+            "Darwin": f"umount -f {path}",
+        }.get(system(), None))
@@ -0,0 +1,337 @@
+import asyncio, base64, inspect, json, mmap, os, struct, time
+import subprocess as sp
+from pathlib import Path
+from typing import Callable
+from utils import Format, LogParent as log, Settings
+
+
+def _encode(value):
+    if isinstance(value, (bytes, bytearray)):
+        return {"__bytes__": base64.b64encode(value).decode()}
+    if isinstance(value, (Path, set, frozenset)):
+        return str(value) if isinstance(value, Path) else sorted(value)
+    if hasattr(value, "to_dict"):
+        return value.to_dict()
+    raise TypeError(f"{type(value).__name__} is not serializable over the coordinator channel")
+
+def _decode(value: dict):
+    return base64.b64decode(value["__bytes__"]) if "__bytes__" in value else value
+
+def _dumps(value) -> bytes:
+    return json.dumps(value, default=_encode, separators=(",", ":")).encode() + b"\n"
+
+def _loads(line: bytes):
+    return json.loads(line, object_hook=_decode)
+
+
+def _pack_error(e: BaseException) -> dict:
+    error = {"type": type(e).__name__, "args": [str(x) for x in e.args], "notes": getattr(e, "__notes__", [])}
+    if isinstance(e, sp.CalledProcessError):
+        error.update(returncode=e.returncode, cmd=e.cmd, output=e.output, stderr=e.stderr)
+    elif isinstance(e, sp.TimeoutExpired):
+        error.update(cmd=e.cmd, timeout=e.timeout, output=e.output, stderr=e.stderr)
+    return error
+
+def _unpack_error(error: dict) -> BaseException:
+    kind = error["type"]
+    if kind == "CalledProcessError":
+        e = sp.CalledProcessError(error["returncode"], error["cmd"], output=error["output"], stderr=error["stderr"])
+    elif kind == "TimeoutExpired":
+        e = sp.TimeoutExpired(error["cmd"], error["timeout"], output=error["output"], stderr=error["stderr"])
+    elif kind in ("KeyError", "ValueError", "TypeError", "FileNotFoundError", "TimeoutError"):
+        e = {"KeyError": KeyError, "ValueError": ValueError, "TypeError": TypeError,
+             "FileNotFoundError": FileNotFoundError, "TimeoutError": TimeoutError}[kind](*error["args"])
+    elif kind.endswith("ConnectionError") or kind == "ConnectionRefusedError":
+        e = ConnectionError(*error["args"])
+    else:
+        e = RuntimeError(f"{kind}: {' '.join(error['args'])}")
+    for note in error["notes"]:
+        e.add_note(note)
+    return e
+
+
+class SnapshotWriter:
+    # seqlock layout: [sequence u64][length u64][published monotonic f64][payload]; an odd sequence means a write
+    # is in progress and readers retry
+    HEADER = struct.Struct("=QQd")
+
+    def __init__(self, path: str | Path, size: int) -> None:
+        self.path = Path(path)
+        self.size = size
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            os.ftruncate(fd, self.HEADER.size + size)
+            self.__map = mmap.mmap(fd, self.HEADER.size + size)
+        finally:
+            os.close(fd)
+        self.__sequence = 0
+        self.__oversize = False
+
+    def publish(self, value) -> bool:
+        payload = _dumps(value)
+        if len(payload) > self.size:
+            if not self.__oversize:
+                log.warning(f"Status snapshot ({len(payload)} bytes) exceeds {self.size} bytes, workers will ask the coordinator",
+                            called_name="coordinator", timestamp=True)
+            self.__oversize = True
+            payload = b""
+        else:
+            self.__oversize = False
+        self.HEADER.pack_into(self.__map, 0, self.__sequence + 1, 0, 0.0)
+        self.__map[self.HEADER.size:self.HEADER.size + len(payload)] = payload
+        self.__sequence += 2
+        self.HEADER.pack_into(self.__map, 0, self.__sequence, len(payload), time.monotonic())
+        return bool(payload)
+
+    def close(self) -> None:
+        self.__map.close()
+        self.path.unlink(missing_ok=True)
+
+
+class SnapshotReader:
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.__map = None
+        self.__sequence = None
+        self.__value, self.__published = None, 0.0
+
+    def read(self) -> tuple[dict | None, float]:
+        if self.__map is None:
+            try:
+                with open(self.path, "rb") as f:
+                    self.__map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (FileNotFoundError, ValueError):
+                return None, 0.0
+        header = SnapshotWriter.HEADER
+        for _ in range(8):
+            sequence, length, published = header.unpack_from(self.__map, 0)
+            if sequence & 1:
+                continue
+            if sequence == self.__sequence:
+                return self.__value, self.__published  # unchanged since the last read, skip the decode
+            payload = self.__map[header.size:header.size + length]
+            if header.unpack_from(self.__map, 0)[0] != sequence:
+                continue
+            self.__value = _loads(payload) if length else None
+            self.__sequence, self.__published = sequence, published
+            return self.__value, self.__published
+        return None, 0.0
+
+    def close(self) -> None:
+        if self.__map is not None:
+            self.__map.close()
+            self.__map = None
+
+
+class Coordinator:
+    READS = ("acached_status", "stats", "remotes", "alogs", "latest", "read", "aread", "prewarm_jobs", "route", "overlaps")
+
+    def __init__(self, managers: dict, socket_path: str | Path, snapshot_path: str | Path = None) -> None:
+        self.managers = managers
+        self.socket_path = Path(socket_path)
+        self.__snapshot = SnapshotWriter(snapshot_path, Settings.SNAPSHOT_SIZE) if snapshot_path is not None else None
+        self.__generation = 0
+        self.__changed = asyncio.Event()
+        self.__methods = {target: self.describe(manager) for target, manager in managers.items()}
+
+    @classmethod
+    def describe(cls, manager) -> dict[str, str]:
+        methods = {}
+        for name, attr in inspect.getmembers(type(manager)):
+            if name.startswith("_"):
+                continue
+            if isinstance(attr, property):
+                methods[name] = "property"
+            elif inspect.iscoroutinefunction(attr):
+                methods[name] = "async"
+            elif callable(attr):
+                methods[name] = "sync"
+        return methods
+
+    async def __call(self, request: dict) -> dict:
+        target, method = request["target"], request["method"]
+        if (kind := self.__methods.get(target, {}).get(method, None)) is None:
+            raise AttributeError(f"{target} has no method {method!r}")
+        manager = self.managers[target]
+        if kind == "property":
+            result = getattr(manager, method)
+        elif kind == "async":
+            result = await getattr(manager, method)(*request.get("args", ()), **request.get("kwargs", {}))
+        else:
+            result = getattr(manager, method)(*request.get("args", ()), **request.get("kwargs", {}))
+        if method not in self.READS:
+            self.__generation += 1
+            self.__changed.set()
+        return {"result": result, "generation": self.__generation}
+
+    async def __handle(self, request: dict) -> dict:
+        try:
+            if request["op"] == "describe":
+                reply = {"result": self.__methods, "generation": self.__generation}
+            else:
+                reply = await self.__call(request)
+        except Exception as e:
+            reply = {"error": _pack_error(e), "generation": self.__generation}
+        return {"id": request.get("id", None), **reply}
+
+    async def __serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        async def respond(request: dict) -> None:
+            reply = await self.__handle(request)
+            try:
+                writer.write(_dumps(reply))
+            except TypeError as e:
+                writer.write(_dumps({"id": reply["id"], "error": _pack_error(e), "generation": self.__generation}))
+            await writer.drain()
+
+        tasks = set()
+        try:
+            while (line := await reader.readline()):
+                # requests on one connection run concurrently; replies carry the request id
+                task = asyncio.create_task(respond(_loads(line)))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (ConnectionError, ValueError, asyncio.CancelledError):
+            pass  # worker went away, or the server is closing and cancelled this handler
+        finally:
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+    async def publish(self) -> None:
+        generation = self.__generation
+        managers = {}
+        for target, manager in self.managers.items():
+            if self.__methods[target].get("acached_status", None) == "async":
+                try:
+                    managers[target] = await manager.acached_status()
+                except Exception as e:
+                    log.warning(f"Status snapshot of [ {target} ] failed: {e}", called_name="coordinator", timestamp=True)
+        self.__snapshot.publish({"generation": generation, "managers": managers})
+
+    async def __publish_forever(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self.__changed.wait(), Settings.SNAPSHOT_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self.__changed.clear()
+            await self.publish()
+
+    async def aserve(self, stop: asyncio.Event, ready: Callable[[], None] = None) -> None:
+        self.socket_path.unlink(missing_ok=True)
+        umask = os.umask(0o177)
+        try:
+            server = await asyncio.start_unix_server(self.__serve, path=str(self.socket_path))
+        finally:
+            os.umask(umask)
+        publisher = None
+        if self.__snapshot is not None:
+            await self.publish()
+            publisher = asyncio.create_task(self.__publish_forever())
+        log.info(f"{Format.PURPLE}Coordinator listening on [ {self.socket_path} ]{Format.END}", called_name="coordinator", timestamp=True)
+        if ready is not None:
+            ready()
+        try:
+            async with server:
+                await stop.wait()
+        finally:
+            if publisher is not None:
+                publisher.cancel()
+            if self.__snapshot is not None:
+                self.__snapshot.close()
+            self.socket_path.unlink(missing_ok=True)
+
+
+class ManagerProxy:
+    def __init__(self, client: "CoordinatorClient", target: str, methods: dict[str, str]) -> None:
+        self.__client = client
+        self.__target = target
+        self.__methods = methods
+
+    def __getattr__(self, name: str):
+        if (kind := self.__methods.get(name, None)) is None:
+            raise AttributeError(f"{self.__target} has no attribute {name!r}")
+        client, target = self.__client, self.__target
+        # every member is answered over the worker's event-loop connection, so proxied reads are awaitable
+        # even where the manager's own method is sync
+        if kind == "property":
+            return client.acall(target, name)
+        if name == "acached_status":
+            # filtered queries are answered by the coordinator's indexes, the full view by the snapshot
+            return lambda *nargs, **kwargs: (
+                client.acall(target, name, *nargs, **kwargs) if any(x is not None for x in (*nargs, *kwargs.values()))
+                else client.acached_status(target)
+            )
+        return lambda *nargs, **kwargs: client.acall(target, name, *nargs, **kwargs)
+
+
+class CoordinatorClient:
+    def __init__(self, socket_path: str | Path, snapshot_path: str | Path = None) -> None:
+        self.socket_path = str(socket_path)
+        self.__snapshot = SnapshotReader(snapshot_path) if snapshot_path is not None else None
+        self.__reader, self.__writer = None, None
+        self.__pending = {}
+        self.__ids = 0
+        self.__dispatcher = None
+        # highest generation this worker has caused; older snapshots would hide its own writes
+        self.__generation = 0
+        self.__methods = {}
+
+    async def __aenter__(self) -> "CoordinatorClient":
+        self.__reader, self.__writer = await asyncio.open_unix_connection(self.socket_path)
+        self.__dispatcher = asyncio.create_task(self.__dispatch())
+        self.__methods = await self.__request({"op": "describe"})
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.__dispatcher.cancel()
+        self.__writer.close()
+        if self.__snapshot is not None:
+            self.__snapshot.close()
+
+    def proxy(self, target: str) -> ManagerProxy:
+        if target not in self.__methods:
+            raise KeyError(f"Coordinator does not manage [ {target} ]")
+        return ManagerProxy(self, target, self.__methods[target])
+
+    async def __dispatch(self) -> None:
+        try:
+            while (line := await self.__reader.readline()):
+                reply = _loads(line)
+                if (future := self.__pending.pop(reply["id"], None)) is not None and not future.done():
+                    future.set_result(reply)
+        finally:
+            for future in self.__pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError(f"Coordinator on [ {self.socket_path} ] closed the connection"))
+            self.__pending.clear()
+
+    def __result(self, reply: dict):
+        self.__generation = max(self.__generation, reply.get("generation", 0))
+        if "error" in reply:
+            raise _unpack_error(reply["error"])
+        return reply["result"]
+
+    async def __request(self, request: dict):
+        if self.__dispatcher.done():
+            raise ConnectionError(f"Coordinator on [ {self.socket_path} ] closed the connection")
+        self.__ids += 1
+        request["id"] = self.__ids
+        future = self.__pending[self.__ids] = asyncio.get_running_loop().create_future()
+        self.__writer.write(_dumps(request))
+        await self.__writer.drain()
+        return self.__result(await future)
+
+    async def acall(self, target: str, method: str, *nargs, **kwargs):
+        return await self.__request({"op": "call", "target": target, "method": method, "args": nargs, "kwargs": kwargs})
+
+    async def acached_status(self, target: str) -> tuple[dict, dict]:
+        if self.__snapshot is not None:
+            value, published = self.__snapshot.read()
+            if value is not None and value["generation"] >= self.__generation and target in value["managers"]:
+                status, meta = value["managers"][target]
+                age = time.monotonic() - published + meta["age"]
+                if age < Settings.STATUS_TTL:
+                    return status, {**meta, "hit": True, "age": age}
+        status, meta = await self.acall(target, "acached_status")
+        return status, meta
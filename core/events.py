@@ -0,0 +1,67 @@
+import asyncio, threading, time
+from collections import deque
+from utils import Settings
+
+
+class EventBus:
+    def __init__(self, history: int = None) -> None:
+        self.__history = deque(maxlen=history or Settings.EVENT_HISTORY)
+        self.__sequence = 0
+        self.__lock = threading.Lock()
+        self.__loop = None
+        self.__wakeup = None
+
+    @property
+    def latest(self) -> int:
+        return self.__sequence
+
+    def publish(self, source: str, type: str, resource: str, **data) -> dict:
+        with self.__lock:
+            self.__sequence += 1
+            event = {"seq": self.__sequence, "ts": time.time(), "source": source, "type": type, "resource": resource, **data}
+            self.__history.append(event)
+        self.__notify()
+        return event
+
+    def __notify(self) -> None:
+        if self.__loop is None:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.__loop:
+            self.__wake()
+        else:
+            self.__loop.call_soon_threadsafe(self.__wake)  # published from a worker thread
+
+    def __wake(self) -> None:
+        # every waiter holds the current event; swapping it wakes them all at once
+        if self.__wakeup is not None:
+            self.__wakeup.set()
+            self.__wakeup = asyncio.Event()
+
+    def read(self, since: int = None) -> dict:
+        with self.__lock:
+            since = self.__sequence if since is None else since
+            oldest = self.__history[0]["seq"] if self.__history else self.__sequence + 1
+            # a cursor past the end belongs to a previous run of the service; replay everything we have
+            gap = since > self.__sequence or since < oldest - 1
+            events = list(self.__history) if since > self.__sequence else [x for x in self.__history if x["seq"] > since]
+            return {"events": events, "gap": gap, "latest": self.__sequence}
+
+    async def aread(self, since: int = None, timeout: float = 0) -> dict:
+        if self.__loop is None:
+            self.__loop = asyncio.get_running_loop()
+            self.__wakeup = asyncio.Event()
+        # no cursor means "from now on"; pin it so the second read does not move with the events
+        since = self.__sequence if since is None else since
+        result = self.read(since)
+        if result["events"] or timeout <= 0:
+            return result
+        wakeup = self.__wakeup
+        try:
+            await asyncio.wait_for(wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.read(since)
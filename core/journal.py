@@ -0,0 +1,106 @@
+import json, os, queue, threading
+from pathlib import Path
+from utils import LogParent as log
+
+
+class StateJournal:
+    # the in-memory state changes synchronously; appends and compactions are queued to one writer thread
+    # so callers on the event loop never wait on the disk. Records reach the file in the order they were made.
+    def __init__(self, path: str | Path, compact_min: int = 64) -> None:
+        self.path = Path(path)
+        self.compact_min = compact_min
+        self.__lock = threading.Lock()
+        self.__state = {}
+        self.__records = 0
+        self.__queue = queue.Queue()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.__replay()
+        self.__thread = threading.Thread(target=self.__run, name="delos-journal", daemon=True)
+        self.__thread.start()
+        self.compact()
+
+    def __replay(self) -> None:
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # torn tail from a crash mid-append
+                entries = self.__state.setdefault(record["kind"], {})
+                if record["op"] == "put":
+                    entries[record["key"]] = record["state"]
+                else:
+                    entries.pop(record["key"], None)
+
+    def __live(self) -> int:
+        with self.__lock:
+            return sum(len(entries) for entries in self.__state.values())
+
+    def __run(self) -> None:
+        while True:
+            record = self.__queue.get()
+            try:
+                if record is None:
+                    self.__compact()
+                else:
+                    self.__append(record)
+            except OSError as e:
+                log.warning(f"State journal [ {self.path} ] write failed: {e}", called_name="journal", timestamp=True)
+            finally:
+                self.__queue.task_done()
+
+    def __append(self, record: dict) -> None:
+        line = (json.dumps(record, separators=(",", ":")) + "\n").encode()
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        try:
+            os.write(fd, line)  # one write per record so concurrent readers never see half a line
+        finally:
+            os.close(fd)
+        self.__records += 1
+        if self.__records > max(self.compact_min, 2 * self.__live()):
+            self.__compact()
+
+    def __compact(self) -> None:
+        with self.__lock:
+            snapshot = {kind: dict(entries) for kind, entries in self.__state.items()}
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "w") as f:
+            for kind, entries in snapshot.items():
+                for key, state in entries.items():
+                    f.write(json.dumps({"op": "put", "kind": kind, "key": key, "state": state}, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self.__records = sum(len(entries) for entries in snapshot.values())
+
+    def compact(self) -> None:
+        self.__queue.put(None)
+
+    def flush(self) -> None:
+        self.__queue.join()
+
+    def put(self, kind: str, key: str, state: dict) -> None:
+        with self.__lock:
+            self.__state.setdefault(kind, {})[key] = state
+            self.__queue.put({"op": "put", "kind": kind, "key": key, "state": state})
+
+    def update(self, kind: str, key: str, **changes) -> None:
+        with self.__lock:
+            if (state := self.__state.get(kind, {}).get(key, None)) is None:
+                return
+            state = {**state, **changes}
+            self.__state[kind][key] = state
+            self.__queue.put({"op": "put", "kind": kind, "key": key, "state": state})
+
+    def delete(self, kind: str, key: str) -> None:
+        with self.__lock:
+            if self.__state.get(kind, {}).pop(key, None) is not None:
+                self.__queue.put({"op": "del", "kind": kind, "key": key})
+
+    def entries(self, kind: str) -> dict[str, dict]:
+        with self.__lock:
+            return dict(self.__state.get(kind, {}))
@@ -0,0 +1,57 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class KeyedLocks:
+    # one asyncio.Lock per resource so unrelated resources never wait on each other. Every holder runs on
+    # the event loop, so a single lock family covers all of them. Entries are refcounted and dropped once
+    # nobody holds or waits on them.
+    def __init__(self) -> None:
+        self.__locks = {}
+
+    def locked(self, key: Hashable) -> bool:
+        return (entry := self.__locks.get(key, None)) is not None and entry[0].locked()
+
+    @asynccontextmanager
+    async def ahold(self, key: Hashable):
+        if (entry := self.__locks.get(key, None)) is None:
+            entry = self.__locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and self.__locks.get(key, None) is entry:
+                del self.__locks[key]
+
+
+class SingleFlight:
+    # concurrent calls of the same action on the same resource share one execution: the first caller runs
+    # it, the rest wait for and receive its result (or exception). Nothing is cached once the flight lands.
+    # A different action on the resource seals the flights already in the air, so a caller arriving after a
+    # stop was requested starts a fresh start behind it instead of joining one the stop is about to undo.
+    def __init__(self) -> None:
+        self.__flights = {}
+
+    async def ado(self, resource: Hashable, action: Hashable, function: Callable[[], Awaitable[Any]]) -> Any:
+        flights = self.__flights.setdefault(resource, {})
+        if (flight := flights.get(action, None)) is None:
+            flights.clear()
+            flight = flights[action] = asyncio.ensure_future(function())
+            flight.add_done_callback(lambda f: self.__land(resource, action, f))
+        # shielded so one impatient caller disconnecting does not cancel the work for everyone else
+        return await asyncio.shield(flight)
+
+    def __land(self, resource: Hashable, action: Hashable, flight: asyncio.Future) -> None:
+        if (flights := self.__flights.get(resource, None)) is not None:
+            if flights.get(action, None) is flight:
+                del flights[action]
+            if not flights:
+                del self.__flights[resource]
+        if not flight.cancelled():
+            flight.exception()  # retrieved here in case every waiter was cancelled
+
+    def inflight(self, resource: Hashable, action: Hashable) -> bool:
+        return action in self.__flights.get(resource, {})
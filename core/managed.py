@@ -0,0 +1,110 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+from utils import Format, LogParent as log
+from core.cache import StatusVersions
+from core.events import EventBus
+from core.journal import StateJournal
+from core.registry import Registry
+
+
+class Periodic:
+    # a background loop such as stats sampling or health checks: a failed round is logged and the loop
+    # carries on, and with a timeout a round that hangs is abandoned rather than delaying the next one
+    def __init__(self, name: str, called_name: str) -> None:
+        self.name = name
+        self.__called_name = called_name
+        self.__task = None
+
+    @property
+    def running(self) -> bool:
+        return self.__task is not None
+
+    def start(self, interval: float, function: Callable[[], Awaitable[Any]], timeout: float = None) -> None:
+        if self.__task is not None:
+            return
+        self.__task = asyncio.create_task(self.__run_forever(interval, function, timeout))
+
+    async def astop(self) -> None:
+        if self.__task is None:
+            return
+        self.__task.cancel()
+        await asyncio.gather(self.__task, return_exceptions=True)
+        self.__task = None
+
+    async def __run_forever(self, interval: float, function: Callable[[], Awaitable[Any]], timeout: float) -> None:
+        while True:
+            try:
+                await (function() if timeout is None else asyncio.wait_for(function(), timeout))
+            except Exception as e:
+                log.warning(f"{self.name} failed: {e}", called_name=self.__called_name, timestamp=True)
+            await asyncio.sleep(interval)
+
+
+class Lifecycle:
+    # the bookkeeping around every state change of a manager's instances, in one place: registry state,
+    # status versions, events, the journal the next start restores from, and supervision of what it adopts
+    def __init__(self, topic: str, kind: str, instances: Registry, versions: StatusVersions, states: dict[str, str],
+                 supervise: Callable[[Hashable], None], journal: StateJournal = None, events: EventBus = None) -> None:
+        self.topic = topic
+        self.kind = kind
+        self.closing = False
+        self.__instances = instances
+        self.__versions = versions
+        self.__states = states
+        self.__supervise = supervise
+        self.__journal = journal
+        self.__events = events
+
+    def emit(self, type: str, key: Hashable, **data) -> None:
+        if (state := self.__states.get(type, None)) is not None and self.__instances.mark(key, state):
+            self.__versions.touch(key)
+        if self.__events is not None:
+            self.__events.publish(self.topic, type, key, **data)
+
+    def failed(self, key: Hashable, operation: str, e: Exception) -> None:
+        self.emit("failed", key, operation=operation, reason=" ".join(getattr(e, "__notes__", [])) or str(e))
+
+    def record(self, key: Hashable, entry: dict = None) -> None:
+        # teardown on exit is not a user removal; keep the journal so the next start restores it
+        if self.__journal is None or self.closing:
+            return
+        if entry is not None:
+            self.__journal.put(self.topic, key, entry)
+        else:
+            self.__journal.delete(self.topic, key)
+
+    def supervision_changed(self, key: Hashable, state: dict | None) -> None:
+        # restarts report their own success; only the way down is published from here
+        if state is not None and state["state"] != "running":
+            self.emit("restarting" if state["state"] == "restarting" else "failed", key, operation="supervise",
+                      reason=state["last_failure"], restarts=state["restarts"], next_restart_at=state["next_restart_at"])
+
+    def entries(self) -> dict[str, dict] | None:
+        return self.__journal.entries(self.topic) if self.__journal is not None else None
+
+    def adopt(self, key: Hashable, state: str) -> str:
+        # found running from a previous life: it is ours now, and watched like anything started here
+        if self.__instances.mark(key, state):
+            self.__versions.touch(key)
+        self.__supervise(key)
+        return "adopted"
+
+    def restore_failed(self, key: Hashable, e: Exception) -> None:
+        log.warning(f"Unable to restore {self.kind} [ {key} ]: {' '.join(getattr(e, '__notes__', [])) or e}",
+                    called_name=self.topic, timestamp=True)
+
+    async def arestore(self, entries: dict[str, dict], restore: Callable[[str, dict], Awaitable[str]],
+                       report: dict[str, str] = None) -> dict[str, str]:
+        results = await asyncio.gather(*(restore(key, state) for key, state in entries.items()), return_exceptions=True)
+        report = dict(report or {})
+        for key, result in zip(entries, results):
+            if isinstance(result, Exception):
+                report[key] = "failed"
+                self.restore_failed(key, result)
+            else:
+                report[key] = result
+        log.info("{}Restored {} {} instance(s): {}{}".format(
+            Format.PURPLE, len(report), self.kind,
+            ", ".join(f"{key} {result}" for key, result in report.items()) or "none", Format.END,
+        ), called_name=self.topic, timestamp=True)
+        return report
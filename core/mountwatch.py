@@ -0,0 +1,82 @@
+import asyncio, os, select, time
+import subprocess as sp
+from pathlib import Path
+
+
+class MountWatcher:
+    __ESCAPES = (("\\040", " "), ("\\011", "\t"), ("\\012", "\n"), ("\\134", "\\"))
+
+    def __init__(self, mountinfo: str = "/proc/self/mountinfo", interval: float = 0.25) -> None:
+        self.mountinfo = mountinfo
+        self.interval = interval
+
+    @classmethod
+    def __unescape(cls, field: str) -> str:
+        for escaped, char in cls.__ESCAPES:
+            field = field.replace(escaped, char)
+        return field
+
+    @classmethod
+    def normalize(cls, path: str | Path) -> str:
+        return os.path.realpath(os.path.expanduser(str(path)))
+
+    def mount_points(self) -> set[str]:
+        with open(self.mountinfo, "r") as f:
+            return {self.__unescape(line.split(" ", 5)[4]) for line in f if line.count(" ") >= 5}
+
+    def mounted(self, path: str | Path) -> bool:
+        if not os.path.exists(self.mountinfo):
+            return os.path.ismount(path)
+        return self.normalize(path) in self.mount_points()
+
+    def __open_epoll(self) -> tuple[select.epoll, int] | tuple[None, None]:
+        # mountinfo raises EPOLLPRI whenever the mount table changes; regular files
+        # (or platforms without procfs) cannot be watched and fall back to rescans
+        try:
+            fd = os.open(self.mountinfo, os.O_RDONLY)
+        except OSError:
+            return None, None
+        try:
+            ep = select.epoll()
+            ep.register(fd, select.EPOLLPRI | select.EPOLLERR)
+            return ep, fd
+        except (OSError, AttributeError):
+            os.close(fd)
+            return None, None
+
+    @classmethod
+    def __exited(cls, proc: sp.Popen | asyncio.subprocess.Process) -> bool:
+        if isinstance(proc, sp.Popen):
+            return proc.poll() is not None
+        return proc.returncode is not None
+
+    async def await_ready(self, path: str | Path, proc: asyncio.subprocess.Process, timeout: float) -> float:
+        loop = asyncio.get_running_loop()
+        start = time.monotonic()
+        deadline = start + timeout
+        wake = asyncio.Event()
+        exited = asyncio.ensure_future(proc.wait())
+        exited.add_done_callback(lambda _: wake.set())
+        ep, fd = self.__open_epoll()
+        if ep is not None:
+            loop.add_reader(ep.fileno(), lambda: (ep.poll(0), wake.set()))
+        try:
+            while True:
+                wake.clear()
+                if self.mounted(path):
+                    return time.monotonic() - start
+                if self.__exited(proc):
+                    raise sp.CalledProcessError(proc.returncode, str(path))
+                if (remaining := deadline - time.monotonic()) <= 0:
+                    raise sp.TimeoutExpired(str(path), timeout)
+                if ep is None:
+                    remaining = min(remaining, self.interval)
+                try:
+                    await asyncio.wait_for(wake.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            if not exited.done(): exited.cancel()
+            if ep is not None:
+                loop.remove_reader(ep.fileno())
+                ep.close(); os.close(fd)
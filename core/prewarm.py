@@ -0,0 +1,194 @@
+import asyncio, fnmatch, os, secrets, time
+from collections import OrderedDict
+from pathlib import Path, PurePosixPath
+from utils import LogParent as log, Settings
+
+
+class PrewarmJob:
+    __GLOB = set("*?[")
+    __CHUNK = 1024 * 1024
+
+    def __init__(self, remote_name: str, mount_path: Path, paths: list[str], contents: bool = False,
+                 budget: int = None, parallelism: int = None) -> None:
+        self.validate(paths)
+        self.id = secrets.token_hex(4)
+        self.remote_name = remote_name
+        self.mount_path = Path(mount_path)
+        self.paths = list(paths)
+        self.contents = contents
+        self.budget = Settings.PREWARM_BUDGET if budget is None else budget
+        self.parallelism = max(1, parallelism or Settings.PREWARM_PARALLELISM)
+        self.state = "queued"
+        self.error = None
+        self.dirs, self.files, self.bytes, self.errors = 0, 0, 0, 0
+        self.started_at, self.finished_at = None, None
+        self.__reserved = 0
+        self.__task = None
+
+    @classmethod
+    def validate(cls, paths: list[str]) -> None:
+        if not paths:
+            raise ValueError("Prewarm needs at least one path or pattern")
+        for path in paths:
+            if PurePosixPath(path).is_absolute() or ".." in PurePosixPath(path).parts:
+                raise ValueError(f"Prewarm path {path!r} must be relative to the mount and stay inside it")
+
+    @classmethod
+    def __split(cls, pattern: str) -> tuple[str, tuple[str, ...] | None]:
+        # the walk starts at the longest directory prefix without wildcards; the rest is matched per file
+        parts = PurePosixPath(pattern).parts
+        for index, part in enumerate(parts):
+            if cls.__GLOB & set(part):
+                return "/".join(parts[:index]), parts
+        return pattern.strip("/"), None
+
+    @classmethod
+    def __match(cls, parts: tuple[str, ...], pattern: tuple[str, ...]) -> bool:
+        # one pattern component per path component, so `*` never crosses a `/`; a `**` component spans any depth
+        if not pattern:
+            return not parts
+        if pattern[0] == "**":
+            return any(cls.__match(parts[index:], pattern[1:]) for index in range(len(parts) + 1))
+        return bool(parts) and fnmatch.fnmatchcase(parts[0], pattern[0]) and cls.__match(parts[1:], pattern[1:])
+
+    @classmethod
+    def __reachable(cls, parts: tuple[str, ...], pattern: tuple[str, ...]) -> bool:
+        # whether anything below this directory can still match, so unrelated subtrees are never listed
+        if not parts:
+            return True
+        if not pattern:
+            return False
+        if pattern[0] == "**":
+            return True
+        return fnmatch.fnmatchcase(parts[0], pattern[0]) and cls.__reachable(parts[1:], pattern[1:])
+
+    def status(self) -> dict:
+        end = self.finished_at or time.time()
+        elapsed = end - self.started_at if self.started_at is not None else 0.0
+        return {
+            "id": self.id, "remote_name": self.remote_name, "paths": self.paths, "contents": self.contents,
+            "budget": self.budget, "parallelism": self.parallelism, "state": self.state, "error": self.error,
+            "dirs": self.dirs, "files": self.files, "bytes": self.bytes, "errors": self.errors,
+            "started_at": self.started_at, "finished_at": self.finished_at, "elapsed": elapsed,
+            "bytes_rate": self.bytes / elapsed if elapsed > 0 else None,
+            "files_rate": (self.dirs + self.files) / elapsed if elapsed > 0 else None,
+        }
+
+    @property
+    def done(self) -> bool:
+        return self.state in ("done", "failed", "cancelled")
+
+    def start(self) -> None:
+        self.__task = asyncio.create_task(self.__run())
+
+    async def acancel(self) -> None:
+        if self.__task is not None and not self.__task.done():
+            self.__task.cancel()
+            await asyncio.gather(self.__task, return_exceptions=True)
+
+    async def __run(self) -> None:
+        self.state, self.started_at = "running", time.time()
+        try:
+            await self.__walk()
+            self.state = "done"
+        except asyncio.CancelledError:
+            self.state = "cancelled"
+        except Exception as e:
+            self.state, self.error = "failed", str(e)
+            log.warning(f"Prewarm [ {self.id} ] of [ {self.remote_name} ] failed: {e}", called_name="rclone", timestamp=True)
+        finally:
+            self.finished_at = time.time()
+
+    async def __walk(self) -> None:
+        queue = asyncio.Queue()
+        seen = set()
+        for path in self.paths:
+            root, pattern = self.__split(path)
+            queue.put_nowait((root, pattern))
+        # every worker lists one directory (listings fill the VFS directory cache) and then reads the
+        # matching files in it, so listing and content prefetch overlap across workers
+        workers = [asyncio.create_task(self.__work(queue, seen)) for _ in range(self.parallelism)]
+        try:
+            await queue.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    async def __work(self, queue: asyncio.Queue, seen: set) -> None:
+        while True:
+            relative, pattern = await queue.get()
+            try:
+                if (relative, pattern) not in seen:
+                    seen.add((relative, pattern))
+                    await self.__visit(queue, relative, pattern)
+            except OSError:
+                self.errors += 1
+            finally:
+                queue.task_done()
+
+    async def __visit(self, queue: asyncio.Queue, relative: str, pattern: tuple[str, ...] | None) -> None:
+        target = self.mount_path / relative if relative else self.mount_path
+        if not await asyncio.to_thread(target.is_dir):
+            # a plain file path
+            if pattern is None:
+                await self.__fetch(target)
+            return
+        entries = await asyncio.to_thread(lambda: [(x.name, x.is_dir(follow_symlinks=False)) for x in os.scandir(target)])
+        self.dirs += 1
+        for name, is_dir in entries:
+            child = f"{relative}/{name}" if relative else name
+            if is_dir:
+                if pattern is None or self.__reachable(PurePosixPath(child).parts, pattern):
+                    queue.put_nowait((child, pattern))
+            elif pattern is None or self.__match(PurePosixPath(child).parts, pattern):
+                await self.__fetch(self.mount_path / child)
+
+    async def __fetch(self, path: Path) -> None:
+        # the stat also fills the attribute cache for files named directly rather than listed
+        size = (await asyncio.to_thread(path.stat)).st_size
+        self.files += 1
+        if not self.contents or self.__reserved >= self.budget:
+            return
+        # reserved up front so parallel readers never overshoot the budget together
+        allowance = min(size, self.budget - self.__reserved)
+        self.__reserved += allowance
+        read = await asyncio.to_thread(self.__read, path, allowance)
+        self.bytes += read
+
+    @classmethod
+    def __read(cls, path: Path, allowance: int) -> int:
+        read = 0
+        with open(path, "rb", buffering=0) as f:
+            while read < allowance and (chunk := f.read(min(cls.__CHUNK, allowance - read))):
+                read += len(chunk)
+        return read
+
+
+class PrewarmJobs:
+    def __init__(self, retain: int = 100) -> None:
+        self.retain = retain
+        self.__jobs = OrderedDict()
+
+    def start(self, job: PrewarmJob) -> PrewarmJob:
+        self.__jobs[job.id] = job
+        job.start()
+        # finished jobs are kept for their reports, oldest dropped first
+        finished = [x for x in self.__jobs.values() if x.done]
+        for old in finished[:max(0, len(finished) - self.retain)]:
+            del self.__jobs[old.id]
+        return job
+
+    def __getitem__(self, job_id: str) -> PrewarmJob:
+        try:
+            return self.__jobs[job_id]
+        except KeyError as e:
+            e.add_note(f"Prewarm job {job_id} not found")
+            raise e
+
+    def list(self, remote_name: str = None) -> list[PrewarmJob]:
+        return [x for x in self.__jobs.values() if remote_name is None or x.remote_name == remote_name]
+
+    async def acancel(self, remote_name: str = None, job_id: str = None) -> None:
+        jobs = [self[job_id]] if job_id is not None else self.list(remote_name)
+        await asyncio.gather(*(x.acancel() for x in jobs))
@@ -0,0 +1,169 @@
+import asyncio, grp, json, os, pwd, shutil, socket, socketserver, struct, tempfile, time
+import subprocess as sp
+import regex as re
+from pathlib import Path
+from core.telemetry import COMMAND_SECONDS, COMMAND_FAILURES
+
+
+class PrivHelper:
+    OPS = ("up", "down", "show", "dump", "syncconf")
+    __interface = re.compile(r"^[A-Za-z0-9_=+.-]{1,15}$")
+
+    class _Handler(socketserver.StreamRequestHandler):
+        def handle(self) -> None:
+            helper = self.server.helper
+            if not helper.allowed(self.request):
+                self.wfile.write(json.dumps({"returncode": 126, "output": "permission denied"}).encode() + b"\n")
+                return
+            for line in self.rfile:
+                try:
+                    reply = helper.handle(json.loads(line))
+                except (ValueError, KeyError, TypeError) as e:
+                    reply = {"returncode": 2, "output": f"bad request: {e}"}
+                self.wfile.write(json.dumps(reply).encode() + b"\n")
+                self.wfile.flush()
+
+
+    class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+
+    def __init__(self, socket_path: str, allow_uids: list[int] = (), group: str = None,
+                 config_dir: str = "/etc/wireguard", timeout: float = 30.0) -> None:
+        self.socket_path = socket_path
+        self.allow_uids = {0, *allow_uids}
+        self.group = group
+        # the socket can only be handed to one owner; several users have to share it through a group
+        if group is None and len(self.allow_uids - {0}) > 1:
+            raise ValueError("more than one allowed uid needs a group to share the socket with")
+        try:
+            self.gid = grp.getgrnam(group).gr_gid if group is not None else None
+        except KeyError:
+            raise ValueError(f"group {group!r} does not exist")
+        self.config_dir = os.path.realpath(config_dir)
+        self.timeout = timeout
+        # resolved once at startup so requests never go through PATH lookups or a shell
+        self.__bin = {}
+        for name in ("wg", "wg-quick"):
+            if (path := shutil.which(name)) is None:
+                raise FileNotFoundError(f"{name} not found on PATH")
+            self.__bin[name] = path
+
+    def allowed(self, conn: socket.socket) -> bool:
+        try:
+            _, uid, gid = struct.unpack("3i", conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i")))
+        except (AttributeError, OSError):
+            return True  # no peer credentials on this platform; the socket mode is the only gate
+        return uid in self.allow_uids or (self.gid is not None and self.gid in self.groups(uid, gid))
+
+    @classmethod
+    def groups(cls, uid: int, gid: int) -> set[int]:
+        # SO_PEERCRED only carries the primary group; supplementary ones come from the group database
+        try:
+            return {gid, *os.getgrouplist(pwd.getpwuid(uid).pw_name, gid)}
+        except KeyError:
+            return {gid}
+
+    def config(self, value: str) -> str:
+        # names resolve through wg-quick's own lookup; paths must stay inside config_dir because
+        # wg-quick runs the config's PostUp/PreDown hooks as root
+        if self.__interface.match(value):
+            return value
+        path = os.path.realpath(value)
+        if not path.endswith(".conf") or os.path.dirname(path) != self.config_dir:
+            raise ValueError(f"config must be an interface name or a .conf file in {self.config_dir}")
+        return path
+
+    def interface(self, value: str) -> str:
+        name = Path(value).stem if value.endswith(".conf") else value
+        if not self.__interface.match(name):
+            raise ValueError(f"invalid interface name {name!r}")
+        return name
+
+    def __run(self, argv: list[str], timeout: float) -> dict:
+        try:
+            proc = sp.run(argv, stdin=sp.DEVNULL, stdout=sp.PIPE, stderr=sp.STDOUT, timeout=timeout)
+        except sp.TimeoutExpired as e:
+            return {"returncode": None, "timeout": True, "output": (e.stdout or b"").decode(errors="replace")}
+        return {"returncode": proc.returncode, "output": proc.stdout.decode(errors="replace")}
+
+    def handle(self, request: dict) -> dict:
+        op = request["op"]
+        timeout = self.timeout if request.get("timeout", None) is None else min(float(request["timeout"]), self.timeout)
+        if op == "up":
+            return self.__run([self.__bin["wg-quick"], "up", self.config(request["config"])], timeout)
+        if op == "down":
+            return self.__run([self.__bin["wg-quick"], "down", self.config(request["config"])], timeout)
+        if op == "show":
+            return self.__run([self.__bin["wg"], "show", self.interface(request["config"])], timeout)
+        if op == "dump":
+            return self.__run([self.__bin["wg"], "show", "all", "dump"], timeout)
+        if op == "syncconf":
+            config = self.config(request["config"])
+            stripped = self.__run([self.__bin["wg-quick"], "strip", config], timeout)
+            if stripped["returncode"] != 0:
+                return stripped
+            with tempfile.NamedTemporaryFile("w", prefix="delos-wg-", suffix=".conf") as f:
+                os.fchmod(f.fileno(), 0o600)
+                f.write(stripped["output"])
+                f.flush()
+                return self.__run([self.__bin["wg"], "syncconf", self.interface(request["config"]), f.name], timeout)
+        raise ValueError(f"unknown op {op!r}, expected one of {', '.join(self.OPS)}")
+
+    def serve_forever(self) -> None:
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        umask = os.umask(0o177)
+        try:
+            server = self._Server(self.socket_path, self._Handler)
+        finally:
+            os.umask(umask)
+        server.helper = self
+        users = sorted(self.allow_uids - {0})
+        if self.group is not None:
+            shutil.chown(self.socket_path, group=self.group)
+            os.chmod(self.socket_path, 0o660)
+        elif len(users) == 1:
+            os.chown(self.socket_path, users[0], -1)
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+            os.unlink(self.socket_path)
+
+
+class PrivHelperClient:
+    def __init__(self, path: str, timeout: float = 30.0) -> None:
+        self.path = path
+        self.timeout = timeout
+
+    def __request(self, op: str, config: str, timeout: float) -> bytes:
+        return json.dumps({"op": op, "config": config, "timeout": timeout}).encode() + b"\n"
+
+    def __result(self, op: str, config: str, timeout: float, line: bytes, tic: float) -> sp.CompletedProcess:
+        label = f"helper {op}"
+        COMMAND_SECONDS.labels(label).observe(time.perf_counter() - tic)
+        if not line:
+            raise ConnectionError(f"WireGuard helper on [ {self.path} ] closed the connection")
+        reply = json.loads(line)
+        argv = ["privhelper", op] + ([config] if config else [])
+        output = reply.get("output", "").encode()
+        if reply.get("timeout", False):
+            raise sp.TimeoutExpired(argv, timeout, output=output)
+        if reply["returncode"] != 0:
+            COMMAND_FAILURES.labels(label).inc()
+            raise sp.CalledProcessError(reply["returncode"], argv, output=output)
+        return sp.CompletedProcess(argv, 0, output)
+
+    async def acall(self, op: str, config: str = None, timeout: float = None) -> sp.CompletedProcess:
+        timeout = self.timeout if timeout is None else timeout
+        tic = time.perf_counter()
+        reader, writer = await asyncio.open_unix_connection(self.path)
+        try:
+            writer.write(self.__request(op, config, timeout))
+            await writer.drain()
+            line = await asyncio.wait_for(reader.readline(), timeout + 5)
+        finally:
+            writer.close()
+        return self.__result(op, config, timeout, line, tic)
+
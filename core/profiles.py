@@ -0,0 +1,126 @@
+import json
+import regex as re
+
+
+class RcloneProfile:
+    CACHE_MODES = ("off", "minimal", "writes", "full")
+    __size = re.compile(r"^(off|\d+(\.\d+)?([KMGTP]i?B?|[KMGTP]|B)?)$", re.IGNORECASE)
+    __duration = re.compile(r"^(off|0|(\d+(\.\d+)?(ns|us|ms|s|m|h|d|w|M|y))+)$")
+    __presets = {}
+
+    def __init__(
+        self,
+        name: str = "custom",
+        cache_mode: str = "writes",
+        cache_max_size: str = None,
+        cache_max_age: str = None,
+        buffer_size: str = None,
+        read_ahead: str = None,
+        chunk_size: str = None,
+        dir_cache_time: str = None,
+        transfers: int = None,
+        checkers: int = None,
+    ) -> None:
+        if cache_mode not in self.CACHE_MODES:
+            raise ValueError(f"Profile [ {name} ]: cache_mode must be one of {', '.join(self.CACHE_MODES)}, got {cache_mode!r}")
+        for field, value in (("cache_max_size", cache_max_size), ("buffer_size", buffer_size),
+                             ("read_ahead", read_ahead), ("chunk_size", chunk_size)):
+            if value is not None and not self.__size.match(str(value)):
+                raise ValueError(f"Profile [ {name} ]: {field} is not a size (e.g. 64M, 10G), got {value!r}")
+        for field, value in (("cache_max_age", cache_max_age), ("dir_cache_time", dir_cache_time)):
+            if value is not None and not self.__duration.match(str(value)):
+                raise ValueError(f"Profile [ {name} ]: {field} is not a duration (e.g. 30s, 5m, 72h), got {value!r}")
+        for field, value in (("transfers", transfers), ("checkers", checkers)):
+            if value is not None and (isinstance(value, bool) or not isinstance(value, int) or value < 1):
+                raise ValueError(f"Profile [ {name} ]: {field} must be a positive integer, got {value!r}")
+
+        self.name = name
+        self.cache_mode = cache_mode
+        self.cache_max_size = cache_max_size
+        self.cache_max_age = cache_max_age
+        self.buffer_size = buffer_size
+        self.read_ahead = read_ahead
+        self.chunk_size = chunk_size
+        self.dir_cache_time = dir_cache_time
+        self.transfers = transfers
+        self.checkers = checkers
+
+    @classmethod
+    def from_dict(cls, name: str, options: dict) -> "RcloneProfile":
+        try:
+            return cls(name=name, **options)
+        except TypeError as e:
+            raise ValueError(f"Profile [ {name} ]: {e}") from e
+
+    @classmethod
+    def register(cls, profile: "RcloneProfile") -> None:
+        cls.__presets[profile.name] = profile
+
+    @classmethod
+    def load(cls, path: str) -> None:
+        with open(path) as f:
+            for name, options in json.load(f).items():
+                cls.register(cls.from_dict(name, options))
+
+    @classmethod
+    def get(cls, name: str = None) -> "RcloneProfile":
+        try:
+            return cls.__presets[name or "default"]
+        except KeyError:
+            raise ValueError(f"Unknown rclone profile [ {name} ], expected one of {', '.join(cls.__presets)}") from None
+
+    @classmethod
+    def presets(cls) -> dict[str, "RcloneProfile"]:
+        return dict(cls.__presets)
+
+    # (field, mount flag, rc option group, rc option name)
+    __options = (
+        ("cache_mode", "--vfs-cache-mode", "vfsOpt", "CacheMode"),
+        ("cache_max_size", "--vfs-cache-max-size", "vfsOpt", "CacheMaxSize"),
+        ("cache_max_age", "--vfs-cache-max-age", "vfsOpt", "CacheMaxAge"),
+        ("read_ahead", "--vfs-read-ahead", "vfsOpt", "ReadAhead"),
+        ("chunk_size", "--vfs-read-chunk-size", "vfsOpt", "ChunkSize"),
+        ("dir_cache_time", "--dir-cache-time", "vfsOpt", "DirCacheTime"),
+        ("buffer_size", "--buffer-size", "_config", "BufferSize"),
+        ("transfers", "--transfers", "_config", "Transfers"),
+        ("checkers", "--checkers", "_config", "Checkers"),
+    )
+
+    def flags(self) -> list[str]:
+        flags = []
+        for field, flag, _, _ in self.__options:
+            if (value := getattr(self, field)) is not None:
+                flags.extend((flag, str(value)))
+        return flags
+
+    def rc_options(self) -> dict[str, dict]:
+        options = {"vfsOpt": {}, "_config": {}}
+        for field, _, group, key in self.__options:
+            if (value := getattr(self, field)) is not None:
+                options[group][key] = value
+        return {group: values for group, values in options.items() if values}
+
+    def to_dict(self) -> dict:
+        return {field: getattr(self, field) for field, _, _, _ in self.__options}
+
+
+RcloneProfile.register(RcloneProfile("default", cache_mode="writes"))
+RcloneProfile.register(RcloneProfile(
+    "media",
+    cache_mode="full",
+    cache_max_size="50G",
+    cache_max_age="72h",
+    buffer_size="64M",
+    read_ahead="256M",
+    chunk_size="64M",
+    dir_cache_time="1h",
+))
+RcloneProfile.register(RcloneProfile(
+    "smallfiles",
+    cache_mode="writes",
+    buffer_size="4M",
+    chunk_size="8M",
+    dir_cache_time="72h",
+    transfers=16,
+    checkers=32,
+))
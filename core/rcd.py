@@ -0,0 +1,146 @@
+import asyncio, base64, json, os, secrets, time
+import subprocess as sp
+from urllib.parse import urlsplit
+from utils import ByteRing, Settings
+from core import RcloneCmds
+from core.runner import CommandRunner
+from core.telemetry import COMMAND_SECONDS, COMMAND_FAILURES
+
+
+class RcClient:
+    def __init__(self, url: str, user: str = None, password: str = None, timeout: float = 30.0) -> None:
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.__target = urlsplit(self.url)
+        self.__headers = {"Content-Type": "application/json", "Connection": "close"}
+        if user is not None:
+            token = base64.b64encode(f"{user}:{password or ''}".encode()).decode()
+            self.__headers["Authorization"] = f"Basic {token}"
+
+    @classmethod
+    def __raise_for(cls, method: str, status: int, body: bytes) -> dict:
+        try:
+            reply = json.loads(body or b"{}")
+        except ValueError:
+            reply = {"error": body.decode(errors="replace")}
+        if status != 200:
+            COMMAND_FAILURES.labels(f"rc {method}").inc()
+            raise sp.CalledProcessError(status, f"rc {method}", output=str(reply.get("error", reply)).encode())
+        return reply
+
+    async def acall(self, method: str, params: dict = None) -> dict:
+        with COMMAND_SECONDS.labels(f"rc {method}").time():
+            return await self.__acall(method, params)
+
+    @classmethod
+    def __dechunk(cls, body: bytes) -> bytes:
+        chunks = []
+        while body:
+            size, _, body = body.partition(b"\r\n")
+            if (n := int(size.split(b";")[0], 16)) == 0:
+                break
+            chunks.append(body[:n])
+            body = body[n + 2:]
+        return b"".join(chunks)
+
+    async def __acall(self, method: str, params: dict = None) -> dict:
+        if self.__target.scheme == "unix":
+            opening = asyncio.open_unix_connection(self.__target.path)
+        else:
+            opening = asyncio.open_connection(self.__target.hostname, self.__target.port or 80)
+        reader, writer = await asyncio.wait_for(opening, self.timeout)
+        try:
+            payload = json.dumps(params or {}).encode()
+            headers = {**self.__headers, "Host": self.__target.netloc or "localhost", "Content-Length": str(len(payload))}
+            writer.write(f"POST /{method} HTTP/1.1\r\n".encode())
+            writer.write("".join(f"{k}: {v}\r\n" for k, v in headers.items()).encode() + b"\r\n" + payload)
+            await writer.drain()
+            raw = await asyncio.wait_for(reader.read(), self.timeout)
+        finally:
+            writer.close()
+        head, _, body = raw.partition(b"\r\n\r\n")
+        lines = head.decode(errors="replace").split("\r\n")
+        status = int(lines[0].split(" ")[1])
+        if any(x.lower().replace(" ", "") == "transfer-encoding:chunked" for x in lines[1:]):
+            body = self.__dechunk(body)
+        return self.__raise_for(method, status, body)
+
+
+class RcloneRcd:
+    def __init__(self, url: str = None, addr: str = "127.0.0.1:5572", startup_timeout: float = 10.0,
+                 user: str = None, password: str = None) -> None:
+        self.__external = url is not None
+        self.__addr = addr
+        self.__startup_timeout = startup_timeout
+        self.__proc = None
+        self.__drain = None
+        self.__log = ByteRing(Settings.LOG_BUFFER_SIZE)
+        self.__lock = asyncio.Lock()
+        if self.__external:
+            # a server we do not start is only safe with --rc-user/--rc-pass, so its credentials are configured
+            self.__client = RcClient(url, user, password)
+        else:
+            self.__user, self.__password = "delos", secrets.token_urlsafe(24)
+            self.__client = RcClient(f"http://{addr}", self.__user, self.__password)
+
+    @property
+    def external(self) -> bool:
+        return self.__external
+
+    @property
+    def client(self) -> RcClient:
+        return self.__client
+
+    @property
+    def log(self) -> ByteRing:
+        return self.__log
+
+    @property
+    def running(self) -> bool:
+        if self.__external:
+            return True
+        return self.__proc is not None and self.__proc.returncode is None
+
+    async def __await_ready(self, argv: list[str]) -> None:
+        deadline = time.monotonic() + self.__startup_timeout
+        while True:
+            try:
+                await self.__client.acall("rc/noop")
+                return
+            except (ConnectionError, OSError):
+                if self.__proc.returncode is not None:
+                    await asyncio.wait([self.__drain], timeout=1)
+                    raise sp.CalledProcessError(self.__proc.returncode, argv, output=self.__log.tail(20)[0])
+                if time.monotonic() > deadline:
+                    raise sp.TimeoutExpired(argv, self.__startup_timeout)
+                await asyncio.sleep(0.05)
+
+    async def astart(self) -> None:
+        async with self.__lock:
+            if self.running:
+                return
+            argv = CommandRunner.argv(RcloneCmds.rcd(self.__addr))
+            # credentials travel through the environment so they never show up in `ps`
+            env = {**os.environ, "RCLONE_RC_USER": self.__user, "RCLONE_RC_PASS": self.__password}
+            self.__proc = await asyncio.create_subprocess_exec(*argv, stdin=sp.DEVNULL, stdout=sp.PIPE, stderr=sp.STDOUT, env=env)
+            self.__drain = asyncio.create_task(self.__log.adrain(self.__proc.stdout))
+            try:
+                await self.__await_ready(argv)
+            except (sp.CalledProcessError, sp.TimeoutExpired) as e:
+                await self.astop()
+                e.add_note(f"Error starting rclone rcd on [ {self.__addr} ]")
+                raise e
+
+    async def astop(self, timeout: float = 10.0) -> None:
+        if self.__external or self.__proc is None:
+            return
+        if self.__proc.returncode is None:
+            self.__proc.terminate()  # rcd unmounts everything it serves on SIGTERM
+            if not await CommandRunner.aexited(self.__proc, timeout):
+                self.__proc.kill()
+        await CommandRunner.areap(self.__proc, self.__drain)
+        self.__proc = None
+
+    async def amount_points(self) -> set[str]:
+        reply = await self.__client.acall("mount/listmounts")
+        return {x["MountPoint"] for x in reply.get("mountPoints", None) or []}
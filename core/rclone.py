@@ -1,61 +1,139 @@
+import hashlib, math, os, secrets, shutil, tempfile
 import subprocess as sp
 from pathlib import Path
-from utils import Format, LogParent as log
+from utils import Format, LogParent as log, Settings, ByteRing
 from core import RcloneCmds
-import time
+from core.cache import StatusCache, StatusVersions
+from core.events import EventBus
+from core.journal import StateJournal
+from core.locks import KeyedLocks, SingleFlight
+from core.managed import Lifecycle, Periodic
+from core.mountwatch import MountWatcher
+from core.prewarm import PrewarmJob, PrewarmJobs
+from core.profiles import RcloneProfile
+from core.registry import Registry
+from core.rcd import RcClient, RcloneRcd
+from core.runner import CommandRunner
+from core.supervisor import Supervisor, await_exit as await_process
+from core.telemetry import COMMAND_SECONDS, OPERATION_SECONDS, MANAGED_INSTANCES
+from core.timeseries import SeriesRing
+import asyncio, time
 
 class RcloneManager:
     class _RcloneInstance:
-        def __init__(self, remote_name: str, mount_path: Path) -> None:
+        __slots__ = ("__remote_name", "__mount_path", "__profile", "__mount_proc", "__runner", "__watcher", "__log", "__drain",
+                     "__adopted", "__rc_socket", "__rc", "__rc_env")
+
+        def __init__(self, remote_name: str, mount_path: Path, profile: RcloneProfile, runner: CommandRunner, watcher: MountWatcher,
+                     rc_socket: Path = None) -> None:
             self.__remote_name = remote_name
             self.__mount_path = mount_path
+            self.__profile = profile
             self.__mount_proc = None
+            self.__runner = runner
+            self.__watcher = watcher
+            self.__log = None  # allocated on first use; most remotes never log much
+            self.__drain = None
+            self.__adopted = False
+            # a private rc listener per mount process, only used to read its transfer and cache stats
+            self.__rc_socket = rc_socket
+            self.__rc, self.__rc_env = None, None
+            if rc_socket is not None:
+                # a fresh secret per mount, passed through the environment so it never shows up in `ps`
+                user, password = "delos", secrets.token_urlsafe(24)
+                self.__rc = RcClient(f"unix://{rc_socket}", user, password, timeout=Settings.COMMAND_TIMEOUT)
+                self.__rc_env = {"RCLONE_RC_USER": user, "RCLONE_RC_PASS": password}
+
+        def __flags(self) -> list[str]:
+            if self.__rc_socket is None:
+                return self.__profile.flags()
+            self.__rc_socket.unlink(missing_ok=True)  # left behind by a process that died
+            return [*self.__profile.flags(), *RcloneCmds.rc_listen(str(self.__rc_socket))]
 
-        def mount(self) -> None:
+        async def amount(self) -> float:
+            if self.mounted:
+                return 0.0  # already mounted, nothing to wait for
+            argv = CommandRunner.argv(RcloneCmds.mount(self.__remote_name, str(self.__mount_path), self.__flags()))
+            self.__mount_proc = await self.__runner.spawn(argv, self.__rc_env)
+            start = self.log.offset
+            self.__drain = asyncio.create_task(self.log.adrain(self.__mount_proc.stdout))
             try:
-                self.__mount_proc = sp.Popen(
-                    RcloneCmds.mount(self.__remote_name, str(self.__mount_path)).split(),
-                    stdout=sp.PIPE, stderr=sp.STDOUT
-                )
-                time.sleep(1)  # Give the proc time to start/settle
+                latency = await self.__watcher.await_ready(self.__mount_path, self.__mount_proc, Settings.MOUNT_TIMEOUT)
+                COMMAND_SECONDS.labels("rclone mount").observe(latency)
+                return latency
             except sp.CalledProcessError as e:
+                await asyncio.wait([self.__drain], timeout=1)
+                output, _ = self.log.read(start)
+                await self.__reap()
+                e = sp.CalledProcessError(e.returncode, argv, output=output)
                 e.add_note(f"Error mounting [ {self.__remote_name} ]: {e.stdout.decode().strip()}")
                 raise e
+            except sp.TimeoutExpired as e:
+                await self.__atry_terminate()
+                await self.__reap()
+                e = sp.TimeoutExpired(argv, Settings.MOUNT_TIMEOUT)
+                e.add_note(f"Mount [ {self.__remote_name} ] not ready after {Settings.MOUNT_TIMEOUT}s")
+                raise e
 
-        def __force_kill(self) -> None:
-            self.__mount_proc.kill()
-            if self.__mount_proc.poll() is None:
-                raise TimeoutError(f"Process {self.__mount_proc.pid} failed to kill. Please kill it manually.")
-
-        def __try_terminate(self) -> None:
+        async def __atry_terminate(self) -> None:
             self.__mount_proc.terminate()
-            try:
-                self.__mount_proc.wait(timeout=5)
-            except sp.TimeoutExpired:
-                self.__force_kill()
-
-        def __ensure_stopped(self) -> None:
-            if self.__mount_proc is not None:
-                if self.__mount_proc.poll() is None:
-                    self.__try_terminate()
+            if not await CommandRunner.aexited(self.__mount_proc, 5):
+                self.__mount_proc.kill()
+                if not await CommandRunner.aexited(self.__mount_proc, 1):
+                    raise TimeoutError(f"Process {self.__mount_proc.pid} failed to kill. Please kill it manually.")
 
-        def unmount(self) -> None:
+        async def aunmount(self) -> None:
             try:
                 if self.mounted:
-                    sp.run(
-                        RcloneCmds.unmount(self.__mount_path),
-                        shell=True, stdout=sp.PIPE, stderr=sp.STDOUT, check=True
-                    )
-                    self.__ensure_stopped()
-                    self.__mount_proc = None
+                    await self.__runner.run(RcloneCmds.unmount(self.__mount_path))
+                    if self.__alive:
+                        await self.__atry_terminate()
+                    await self.__reap()
+                    self.__adopted = False
             except sp.CalledProcessError as e:
-                print()
                 e.add_note(f"Error unmounting [ {self.__remote_name} ]: {e.stdout.decode().strip()}")
                 raise e
             except TimeoutError as e:
-                e.add_note(f"Unable to kill process [ {self.__mount_proc.pid} ]: {e.stdout.decode().strip()}")
+                e.add_note(f"Unable to kill process [ {self.__mount_proc.pid} ]")
                 raise e
 
+        async def __reap(self) -> None:
+            proc, self.__mount_proc = self.__mount_proc, None
+            if proc is not None:
+                await CommandRunner.areap(proc, self.__drain)
+
+        @property
+        def __alive(self) -> bool:
+            return self.__mount_proc is not None and self.__mount_proc.returncode is None
+
+        @classmethod
+        def __budget(cls, deadline: float, share: float) -> float:
+            return max(0.0, deadline - time.monotonic()) * share
+
+        async def ateardown(self, deadline: float) -> str | None:
+            # fusermount -u, then SIGTERM, then SIGKILL, then a lazy unmount; each step
+            # gets half of what is left so the later ones still have time to run
+            if self.mounted:
+                try:
+                    await self.__runner.run(RcloneCmds.unmount(self.__mount_path), timeout=self.__budget(deadline, 0.5))
+                except (sp.CalledProcessError, sp.TimeoutExpired):
+                    pass
+            if self.__alive:
+                self.__mount_proc.terminate()
+                if not await CommandRunner.aexited(self.__mount_proc, self.__budget(deadline, 0.5)):
+                    self.__mount_proc.kill()
+                    if not await CommandRunner.aexited(self.__mount_proc, self.__budget(deadline, 0.5)):
+                        self.__mount_proc._transport.close()
+                        return f"process [ {self.__mount_proc.pid} ] still running after SIGKILL"
+            await self.__reap()
+            self.__adopted = False
+            if self.__watcher.mounted(self.__mount_path):
+                try:
+                    await self.__runner.run(RcloneCmds.force_unmount(self.__mount_path), timeout=self.__budget(deadline, 1.0))
+                except (sp.CalledProcessError, sp.TimeoutExpired):
+                    return f"[ {self.__mount_path} ] is still mounted"
+            return None
+
         @property
         def remote_name(self) -> str:
             return self.__remote_name
@@ -64,67 +142,527 @@ class RcloneManager:
         def mount_path(self) -> Path:
             return self.__mount_path
 
+        @property
+        def profile(self) -> RcloneProfile:
+            return self.__profile
+
         @property
         def mounted(self) -> bool:
-            if self.__mount_proc is None or self.__mount_proc.poll() is not None:
+            if self.__adopted:
+                return self.__watcher.mounted(self.__mount_path)
+            if self.__mount_proc is None or not self.__alive:
                 return False
             return True
 
+        async def aadopt(self) -> bool:
+            # a mount left behind by a previous run; we own it from here on but have no process for it
+            self.__adopted = self.__watcher.mounted(self.__mount_path)
+            return self.__adopted
+
+        @property
+        def pid(self) -> int | None:
+            return self.__mount_proc.pid if self.__alive else None
+
+        async def await_exit(self) -> str:
+            code = await await_process(self.__mount_proc)
+            tail = self.log.tail(1)[0].decode(errors="replace").strip()
+            return f"rclone exited with code {code}" + (f": {tail}" if tail else "")
+
+        async def astats(self) -> tuple[dict, dict] | None:
+            if self.__rc is None or not self.__alive:
+                return None
+            core, vfs = await asyncio.gather(self.__rc.acall("core/stats"), self.__rc.acall("vfs/stats"))
+            return core, vfs
+
+        async def arecover(self) -> None:
+            # a crashed rclone leaves a dead FUSE endpoint behind that would block the next mount
+            await self.__reap()
+            self.__adopted = False
+            if self.__watcher.mounted(self.__mount_path):
+                await self.__runner.run(RcloneCmds.force_unmount(self.__mount_path))
+
+        @property
+        def log(self) -> ByteRing:
+            if self.__log is None:
+                self.__log = ByteRing(Settings.LOG_BUFFER_SIZE)
+            return self.__log
+
+
+    class _RcdRcloneInstance:
+        __slots__ = ("__remote_name", "__mount_path", "__profile", "__rcd", "__cache")
+
+        def __init__(self, remote_name: str, mount_path: Path, profile: RcloneProfile, rcd: RcloneRcd, cache: StatusCache) -> None:
+            self.__remote_name = remote_name
+            self.__mount_path = mount_path
+            self.__profile = profile
+            self.__rcd = rcd
+            self.__cache = cache
+
+        async def amount(self) -> float:
+            if await self.amounted():
+                return 0.0  # already mounted, nothing to wait for
+            await self.__rcd.astart()
+            tic = time.perf_counter()
+            try:
+                await self.__rcd.client.acall("mount/mount", RcloneCmds.rc_mount(self.__remote_name, str(self.__mount_path), self.__profile.rc_options()))
+                return time.perf_counter() - tic
+            except sp.CalledProcessError as e:
+                e.add_note(f"Error mounting [ {self.__remote_name} ]: {e.stdout.decode().strip()}")
+                raise e
+            finally:
+                self.__cache.invalidate(("rclone", "rcd"))
+
+        async def aunmount(self) -> None:
+            try:
+                if await self.amounted():
+                    await self.__rcd.client.acall("mount/unmount", {"mountPoint": str(self.__mount_path)})
+            except sp.CalledProcessError as e:
+                e.add_note(f"Error unmounting [ {self.__remote_name} ]: {e.stdout.decode().strip()}")
+                raise e
+            finally:
+                self.__cache.invalidate(("rclone", "rcd"))
+
+        @property
+        def remote_name(self) -> str:
+            return self.__remote_name
+
+        @property
+        def mount_path(self) -> Path:
+            return self.__mount_path
+
+        @property
+        def profile(self) -> RcloneProfile:
+            return self.__profile
+
+        @property
+        def log(self) -> ByteRing:
+            return self.__rcd.log
+
+        @property
+        def mounted(self) -> bool:
+            # never asks rcd itself: the async paths refresh the shared mount list, this only reads it
+            if not self.__rcd.running:
+                return False
+            return str(self.__mount_path) in self.__cache.peek(("rclone", "rcd"), set())
+
+        async def amounted(self) -> bool:
+            if not self.__rcd.running:
+                return False
+            mount_points, _ = await self.__cache.aget(("rclone", "rcd"), self.__rcd.amount_points)
+            return str(self.__mount_path) in mount_points
+
+        async def aadopt(self) -> bool:
+            return await self.amounted()
+
+        async def astats(self) -> tuple[dict, dict] | None:
+            # transfers are counted server-wide by rcd, so only the VFS figures are per mount
+            if not self.__rcd.running:
+                return None
+            return {}, await self.__rcd.client.acall("vfs/stats", {"fs": f"{self.__remote_name}:"})
 
-    def __init__(self) -> None:
+        async def ateardown(self, deadline: float) -> str | None:
+            try:
+                await asyncio.wait_for(self.aunmount(), max(0.0, deadline - time.monotonic()))
+                return None
+            except asyncio.TimeoutError:
+                return "rc mount/unmount did not finish before the shutdown deadline"
+            except (sp.CalledProcessError, ConnectionError) as e:
+                return " ".join(getattr(e, "__notes__", [])) or str(e)
+
+
+    # registry state after each event that changes it
+    __STATES = {"mount-ready": "mounted", "unmounted": "unmounted", "failed": "failed"}
+    # SeriesRing columns sampled per mount from core/stats and vfs/stats
+    __COLUMNS = ("bytes", "transfers", "errors", "cache_bytes", "cache_files", "open_files", "uploads_queued", "uploads_in_progress")
+
+    def __init__(self, cache: StatusCache = None, runner: CommandRunner = None, backend: str = None, journal: StateJournal = None,
+                 events: EventBus = None) -> None:
         log.info("{}Starting Rclone Manager{}".format(
             Format.PURPLE, Format.END
         ), called_name="rclone", timestamp=True)
 
-        self.__instances = {}
+        self.__instances = Registry("Rclone")
+        self.__cache = cache or StatusCache(ttl=Settings.STATUS_TTL)
+        self.__runner = runner or CommandRunner(Settings.SUBPROCESS_CONCURRENCY, Settings.COMMAND_TIMEOUT)
+        self.__watcher = MountWatcher(Settings.MOUNTINFO, Settings.MOUNT_POLL_INTERVAL)
+        self.__versions = StatusVersions()
+        self.__lifecycle = Lifecycle("rclone", "Rclone", self.__instances, self.__versions, self.__STATES,
+                                     self.__supervise, journal, events)
+        # per-resource exclusion; identical concurrent requests share one execution
+        self.__locks = KeyedLocks()
+        self.__flights = SingleFlight()
+        self.__supervisor = None
+        MANAGED_INSTANCES.labels("rclone").set_function(lambda: len(self.__instances))
+        if Settings.RCLONE_PROFILES is not None:
+            RcloneProfile.load(Settings.RCLONE_PROFILES)
+        self.__rcd = None
+        if (backend or Settings.RCLONE_BACKEND) == "rcd":
+            self.__rcd = RcloneRcd(url=Settings.RCLONE_RC_URL, addr=Settings.RCLONE_RC_ADDR,
+                                   user=Settings.RCLONE_RC_USER, password=Settings.RCLONE_RC_PASS)
+        elif (backend or Settings.RCLONE_BACKEND) != "process":
+            raise ValueError(f"Unknown rclone backend [ {backend or Settings.RCLONE_BACKEND} ]")
+        self.__series = {}
+        self.__latest = {}
+        self.__sampler = Periodic("Rclone stats sample", "rclone")
+        self.__prewarm = PrewarmJobs()
+        self.__autoprewarm = {}
+        self.__rc_dir, self.__own_rc_dir = None, False
+        if Settings.RCLONE_STATS_INTERVAL > 0 and self.__rcd is None:
+            if Settings.RCLONE_RC_DIR is not None:
+                self.__rc_dir = Path(Settings.RCLONE_RC_DIR)
+                self.__rc_dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+                os.chmod(self.__rc_dir, 0o700)  # mkdir leaves the mode of an existing directory alone
+            else:
+                self.__rc_dir, self.__own_rc_dir = Path(tempfile.mkdtemp(prefix="delos-rc-")), True
 
-    def __enter__(self) -> None:
+    async def __aenter__(self) -> None:
+        # rcd mounts live inside one rc server, so only per-mount processes are supervised
+        if Settings.SUPERVISE and self.__rcd is None:
+            self.__supervisor = Supervisor("Rclone", self.__restart, on_change=self.__supervision_changed)
+        if Settings.RCLONE_STATS_INTERVAL > 0:
+            self.start_sampler(Settings.RCLONE_STATS_INTERVAL)
         return self
 
-    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
-        for instance in list(self.__instances.keys()):
-            self.remove(instance)
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self.ashutdown(time.monotonic() + Settings.SHUTDOWN_DEADLINE)
+
+    async def ashutdown(self, deadline: float) -> dict[str, str]:
+        if self.__lifecycle.closing:
+            return {}
+        self.__lifecycle.closing = True
+        await self.astop_sampler()
+        await self.__prewarm.acancel()
+        if self.__supervisor is not None:
+            await self.__supervisor.aclose()
+        if self.__detach:
+            return {}
+        if self.__rcd is not None and self.__rcd.running and self.__instances:
+            try:
+                await asyncio.wait_for(
+                    self.__cache.aget(("rclone", "rcd"), self.__rcd.amount_points), max(0.0, deadline - time.monotonic())
+                )
+            except (asyncio.TimeoutError, sp.CalledProcessError, ConnectionError):
+                pass
+        remotes = list(self.__instances.keys())
+        results = await asyncio.gather(
+            *(self.__instances[remote_name].ateardown(deadline) for remote_name in remotes), return_exceptions=True
+        )
+        failed = {}
+        for remote_name, result in zip(remotes, results):
+            if isinstance(result, Exception):
+                failed[remote_name] = str(result)
+            elif result is not None:
+                failed[remote_name] = result
+            else:
+                del self.__instances[remote_name]
+            self.__cache.invalidate(("rclone", remote_name))
+        if self.__rcd is not None:
+            await self.__rcd.astop(max(0.0, deadline - time.monotonic()))
+        if self.__own_rc_dir and not failed:
+            shutil.rmtree(self.__rc_dir, ignore_errors=True)
+        for remote_name, reason in failed.items():
+            log.warning(f"Rclone [ {remote_name} ] failed to stop: {reason}", called_name="rclone", timestamp=True)
+        return failed
+
+    @property
+    def __detach(self) -> bool:
+        # only mounts served by an rc server we do not own outlive us; our own rclone
+        # children log into pipes that close with this process
+        return Settings.DETACH_ON_EXIT and self.__rcd is not None and self.__rcd.external
 
-    def __getitem__(self, remote_name: str) -> _RcloneInstance:
+    def __getitem__(self, remote_name: str) -> _RcloneInstance | _RcdRcloneInstance:
         return self.__instances.get(remote_name, None)
 
-    def __delitem__(self, remote_name: str) -> None:
-        self.remove(remote_name)
+    def add(self, remote_name: str, mount_path: Path = None, profile: str | RcloneProfile = None, tags: list[str] = None,
+            prewarm: list[str] = None, prewarm_contents: bool = False) -> None:
+        if prewarm:
+            PrewarmJob.validate(prewarm)
+        self.__add(remote_name, mount_path, profile, tags or [])
+        if prewarm:
+            self.__autoprewarm[remote_name] = {"paths": list(prewarm), "contents": prewarm_contents}
+        self.__record(remote_name, mounted=False)
+        instance = self.__instances[remote_name]
+        self.__lifecycle.emit("added", remote_name, mount_path=str(instance.mount_path), profile=instance.profile.name,
+                    tags=list(self.__instances.tags(remote_name)))
 
-    def add(self, remote_name: str, mount_path: Path = None) -> None:
-        if remote_name in self.__instances.keys():
+    def __add(self, remote_name: str, mount_path: Path, profile: str | RcloneProfile, tags: list[str]) -> None:
+        if remote_name in self.__instances:
             raise KeyError(f"Rclone instance for {remote_name} already exists")
-        self.__instances[remote_name] = self._RcloneInstance(remote_name, mount_path)
+        if not isinstance(profile, RcloneProfile):
+            profile = RcloneProfile.get(profile)
+        if self.__rcd is not None:
+            instance = self._RcdRcloneInstance(remote_name, mount_path, profile, self.__rcd, self.__cache)
+        else:
+            instance = self._RcloneInstance(remote_name, mount_path, profile, self.__runner, self.__watcher, self.__rc_socket(remote_name))
+        # two remotes on one mount point would shadow each other; refused here rather than by FUSE later
+        self.__instances.add(remote_name, instance, "unmounted", path=mount_path, tags=tags)
+        self.__cache.invalidate(("rclone", remote_name))
 
-    def mount(self, remote_name: str) -> Path | None:
-        try:
-            self.__instances[remote_name].mount()
-        except KeyError as e:
-            e.add_note(f"Rclone instance for {remote_name} not found")
-            raise e
+    def __rc_socket(self, remote_name: str) -> Path | None:
+        # hashed: unix socket paths are limited to ~100 bytes and remote names are not
+        if self.__rc_dir is None:
+            return None
+        return self.__rc_dir / f"{hashlib.blake2s(remote_name.encode(), digest_size=8).hexdigest()}.sock"
 
-    def unmount(self, remote_name: str) -> bool:
-        try:
-            self.__instances[remote_name].unmount()
-        except KeyError as e:
-            e.add_note(f"Rclone instance for {remote_name} not found")
-            raise e
+    def __record(self, remote_name: str, **state) -> None:
+        if not state:
+            self.__lifecycle.record(remote_name)
+            return
+        instance = self.__instances[remote_name]
+        self.__lifecycle.record(remote_name, {
+            "mount_path": str(instance.mount_path), "profile": instance.profile.name,
+            "tags": list(self.__instances.tags(remote_name)), "prewarm": self.__autoprewarm.get(remote_name, None), **state,
+        })
+
+    @OPERATION_SECONDS.timed("rclone", "mount")
+    async def amount(self, remote_name: str) -> float:
+        return await self.__flights.ado(remote_name, "mount", lambda: self.__amount(remote_name))
+
+    async def __amount(self, remote_name: str) -> float:
+        async with self.__locks.ahold(remote_name):
+            try:
+                instance = self.__instances[remote_name]
+                self.__lifecycle.emit("mounting", remote_name)
+                latency = await instance.amount()
+                self.__record(remote_name, mounted=True)
+                self.__supervise(remote_name)
+                self.__lifecycle.emit("mount-ready", remote_name, latency=latency)
+                if (auto := self.__autoprewarm.get(remote_name, None)) is not None and all(x.done for x in self.__prewarm.list(remote_name)):
+                    self.__start_prewarm(remote_name, auto["paths"], auto["contents"])
+                return latency
+            except KeyError as e:
+                e.add_note(f"Rclone instance for {remote_name} not found")
+                raise e
+            except Exception as e:
+                self.__lifecycle.failed(remote_name, "mount", e)
+                raise e
+            finally:
+                self.__cache.invalidate(("rclone", remote_name))
+
+    @OPERATION_SECONDS.timed("rclone", "unmount")
+    async def aunmount(self, remote_name: str) -> None:
+        await self.__flights.ado(remote_name, "unmount", lambda: self.__aunmount(remote_name))
+
+    async def __aunmount(self, remote_name: str) -> None:
+        async with self.__locks.ahold(remote_name):
+            try:
+                await self.__release(remote_name)
+                instance = self.__instances[remote_name]
+                self.__lifecycle.emit("unmounting", remote_name)
+                await instance.aunmount()
+                self.__record(remote_name, mounted=False)
+                self.__lifecycle.emit("unmounted", remote_name)
+            except KeyError as e:
+                e.add_note(f"Rclone instance for {remote_name} not found")
+                raise e
+            except Exception as e:
+                self.__lifecycle.failed(remote_name, "unmount", e)
+                raise e
+            finally:
+                self.__cache.invalidate(("rclone", remote_name))
+
+    @OPERATION_SECONDS.timed("rclone", "remove")
+    async def aremove(self, remote_name: str) -> None:
+        await self.__flights.ado(remote_name, "remove", lambda: self.__aremove(remote_name))
 
-    def remove(self, remote_name: str) -> bool:
+    async def __aremove(self, remote_name: str) -> None:
+        async with self.__locks.ahold(remote_name):
+            try:
+                await self.__release(remote_name)
+                await self.__instances[remote_name].aunmount()
+                del self.__instances[remote_name]
+                self.__autoprewarm.pop(remote_name, None)
+                self.__versions.discard(remote_name)
+                self.__record(remote_name)
+                self.__lifecycle.emit("removed", remote_name)
+            except KeyError as e:
+                e.add_note(f"Rclone instance for {remote_name} not found")
+                raise e
+            except Exception as e:
+                self.__lifecycle.failed(remote_name, "remove", e)
+                raise e
+            finally:
+                self.__cache.invalidate(("rclone", remote_name))
+
+    def __supervise(self, remote_name: str) -> None:
+        instance = self.__instances[remote_name]
+        if self.__supervisor is not None and getattr(instance, "pid", None) is not None:
+            self.__supervisor.watch(remote_name, instance.await_exit)
+
+    def __supervision(self, remote_name: str) -> dict:
+        if self.__supervisor is None or (state := self.__supervisor.state(remote_name)) is None:
+            return {}
+        return {"supervisor": dict(state)}
+
+    async def __release(self, remote_name: str) -> None:
+        # everything that works on a mount stops before it goes away: supervision and prewarm walks
+        if self.__supervisor is not None:
+            self.__supervisor.forget(remote_name)
+        await self.__prewarm.acancel(remote_name)
+
+    async def __restart(self, remote_name: str) -> None:
+        async with self.__locks.ahold(remote_name):
+            try:
+                instance = self.__instances[remote_name]
+                await instance.arecover()
+                latency = await instance.amount()
+                self.__supervise(remote_name)
+                self.__lifecycle.emit("mount-ready", remote_name, latency=latency, restarted=True)
+            finally:
+                self.__cache.invalidate(("rclone", remote_name))
+
+    def __supervision_changed(self, remote_name: str) -> None:
+        self.__cache.invalidate(("rclone", remote_name))
+        self.__lifecycle.supervision_changed(remote_name, self.__supervisor.state(remote_name))
+
+    async def arestore(self) -> dict[str, str]:
+        if (journaled := self.__lifecycle.entries()) is None:
+            return {}
+        entries, report = {}, {}
+        for remote_name, state in journaled.items():
+            try:
+                self.__add(remote_name, Path(state["mount_path"]), state.get("profile", None), state.get("tags", []))
+                if state.get("prewarm", None):
+                    self.__autoprewarm[remote_name] = state["prewarm"]
+                entries[remote_name] = state
+            except (KeyError, ValueError) as e:
+                report[remote_name] = "failed"
+                self.__lifecycle.restore_failed(remote_name, e)
+        if self.__rcd is not None and self.__rcd.running and entries:
+            self.__cache.invalidate(("rclone", "rcd"))
+            await self.__cache.aget(("rclone", "rcd"), self.__rcd.amount_points)
+
+        async def restore(remote_name: str, state: dict) -> str:
+            if not state.get("mounted", False):
+                return "added"
+            if await self.__instances[remote_name].aadopt():
+                return self.__lifecycle.adopt(remote_name, "mounted")
+            await self.amount(remote_name)
+            return "mounted"
+
+        return await self.__lifecycle.arestore(entries, restore, report)
+
+    async def alogs(self, remote_name: str, since: int = None, lines: int = 100, wait: float = 0) -> tuple[bytes, int]:
         try:
-            self.__instances[remote_name].unmount()
-            del self.__instances[remote_name]
+            ring = self.__instances[remote_name].log
         except KeyError as e:
             e.add_note(f"Rclone instance for {remote_name} not found")
             raise e
+        if since is None:
+            return ring.tail(lines)
+        if wait > 0:
+            await ring.wait(since, wait)
+        return ring.read(since)
 
     @property
     def remotes(self) -> list[str]:
         return list(self.__instances.keys())
 
-    @property
-    def status(self) -> dict:
-        return {
-            remote_name: {"mounted": instance.mounted, "mount_path": instance.mount_path}
-            for remote_name, instance in self.__instances.items()
-        }
+    @OPERATION_SECONDS.timed("rclone", "status")
+    async def acached_status(self, state: str = None, tag: str = None) -> tuple[dict, dict]:
+        if self.__rcd is not None and self.__rcd.running and self.__instances:
+            await self.__cache.aget(("rclone", "rcd"), self.__rcd.amount_points)
+        status, metas = {}, []
+        for remote_name in self.__instances.select(state, tag):
+            if (instance := self.__instances.get(remote_name, None)) is None:
+                continue
+            status[remote_name], meta = self.__cache.get(("rclone", remote_name), lambda: self.__entry(remote_name, instance))
+            metas.append(meta)
+        partial = state is not None or tag is not None
+        return status, {**StatusCache.merge(metas), "versions": self.__versions.observe(status, partial=partial)}
+
+    def __entry(self, remote_name: str, instance: _RcloneInstance | _RcdRcloneInstance) -> dict:
+        entry = {"mounted": instance.mounted, "mount_path": instance.mount_path, "profile": instance.profile.name,
+                 "state": self.__instances.state(remote_name), **self.__supervision(remote_name)}
+        if tags := self.__instances.tags(remote_name):
+            entry["tags"] = list(tags)
+        return entry
+
+    def __start_prewarm(self, remote_name: str, paths: list[str], contents: bool = False, budget: int = None,
+                        parallelism: int = None) -> PrewarmJob:
+        job = PrewarmJob(remote_name, self.__instances[remote_name].mount_path, paths, contents, budget, parallelism)
+        self.__prewarm.start(job)
+        log.info(f"Prewarming [ {remote_name} ]: {', '.join(paths)}", called_name="rclone", timestamp=True)
+        return job
+
+    async def aprewarm(self, remote_name: str, paths: list[str], contents: bool = False, budget: int = None,
+                       parallelism: int = None) -> dict:
+        if (state := self.__instances.state(remote_name)) is None:
+            raise KeyError(f"Rclone instance for {remote_name} not found")
+        if state != "mounted":
+            raise ValueError(f"Rclone instance for {remote_name} is not mounted")
+        return self.__start_prewarm(remote_name, paths, contents, budget, parallelism).status()
+
+    def prewarm_jobs(self, remote_name: str = None, job_id: str = None) -> dict[str, dict]:
+        jobs = [self.__prewarm[job_id]] if job_id is not None else self.__prewarm.list(remote_name)
+        return {job.id: job.status() for job in jobs}
+
+    async def acancel_prewarm(self, job_id: str) -> dict:
+        await self.__prewarm.acancel(job_id=job_id)
+        return self.__prewarm[job_id].status()
+
+    def start_sampler(self, interval: float, capacity: int = None) -> None:
+        capacity = capacity or Settings.RCLONE_STATS_CAPACITY
+        self.__sampler.start(interval, lambda: self.asample(capacity, retention=interval * capacity), timeout=interval)
+
+    async def astop_sampler(self) -> None:
+        await self.__sampler.astop()
+
+    async def __astats(self, remote_name: str) -> tuple[dict, dict] | None:
+        if (instance := self.__instances.get(remote_name, None)) is None:
+            return None
+        try:
+            return await instance.astats()
+        except (sp.CalledProcessError, OSError):
+            return None  # the listener is not up yet, or the process just went away
+
+    async def asample(self, capacity: int, retention: float) -> None:
+        remotes = self.__instances.select("mounted")
+        results = await asyncio.gather(*(self.__astats(remote_name) for remote_name in remotes))
+        now = time.time()
+        for remote_name, result in zip(remotes, results):
+            if result is None:
+                continue
+            core, vfs = result
+            disk = vfs.get("diskCache", {})
+            if (ring := self.__series.get(remote_name, None)) is None:
+                ring = self.__series[remote_name] = SeriesRing(capacity, len(self.__COLUMNS))
+            # missing figures are stored as NaN, e.g. transfer counters for rcd mounts, whose core/stats are server-wide
+            values = [source.get(key, None) for source, key in (
+                (core, "bytes"), (core, "transfers"), (core, "errors"), (disk, "bytesUsed"), (disk, "files"),
+                (vfs, "inUse"), (disk, "uploadsQueued"), (disk, "uploadsInProgress"),
+            )]
+            ring.append(now, *(float(x) if x is not None else math.nan for x in values))
+            self.__latest[remote_name] = {
+                "transferring": len(core.get("transferring", None) or []) if core else None,
+                "last_error": core.get("lastError", None) or None,
+                "cache_out_of_space": disk.get("outOfSpace", None),
+            }
+        for remote_name, ring in list(self.__series.items()):
+            if remote_name not in self.__instances or ring.last_time < now - retention:
+                del self.__series[remote_name]
+                self.__latest.pop(remote_name, None)
+
+    @classmethod
+    def __number(cls, value: float) -> int | None:
+        return None if value != value else int(value)
+
+    def stats(self, window: float, resolution: float) -> tuple[dict, dict]:
+        now = time.time()
+        stats = {remote_name: {} for remote_name in self.__instances}
+        for remote_name, ring in list(self.__series.items()):
+            if remote_name not in stats:
+                continue
+            points = [row for row in ring.rates(now - window, resolution, (0,)) if row[1] == row[1]]
+            last = len(ring) - 1
+            stats[remote_name] = {
+                **{name: self.__number(ring.value(last, column)) for column, name in enumerate(self.__COLUMNS)},
+                "bytes_rate": points[-1][1] if points else None,
+                **self.__latest.get(remote_name, {}),
+                "sampled_at": ring.last_time,
+                "series": points,
+            }
+        total = {name: sum(x[name] for x in stats.values() if x.get(name, None) is not None)
+                 for name in (*self.__COLUMNS, "bytes_rate")}
+        total["mounts"] = len(stats)
+        return stats, total
@@ -0,0 +1,116 @@
+import os, threading
+from pathlib import Path
+from typing import Any, Hashable, Iterable, Iterator
+
+
+class Registry:
+    # managed instances by key, with secondary indexes by state, mount path and tag that are kept in
+    # step on every change, so a filtered lookup costs the size of its result rather than a scan
+    def __init__(self, kind: str) -> None:
+        self.kind = kind
+        self.__items = {}
+        self.__states = {}
+        self.__tags = {}
+        self.__paths = {}
+        self.__by_state = {}
+        self.__by_tag = {}
+        self.__by_path = {}
+        self.__guard = threading.Lock()
+
+    @classmethod
+    def normpath(cls, path: str | Path) -> str:
+        return os.path.normpath(os.path.abspath(os.path.expanduser(str(path))))
+
+    def add(self, key: Hashable, item: Any, state: str, path: str | Path = None, tags: Iterable[str] = ()) -> None:
+        path = self.normpath(path) if path is not None else None
+        tags = tuple(dict.fromkeys(tags))
+        with self.__guard:
+            if key in self.__items:
+                raise KeyError(f"{self.kind} instance for {key} already exists")
+            if path is not None and (owner := self.__by_path.get(path, None)) is not None:
+                raise KeyError(f"Mount path {path} is already used by {self.kind} instance {owner}")
+            self.__items[key] = item
+            self.__states[key] = state
+            self.__by_state.setdefault(state, {})[key] = None
+            self.__tags[key] = tags
+            for tag in tags:
+                self.__by_tag.setdefault(tag, {})[key] = None
+            if path is not None:
+                self.__paths[key] = path
+                self.__by_path[path] = key
+
+    def __delitem__(self, key: Hashable) -> None:
+        with self.__guard:
+            del self.__items[key]
+            self.__unindex(self.__by_state, self.__states.pop(key), key)
+            for tag in self.__tags.pop(key):
+                self.__unindex(self.__by_tag, tag, key)
+            if (path := self.__paths.pop(key, None)) is not None:
+                del self.__by_path[path]
+
+    @classmethod
+    def __unindex(cls, index: dict, value: Hashable, key: Hashable) -> None:
+        keys = index[value]
+        del keys[key]
+        if not keys:
+            del index[value]
+
+    def mark(self, key: Hashable, state: str) -> bool:
+        with self.__guard:
+            if (previous := self.__states.get(key, None)) is None or previous == state:
+                return False
+            self.__unindex(self.__by_state, previous, key)
+            self.__states[key] = state
+            self.__by_state.setdefault(state, {})[key] = None
+            return True
+
+    def state(self, key: Hashable) -> str | None:
+        return self.__states.get(key, None)
+
+    def tags(self, key: Hashable) -> tuple[str, ...]:
+        return self.__tags.get(key, ())
+
+    def owner(self, path: str | Path) -> Hashable | None:
+        return self.__by_path.get(self.normpath(path), None)
+
+    def select(self, state: str = None, tag: str = None) -> list[Hashable]:
+        with self.__guard:
+            if state is None and tag is None:
+                return list(self.__items)
+            candidates = [x for x in (
+                self.__by_state.get(state, {}) if state is not None else None,
+                self.__by_tag.get(tag, {}) if tag is not None else None,
+            ) if x is not None]
+            # walk the smaller index, probe the other
+            candidates.sort(key=len)
+            return [key for key in candidates[0] if all(key in other for other in candidates[1:])]
+
+    def counts(self) -> dict[str, int]:
+        return {state: len(keys) for state, keys in self.__by_state.items()}
+
+    def __getitem__(self, key: Hashable) -> Any:
+        return self.__items[key]
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        return self.__items.get(key, default)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.__items
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(self.__items)
+
+    def __len__(self) -> int:
+        return len(self.__items)
+
+    def __bool__(self) -> bool:
+        return bool(self.__items)
+
+    def keys(self):
+        return self.__items.keys()
+
+    def values(self):
+        return self.__items.values()
+
+    def items(self):
+        return self.__items.items()
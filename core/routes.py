@@ -0,0 +1,135 @@
+import ipaddress, socket, threading
+from pathlib import Path
+
+
+class RouteIndex:
+    # longest-prefix match over the AllowedIPs of the managed configs. Each address family keeps one hash
+    # table per prefix length in use, keyed by the network bits; a lookup shifts the address once per length,
+    # longest first, so it costs a few dict probes however many routes there are
+    def __init__(self) -> None:
+        self.__tables = {4: {}, 6: {}}
+        self.__lengths = {4: (), 6: ()}
+        self.__configs = {}
+        self.__guard = threading.Lock()
+
+    @classmethod
+    def parse(cls, text: str) -> list[dict]:
+        peers, peer = [], None
+        for line in text.splitlines():
+            line = line.split("#", 1)[0].strip()
+            if line.startswith("["):
+                peer = {"public_key": None, "endpoint": None, "allowed_ips": []} if line.lower() == "[peer]" else None
+                if peer is not None:
+                    peers.append(peer)
+            elif peer is not None and "=" in line:
+                key, value = (x.strip() for x in line.split("=", 1))
+                key = key.lower()
+                if key == "publickey":
+                    peer["public_key"] = value
+                elif key == "endpoint":
+                    peer["endpoint"] = value
+                elif key == "allowedips":
+                    peer["allowed_ips"] += [x.strip() for x in value.split(",") if x.strip()]
+        return peers
+
+    @classmethod
+    def __load(cls, config: str, path: Path) -> list[dict]:
+        routes = []
+        for peer in cls.parse(path.read_text()):
+            for allowed in peer["allowed_ips"]:
+                try:
+                    network = ipaddress.ip_network(allowed, strict=False)
+                except ValueError as e:
+                    e.add_note(f"Invalid AllowedIPs entry {allowed!r} in {path}")
+                    raise e
+                routes.append({"config": config, "network": network, "peer": peer["public_key"], "endpoint": peer["endpoint"]})
+        return routes
+
+    def update(self, config: str, path: str | Path) -> bool:
+        path = Path(path)
+        try:
+            mtime = path.stat().st_mtime_ns
+        except OSError:
+            mtime = None
+        if (current := self.__configs.get(config, None)) is not None and current[0] == mtime:
+            return False
+        routes, error = [], None
+        if mtime is not None:
+            try:
+                routes = self.__load(config, path)
+            except (OSError, ValueError) as e:
+                error = e
+        with self.__guard:
+            self.__drop(config)
+            # an unreadable file is remembered by its mtime too, so it is not re-read until it changes
+            self.__configs[config] = (mtime, routes)
+            for route in routes:
+                network = route["network"]
+                table = self.__tables[network.version].setdefault(network.prefixlen, {})
+                table.setdefault(self.__key(network), []).append(route)
+            self.__reindex()
+        if error is not None:
+            raise error
+        return True
+
+    def discard(self, config: str) -> None:
+        with self.__guard:
+            self.__drop(config)
+            self.__reindex()
+
+    def __drop(self, config: str) -> None:
+        for route in self.__configs.pop(config, (None, []))[1]:
+            network = route["network"]
+            table = self.__tables[network.version][network.prefixlen]
+            key = self.__key(network)
+            table[key] = [x for x in table[key] if x is not route]
+            if not table[key]:
+                del table[key]
+            if not table:
+                del self.__tables[network.version][network.prefixlen]
+
+    def __reindex(self) -> None:
+        self.__lengths = {family: tuple(sorted(tables, reverse=True)) for family, tables in self.__tables.items()}
+
+    @classmethod
+    def __key(cls, network: ipaddress.IPv4Network | ipaddress.IPv6Network) -> int:
+        return int(network.network_address) >> (network.max_prefixlen - network.prefixlen)
+
+    @classmethod
+    def __address(cls, ip: str) -> tuple[int, int, int]:
+        # inet_pton is several times cheaper than ipaddress.ip_address on the lookup path
+        for family, version, bits in ((socket.AF_INET, 4, 32), (socket.AF_INET6, 6, 128)):
+            try:
+                return version, bits, int.from_bytes(socket.inet_pton(family, ip), "big")
+            except OSError:
+                pass
+        raise ValueError(f"{ip!r} is not a valid IPv4 or IPv6 address")
+
+    def lookup(self, ip: str) -> list[dict]:
+        version, bits, value = self.__address(ip)
+        with self.__guard:
+            tables = self.__tables[version]
+            for length in self.__lengths[version]:
+                if (routes := tables[length].get(value >> (bits - length), None)) is not None:
+                    return list(routes)
+        return []
+
+    def overlaps(self, config: str) -> list[tuple[dict, dict]]:
+        found = []
+        with self.__guard:
+            for route in self.__configs.get(config, (None, []))[1]:
+                network = route["network"]
+                value, bits, length = int(network.network_address), network.max_prefixlen, network.prefixlen
+                for other_length, table in self.__tables[network.version].items():
+                    if other_length <= length:
+                        # an equal or wider prefix holding this one
+                        candidates = table.get(value >> (bits - other_length), [])
+                    else:
+                        # a narrower prefix inside this one
+                        prefix = value >> (bits - length)
+                        candidates = [x for key, routes in table.items() if key >> (other_length - length) == prefix for x in routes]
+                    found += [(route, other) for other in candidates if other["config"] != config]
+        return found
+
+    def __len__(self) -> int:
+        return sum(len(routes) for _, routes in self.__configs.values())
@@ -0,0 +1,70 @@
+import asyncio, os, shlex, time
+import subprocess as sp
+from core.telemetry import (
+    COMMAND_SECONDS, COMMANDS_IN_FLIGHT, COMMAND_FAILURES, COMMAND_TIMEOUTS, command_label,
+)
+
+
+class CommandRunner:
+    def __init__(self, concurrency: int = 32, timeout: float = 30.0) -> None:
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.__semaphore = asyncio.Semaphore(concurrency)
+
+    @classmethod
+    def argv(cls, cmd: str | list[str]) -> list[str]:
+        return shlex.split(cmd) if isinstance(cmd, str) else [str(x) for x in cmd]
+
+    async def run(self, cmd: str | list[str], timeout: float = None, check: bool = True) -> sp.CompletedProcess:
+        argv = self.argv(cmd)
+        label = command_label(argv)
+        timeout = self.timeout if timeout is None else timeout
+        async with self.__semaphore:
+            COMMANDS_IN_FLIGHT.labels().inc()
+            tic = time.perf_counter()
+            try:
+                proc = await asyncio.create_subprocess_exec(
+                    *argv, stdin=sp.DEVNULL, stdout=sp.PIPE, stderr=sp.STDOUT
+                )
+                try:
+                    stdout, _ = await asyncio.wait_for(proc.communicate(), timeout)
+                except asyncio.TimeoutError:
+                    proc.kill()
+                    await proc.wait()
+                    COMMAND_TIMEOUTS.labels(label).inc()
+                    raise sp.TimeoutExpired(argv, timeout)
+            finally:
+                COMMANDS_IN_FLIGHT.labels().dec()
+                COMMAND_SECONDS.labels(label).observe(time.perf_counter() - tic)
+        if proc.returncode != 0:
+            COMMAND_FAILURES.labels(label).inc()
+            if check:
+                raise sp.CalledProcessError(proc.returncode, argv, output=stdout)
+        return sp.CompletedProcess(argv, proc.returncode, stdout)
+
+    async def spawn(self, cmd: str | list[str], env: dict = None) -> asyncio.subprocess.Process:
+        async with self.__semaphore:
+            return await asyncio.create_subprocess_exec(
+                *self.argv(cmd), stdin=sp.DEVNULL, stdout=sp.PIPE, stderr=sp.STDOUT,
+                env=None if env is None else {**os.environ, **env}
+            )
+
+    @classmethod
+    async def aexited(cls, proc: asyncio.subprocess.Process, timeout: float) -> bool:
+        # Process.wait() also waits for the output pipes, which a grandchild that inherited them holds open after
+        # the process itself is gone; the return code is set as soon as the child watcher reaps it
+        deadline = time.monotonic() + timeout
+        while proc.returncode is None:
+            if (remaining := deadline - time.monotonic()) <= 0:
+                return False
+            await asyncio.sleep(min(0.05, remaining))
+        return True
+
+    @classmethod
+    async def areap(cls, proc: asyncio.subprocess.Process, drain: asyncio.Task = None) -> None:
+        # the last step for every spawned process. Closing the transport ends the pipes whoever holds them (and
+        # kills a process still running); one left to the garbage collector is finalised after the loop is gone
+        if drain is not None and proc.returncode is not None:
+            await asyncio.wait([drain], timeout=1)
+        proc._transport.close()
+        await proc.wait()
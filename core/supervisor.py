@@ -0,0 +1,137 @@
+import asyncio, os, random, time
+import subprocess as sp
+from typing import Awaitable, Callable, Hashable
+from utils import LogParent as log, Settings
+from core.telemetry import RESTARTS
+
+
+async def await_exit(proc: sp.Popen | asyncio.subprocess.Process) -> int:
+    # a pidfd on the loop (Linux) so neither kind polls, with a waiting thread only as the portable fallback.
+    # asyncio's Process.wait() is not used: it also waits for the output pipes, which a grandchild that inherited
+    # them holds open after the process itself has died
+    spawned = isinstance(proc, asyncio.subprocess.Process)
+    try:
+        pidfd = os.pidfd_open(proc.pid)
+    except (OSError, AttributeError):
+        return await (proc.wait() if spawned else asyncio.to_thread(proc.wait))
+    loop = asyncio.get_running_loop()
+    exited = loop.create_future()
+    loop.add_reader(pidfd, lambda: exited.done() or exited.set_result(None))
+    try:
+        if (proc.returncode if spawned else proc.poll()) is None:
+            await exited
+        if not spawned:
+            return proc.wait()
+        # the child watcher sets the return code a moment after the exit
+        while proc.returncode is None:
+            await asyncio.sleep(0.01)
+        return proc.returncode
+    finally:
+        loop.remove_reader(pidfd)
+        os.close(pidfd)
+
+
+class Supervisor:
+    def __init__(self, name: str, restart: Callable[[Hashable], Awaitable[None]], on_change: Callable[[Hashable], None] = None,
+                 backoff: float = None, backoff_max: float = None, limit: int = None) -> None:
+        self.name = name
+        self.backoff = Settings.RESTART_BACKOFF if backoff is None else backoff
+        self.backoff_max = Settings.RESTART_BACKOFF_MAX if backoff_max is None else backoff_max
+        self.limit = Settings.RESTART_LIMIT if limit is None else limit
+        self.__restart = restart
+        self.__on_change = on_change or (lambda key: None)
+        # published state, read as-is by the status endpoints
+        self.__states = {}
+        self.__tasks = {}
+        self.__failures = {}
+        self.__since = {}
+        self.__closed = False
+
+    def state(self, key: Hashable) -> dict | None:
+        return self.__states.get(key, None)
+
+    def update(self, key: Hashable, **fields) -> None:
+        if (state := self.__states.get(key, None)) is not None:
+            state.update(fields)
+
+    def __cancel(self, key: Hashable) -> None:
+        task = self.__tasks.pop(key, None)
+        if task is not None and task is not asyncio.current_task():
+            task.cancel()
+
+    def watch(self, key: Hashable, exited: Callable[[], Awaitable[str]] = None) -> None:
+        # called after every successful (re)start; `exited` resolves with a reason once the resource dies
+        if self.__closed:
+            return
+        state = self.__states.setdefault(key, {"state": "running", "since": None, "restarts": 0, "last_failure": None,
+                                               "last_failure_at": None, "next_restart_at": None})
+        state.update(state="running", since=time.time(), next_restart_at=None)
+        self.__since[key] = time.monotonic()
+        self.__cancel(key)
+        if exited is not None:
+            self.__tasks[key] = asyncio.create_task(self.__watch(key, exited))
+        self.__on_change(key)
+
+    async def __watch(self, key: Hashable, exited: Callable[[], Awaitable[str]]) -> None:
+        reason = await exited()
+        self.__tasks.pop(key, None)
+        self.failed(key, reason)
+
+    def forget(self, key: Hashable) -> None:
+        # the resource was stopped on purpose; whatever happens to it next is not a failure
+        self.__cancel(key)
+        self.__states.pop(key, None)
+        self.__failures.pop(key, None)
+        self.__since.pop(key, None)
+
+    def failed(self, key: Hashable, reason: str) -> None:
+        if self.__closed or (state := self.__states.get(key, None)) is None or state["state"] != "running":
+            return
+        # a resource that stayed up longer than the longest backoff starts over from the shortest
+        if time.monotonic() - self.__since.get(key, 0.0) > self.backoff_max:
+            self.__failures[key] = 0
+        failures = self.__failures[key] = self.__failures.get(key, 0) + 1
+        state.update(last_failure=reason, last_failure_at=time.time())
+        if self.limit and failures > self.limit:
+            state.update(state="failed", next_restart_at=None)
+            log.warning(f"{self.name} [ {key} ] failed ({reason}), giving up after {self.limit} restart(s)",
+                        called_name=self.name.lower(), timestamp=True)
+            self.__on_change(key)
+            return
+        # exponential backoff with equal jitter: somewhere in the upper half of the current step
+        delay = min(self.backoff_max, self.backoff * 2 ** (failures - 1))
+        delay = random.uniform(delay / 2, delay)
+        state.update(state="backoff", next_restart_at=time.time() + delay)
+        log.warning(f"{self.name} [ {key} ] failed ({reason}), restarting in {delay:.1f}s",
+                    called_name=self.name.lower(), timestamp=True)
+        self.__cancel(key)
+        self.__tasks[key] = asyncio.create_task(self.__restart_later(key, delay))
+        self.__on_change(key)
+
+    async def __restart_later(self, key: Hashable, delay: float) -> None:
+        await asyncio.sleep(delay)
+        if (state := self.__states.get(key, None)) is None:
+            return
+        state.update(state="restarting", next_restart_at=None)
+        self.__on_change(key)
+        try:
+            await self.__restart(key)
+        except Exception as e:
+            state["state"] = "running"  # let failed() schedule the next attempt
+            self.__since[key] = time.monotonic()
+            self.failed(key, f"restart failed: {' '.join(getattr(e, '__notes__', [])) or e}")
+            return
+        RESTARTS.labels(self.name.lower()).inc()
+        state["restarts"] += 1
+        if state["state"] == "restarting":
+            self.watch(key)
+        if self.__tasks.get(key, None) is asyncio.current_task():
+            del self.__tasks[key]
+
+    async def aclose(self) -> None:
+        self.__closed = True
+        tasks = list(self.__tasks.values())
+        self.__tasks.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,22 @@
+import os
+from utils import Counter, Gauge, Histogram
+
+
+COMMAND_SECONDS = Histogram("delos_command_seconds", "External command latency", ("command",))
+COMMANDS_IN_FLIGHT = Gauge("delos_commands_in_flight", "External commands currently running")
+COMMAND_FAILURES = Counter("delos_command_failures_total", "External commands that exited non-zero", ("command",))
+COMMAND_TIMEOUTS = Counter("delos_command_timeouts_total", "External commands killed after their timeout", ("command",))
+OPERATION_SECONDS = Histogram("delos_operation_seconds", "Manager operation latency", ("manager", "operation"))
+MANAGED_INSTANCES = Gauge("delos_managed_instances", "Instances registered with a manager", ("manager",))
+RESTARTS = Counter("delos_restarts_total", "Failed resources restarted by the supervisor", ("manager",))
+
+
+def command_label(argv: list[str]) -> str:
+    if argv and os.path.basename(argv[0]) == "sudo":
+        argv = argv[1:]
+    if not argv:
+        return ""
+    name = os.path.basename(argv[0])
+    if len(argv) > 1 and "/" not in argv[1] and ":" not in argv[1]:
+        return f"{name} {argv[1]}"
+    return name
@@ -0,0 +1,63 @@
+from array import array
+
+
+class SeriesRing:
+    def __init__(self, capacity: int, columns: int) -> None:
+        self.capacity = capacity
+        self.columns = columns
+        self.__times = array("d", bytes(8 * capacity))
+        self.__values = array("d", bytes(8 * capacity * columns))
+        self.__count = 0
+
+    def __len__(self) -> int:
+        return min(self.__count, self.capacity)
+
+    def append(self, timestamp: float, *values: float) -> None:
+        slot = self.__count % self.capacity
+        self.__times[slot] = timestamp
+        base = slot * self.columns
+        for column, value in enumerate(values):
+            self.__values[base + column] = value
+        self.__count += 1
+
+    def __slot(self, index: int) -> int:
+        # index 0 is the oldest retained sample
+        return (self.__count - len(self) + index) % self.capacity
+
+    def time(self, index: int) -> float:
+        return self.__times[self.__slot(index)]
+
+    def value(self, index: int, column: int) -> float:
+        return self.__values[self.__slot(index) * self.columns + column]
+
+    @property
+    def last_time(self) -> float | None:
+        return self.time(len(self) - 1) if len(self) else None
+
+    def first_index(self, since: float) -> int:
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.time(mid) < since:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def rates(self, since: float, resolution: float, columns: tuple[int, ...]) -> list[list[float]]:
+        # per-second deltas between samples at least `resolution` apart; counter resets restart from zero
+        points, index = [], self.first_index(since)
+        if index >= len(self):
+            return points
+        prev = index
+        for current in range(index + 1, len(self)):
+            dt = self.time(current) - self.time(prev)
+            if dt <= 0 or dt < resolution:
+                continue
+            row = [self.time(current)]
+            for column in columns:
+                delta = self.value(current, column) - self.value(prev, column)
+                row.append((delta if delta >= 0 else self.value(current, column)) / dt)
+            points.append(row)
+            prev = current
+        return points
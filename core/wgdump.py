@@ -0,0 +1,57 @@
+import subprocess as sp
+from core import WireGuardCmds
+from core.runner import CommandRunner
+
+
+class WireGuardDump:
+    def __init__(self, interfaces: dict[str, dict] = None) -> None:
+        self.__interfaces = interfaces or {}
+
+    @classmethod
+    def __optional_int(cls, value: str) -> int | None:
+        return None if value in ("off", "(none)", "") else int(value)
+
+    @classmethod
+    def parse(cls, text: str) -> "WireGuardDump":
+        interfaces = {}
+        for line in text.splitlines():
+            fields = line.split("\t")
+            if len(fields) == 5:
+                name, _, public_key, listen_port, fwmark = fields
+                interfaces[name] = {
+                    "public_key": public_key,
+                    "listen_port": cls.__optional_int(listen_port),
+                    "fwmark": None if fwmark == "off" else fwmark,
+                    "peers": {},
+                }
+            elif len(fields) == 9 and fields[0] in interfaces:
+                name, public_key, _, endpoint, allowed_ips, handshake, rx, tx, keepalive = fields
+                interfaces[name]["peers"][public_key] = {
+                    "endpoint": None if endpoint == "(none)" else endpoint,
+                    "allowed_ips": [] if allowed_ips == "(none)" else allowed_ips.split(","),
+                    "latest_handshake": int(handshake),
+                    "transfer_rx": int(rx),
+                    "transfer_tx": int(tx),
+                    "persistent_keepalive": cls.__optional_int(keepalive),
+                }
+        return cls(interfaces)
+
+    @classmethod
+    async def acapture(cls, runner: CommandRunner) -> "WireGuardDump":
+        try:
+            proc = await runner.run(WireGuardCmds.dump(), check=False)
+        except sp.TimeoutExpired:
+            return cls()
+        if proc.returncode != 0:
+            return cls()
+        return cls.parse(proc.stdout.decode())
+
+    def __contains__(self, interface: str) -> bool:
+        return interface in self.__interfaces
+
+    def __getitem__(self, interface: str) -> dict | None:
+        return self.__interfaces.get(interface, None)
+
+    @property
+    def interfaces(self) -> dict[str, dict]:
+        return self.__interfaces
@@ -1,97 +1,437 @@
+import asyncio, time
 import subprocess as sp
+from pathlib import Path
 from utils import (
     Format,
-    LogParent as log
+    LogParent as log,
+    Settings,
 )
 from core import WireGuardCmds
+from core.cache import StatusCache, StatusVersions
+from core.events import EventBus
+from core.journal import StateJournal
+from core.locks import KeyedLocks, SingleFlight
+from core.managed import Lifecycle, Periodic
+from core.privhelper import PrivHelperClient
+from core.registry import Registry
+from core.routes import RouteIndex
+from core.runner import CommandRunner
+from core.supervisor import Supervisor
+from core.telemetry import OPERATION_SECONDS, MANAGED_INSTANCES
+from core.timeseries import SeriesRing
+from core.wgdump import WireGuardDump
 
 class WireGuardManager:
     class _WireGuardInstance:
-        def __init__(self, config: str) -> None:
+        __slots__ = ("config_name", "__runner", "__helper")
+        __cmds = {"up": WireGuardCmds.start, "down": WireGuardCmds.stop}
+
+        def __init__(self, config: str, runner: CommandRunner, helper: PrivHelperClient = None) -> None:
             self.config_name = config
+            self.__runner = runner
+            self.__helper = helper
+
+        async def __arun(self, op: str, timeout: float = None) -> None:
+            if self.__helper is not None:
+                await self.__helper.acall(op, self.config_name, timeout=timeout)
+            else:
+                await self.__runner.run(self.__cmds[op](self.config_name), timeout=timeout)
 
-        def start(self) -> None:
+        async def astart(self) -> None:
             try:
-                sp.run(
-                    WireGuardCmds.start(self.config_name),
-                    shell=True, stdout=sp.PIPE, stderr=sp.STDOUT, check=True,
-                )
+                await self.__arun("up")
             except sp.CalledProcessError as e:
                 e.add_note(f"Error starting WireGuard [ {self.config_name} ]: {e.stdout.decode().strip()}")
                 raise e
 
-        def stop(self) -> None:
+        async def astop(self, timeout: float = None) -> None:
             try:
-                sp.run(
-                    WireGuardCmds.stop(self.config_name),
-                    shell=True, stdout=sp.PIPE, stderr=sp.STDOUT, check=True,
-                )
+                await self.__arun("down", timeout=timeout)
             except sp.CalledProcessError as e:
                 e.add_note(f"Error stopping WireGuard [ {self.config_name} ]: {e.stdout.decode().strip()}")
                 raise e
 
         @property
-        def status(self) -> str:
-            status_process = sp.run(
-                WireGuardCmds.status(self.config_name),
-                shell=True, stdout=sp.PIPE, stderr=sp.STDOUT
-            )
-            retval = status_process.stdout.decode().strip()
-            if self.config_name not in retval:
-                retval = ""
-            return retval
-
-
-    def __init__(self) -> None:
+        def interface(self) -> str:
+            return Path(self.config_name).stem if self.config_name.endswith(".conf") else self.config_name
+
+        def status(self, snapshot: WireGuardDump) -> dict:
+            if (interface := snapshot[self.interface]) is None:
+                return {"started": False}
+            return {
+                "started": True,
+                "public_key": interface["public_key"],
+                "listen_port": interface["listen_port"],
+                "peers": len(interface["peers"]),
+            }
+
+
+    # SeriesRing columns sampled per peer
+    __RX, __TX, __HANDSHAKE = range(3)
+
+    # registry state after each event that changes it
+    __STATES = {"started": "started", "stopped": "stopped", "failed": "failed"}
+
+    def __init__(self, cache: StatusCache = None, runner: CommandRunner = None, journal: StateJournal = None,
+                 events: EventBus = None) -> None:
         log.info("{}Starting WireGuard Manager{}".format(
             Format.PURPLE, Format.END
         ), called_name="wireguard", timestamp=True)
-        self.__instances = {}
+        self.__instances = Registry("WireGuard")
+        self.__cache = cache or StatusCache(ttl=Settings.STATUS_TTL)
+        self.__runner = runner or CommandRunner(Settings.SUBPROCESS_CONCURRENCY, Settings.COMMAND_TIMEOUT)
+        self.__helper = None
+        if Settings.WG_HELPER_SOCKET is not None:
+            self.__helper = PrivHelperClient(Settings.WG_HELPER_SOCKET, Settings.COMMAND_TIMEOUT)
+        self.__series = {}
+        self.__sampler = Periodic("WireGuard stats sample", "wireguard")
+        self.__checker = Periodic("WireGuard health check", "wireguard")
+        self.__versions = StatusVersions()
+        self.__lifecycle = Lifecycle("wireguard", "WireGuard", self.__instances, self.__versions, self.__STATES,
+                                     self.__supervise, journal, events)
+        self.__routes = RouteIndex()
+        self.__routes_checked = 0.0
+        # per-resource exclusion; identical concurrent requests share one execution
+        self.__locks = KeyedLocks()
+        self.__flights = SingleFlight()
+        self.__supervisor = None
+        MANAGED_INSTANCES.labels("wireguard").set_function(lambda: len(self.__instances))
 
-    def __enter__(self) -> None:
+    async def __aenter__(self) -> None:
+        if Settings.SUPERVISE:
+            self.__supervisor = Supervisor("WireGuard", self.__restart, on_change=self.__supervision_changed)
+            if Settings.WG_CHECK_INTERVAL > 0:
+                # health checks run on their own clock, so turning stats sampling off never turns supervision off
+                self.__checker.start(Settings.WG_CHECK_INTERVAL, self.__acheck)
+            else:
+                log.warning("DELOS_WG_CHECK_INTERVAL is 0: tunnels are supervised but never checked, so none will be restarted",
+                            called_name="wireguard", timestamp=True)
+        if Settings.WG_SAMPLE_INTERVAL > 0:
+            self.start_sampler(Settings.WG_SAMPLE_INTERVAL)
         return self
 
-    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
-        for config in list(self.__instances.keys()):
-            self.remove(config)
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self.ashutdown(time.monotonic() + Settings.SHUTDOWN_DEADLINE)
+
+    async def ashutdown(self, deadline: float) -> dict[str, str]:
+        if self.__lifecycle.closing:
+            return {}
+        await self.astop_sampler()
+        self.__lifecycle.closing = True
+        await self.__checker.astop()
+        if self.__supervisor is not None:
+            await self.__supervisor.aclose()
+        if Settings.DETACH_ON_EXIT or not self.__instances:
+            return {}
+        try:
+            snapshot = await asyncio.wait_for(self.asnapshot(), max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            snapshot = None  # unknown state, bring every interface down
+
+        async def teardown(config: str) -> None:
+            instance = self.__instances[config]
+            if snapshot is None or instance.interface in snapshot:
+                await instance.astop(timeout=max(0.0, deadline - time.monotonic()))
+
+        configs = list(self.__instances.keys())
+        results = await asyncio.gather(*(teardown(config) for config in configs), return_exceptions=True)
+        failed = {}
+        for config, result in zip(configs, results):
+            if isinstance(result, sp.TimeoutExpired):
+                failed[config] = "wg-quick down did not finish before the shutdown deadline"
+            elif isinstance(result, Exception):
+                failed[config] = " ".join(getattr(result, "__notes__", [])) or str(result)
+            else:
+                del self.__instances[config]
+        self.__cache.invalidate(("wg", "dump"))
+        for config, reason in failed.items():
+            log.warning(f"WireGuard [ {config} ] failed to stop: {reason}", called_name="wireguard", timestamp=True)
+        return failed
 
     def __getitem__(self, config: str) -> _WireGuardInstance:
         return self.__instances.get(config, None)
 
-    def __delitem__(self, config: str) -> None:
-        self.remove(config)
+    def add(self, config: str, tags: list[str] = None) -> None:
+        self.__instances.add(config, self._WireGuardInstance(config, self.__runner, self.__helper), "stopped", tags=tags or [])
+        self.__record(config, started=False)
+        self.__index(config)
+        overlaps = self.__overlaps(config)
+        for overlap in overlaps:
+            log.warning(f"WireGuard [ {config} ] routes {overlap['network']} which overlaps {overlap['other_network']} "
+                        f"of [ {overlap['other_config']} ]", called_name="wireguard", timestamp=True)
+        self.__lifecycle.emit("added", config, tags=list(self.__instances.tags(config)), overlaps=overlaps)
 
-    def add(self, config: str) -> None:
-        if config in self.__instances.keys():
-            raise KeyError(f"WireGuard instance for {config} already exists")
-        self.__instances[config] = self._WireGuardInstance(config)
+    def __config_path(self, config: str) -> Path:
+        # the same lookup wg-quick does: a bare interface name lives in the config directory
+        if "/" in config or config.endswith(".conf"):
+            return Path(config)
+        return Path(Settings.WG_CONFIG_DIR) / f"{config}.conf"
 
-    def start(self, config: str) -> None:
+    def __index(self, config: str) -> bool:
         try:
-            self.__instances[config].start()
-        except KeyError as e:
-            e.add_note(f"WireGuard instance for {config} not found")
-            raise e
+            return self.__routes.update(config, self.__config_path(config))
+        except (OSError, ValueError) as e:
+            log.warning(f"Unable to index routes of WireGuard [ {config} ]: {' '.join(getattr(e, '__notes__', [])) or e}",
+                        called_name="wireguard", timestamp=True)
+            return True
 
-    def stop(self, config: str) -> None:
-        try:
-            self.__instances[config].stop()
-        except KeyError as e:
-            e.add_note(f"WireGuard instance for {config} not found")
-            raise e
+    def __overlaps(self, config: str) -> list[dict]:
+        return [{
+            "config": route["config"], "network": str(route["network"]), "peer": route["peer"],
+            "other_config": other["config"], "other_network": str(other["network"]), "other_peer": other["peer"],
+        } for route, other in self.__routes.overlaps(config)]
+
+    def __record(self, config: str, **state) -> None:
+        self.__lifecycle.record(config, {"tags": list(self.__instances.tags(config)), **state} if state else None)
+
+    @OPERATION_SECONDS.timed("wireguard", "start")
+    async def astart(self, config: str) -> None:
+        await self.__flights.ado(config, "start", lambda: self.__astart(config))
+
+    async def __astart(self, config: str) -> None:
+        async with self.__locks.ahold(config):
+            try:
+                instance = self.__instances[config]
+                # re-read under the lock: the operation queued ahead of this one may already have brought it up
+                self.__cache.invalidate(("wg", "dump"))
+                if instance.interface not in await self.asnapshot():
+                    self.__lifecycle.emit("starting", config)
+                    await instance.astart()
+                self.__record(config, started=True)
+                self.__supervise(config)
+                self.__lifecycle.emit("started", config)
+            except KeyError as e:
+                e.add_note(f"WireGuard instance for {config} not found")
+                raise e
+            except sp.CalledProcessError as e:
+                # a retried start whose first attempt went through: the interface is already up
+                self.__cache.invalidate(("wg", "dump"))
+                if instance.interface not in await self.asnapshot():
+                    self.__lifecycle.failed(config, "start", e)
+                    raise e
+                self.__record(config, started=True)
+                self.__supervise(config)
+                self.__lifecycle.emit("started", config)
+            except Exception as e:
+                self.__lifecycle.failed(config, "start", e)
+                raise e
+            finally:
+                self.__cache.invalidate(("wg", "dump"))
+
+    @OPERATION_SECONDS.timed("wireguard", "stop")
+    async def astop(self, config: str) -> None:
+        await self.__flights.ado(config, "stop", lambda: self.__astop(config))
+
+    async def __astop(self, config: str) -> None:
+        async with self.__locks.ahold(config):
+            try:
+                self.__forget(config)
+                instance = self.__instances[config]
+                self.__cache.invalidate(("wg", "dump"))
+                if instance.interface in await self.asnapshot():
+                    self.__lifecycle.emit("stopping", config)
+                    await instance.astop()
+                self.__record(config, started=False)
+                self.__lifecycle.emit("stopped", config)
+            except KeyError as e:
+                e.add_note(f"WireGuard instance for {config} not found")
+                raise e
+            except Exception as e:
+                self.__lifecycle.failed(config, "stop", e)
+                raise e
+            finally:
+                self.__cache.invalidate(("wg", "dump"))
+
+    @OPERATION_SECONDS.timed("wireguard", "remove")
+    async def aremove(self, config: str, snapshot: WireGuardDump = None) -> None:
+        await self.__flights.ado(config, "remove", lambda: self.__aremove(config, snapshot))
+
+    async def __aremove(self, config: str, snapshot: WireGuardDump = None) -> None:
+        async with self.__locks.ahold(config):
+            try:
+                self.__forget(config)
+                snapshot = snapshot or await self.asnapshot()
+                if self.__instances[config].interface in snapshot:
+                    await self.__instances[config].astop()
+                del self.__instances[config]
+                self.__routes.discard(config)
+                self.__versions.discard(config)
+                self.__record(config)
+                self.__lifecycle.emit("removed", config)
+            except KeyError as e:
+                e.add_note(f"WireGuard instance for {config} not found")
+                raise e
+            except Exception as e:
+                self.__lifecycle.failed(config, "remove", e)
+                raise e
+            finally:
+                self.__cache.invalidate(("wg", "dump"))
+
+    def __supervise(self, config: str) -> None:
+        if self.__supervisor is not None:
+            self.__supervisor.watch(config)
+
+    def __forget(self, config: str) -> None:
+        if self.__supervisor is not None:
+            self.__supervisor.forget(config)
+
+    async def __restart(self, config: str) -> None:
+        async with self.__locks.ahold(config):
+            instance = self.__instances[config]
+            try:
+                self.__cache.invalidate(("wg", "dump"))
+                if instance.interface in await self.asnapshot():
+                    await instance.astop()
+                await instance.astart()
+                self.__lifecycle.emit("started", config, restarted=True)
+            finally:
+                self.__cache.invalidate(("wg", "dump"))
 
-    def remove(self, config: str) -> None:
+    def __supervision_changed(self, config: str) -> None:
+        self.__lifecycle.supervision_changed(config, self.__supervisor.state(config))
+
+    def __status(self, config: str, instance: _WireGuardInstance, snapshot: WireGuardDump) -> dict:
+        status = instance.status(snapshot)
+        status["state"] = self.__instances.state(config)
+        if tags := self.__instances.tags(config):
+            status["tags"] = list(tags)
+        if self.__supervisor is not None and (state := self.__supervisor.state(config)) is not None:
+            status["supervisor"] = dict(state)
+        return status
+
+    async def arestore(self) -> dict[str, str]:
+        if (entries := self.__lifecycle.entries()) is None:
+            return {}
+        for config, state in entries.items():
+            if config not in self.__instances:
+                self.__instances.add(config, self._WireGuardInstance(config, self.__runner, self.__helper), "stopped",
+                                     tags=state.get("tags", []))
+                self.__index(config)
+        self.__cache.invalidate(("wg", "dump"))
+        snapshot = await self.asnapshot()
+
+        async def restore(config: str, state: dict) -> str:
+            if not state.get("started", False):
+                return "added"
+            if self.__instances[config].interface in snapshot:
+                return self.__lifecycle.adopt(config, "started")
+            await self.astart(config)
+            return "started"
+
+        return await self.__lifecycle.arestore(entries, restore)
+
+    async def __acapture(self) -> WireGuardDump:
+        if self.__helper is None:
+            return await WireGuardDump.acapture(self.__runner)
         try:
-            if self.__instances[config].status != "":
-                self.__instances[config].stop()
-            del self.__instances[config]
-        except KeyError as e:
-            e.add_note(f"WireGuard instance for {config} not found")
-            raise e
-
-    @property
-    def status(self) -> dict:
-        return {
-            config: {"started": bool(instance.status != "")}
-            for config, instance in self.__instances.items()
-        }
+            return WireGuardDump.parse((await self.__helper.acall("dump")).stdout.decode())
+        except (sp.CalledProcessError, sp.TimeoutExpired):
+            return WireGuardDump()
+
+    async def asnapshot(self) -> WireGuardDump:
+        return (await self.acached_snapshot())[0]
+
+    async def acached_snapshot(self) -> tuple[WireGuardDump, dict]:
+        if not self.__instances:
+            return WireGuardDump(), {"hit": True, "age": 0.0}
+        return await self.__cache.aget(("wg", "dump"), self.__acapture)
+
+    @OPERATION_SECONDS.timed("wireguard", "status")
+    async def acached_status(self, state: str = None, tag: str = None) -> tuple[dict, dict]:
+        return self.__versioned(*await self.acached_snapshot(), state, tag)
+
+    def __versioned(self, snapshot: WireGuardDump, meta: dict, state: str, tag: str) -> tuple[dict, dict]:
+        status = {}
+        for config in self.__instances.select(state, tag):
+            if (instance := self.__instances.get(config, None)) is not None:
+                status[config] = self.__status(config, instance, snapshot)
+        partial = state is not None or tag is not None
+        return status, {**meta, "versions": self.__versions.observe(status, partial=partial)}
+
+    def __refresh_routes(self) -> None:
+        # config files are edited behind our back; re-read the ones whose mtime moved, at most once per TTL
+        if time.monotonic() - self.__routes_checked < Settings.STATUS_TTL:
+            return
+        self.__routes_checked = time.monotonic()
+        for config in list(self.__instances.keys()):
+            self.__index(config)
+
+    def route(self, ip: str) -> dict:
+        self.__refresh_routes()
+        if not (routes := self.__routes.lookup(ip)):
+            raise KeyError(f"No WireGuard config routes {ip}")
+        return {route["config"]: {
+            "network": str(route["network"]), "peer": route["peer"], "endpoint": route["endpoint"],
+            "state": self.__instances.state(route["config"]),
+        } for route in routes}
+
+    def overlaps(self) -> list[dict]:
+        self.__refresh_routes()
+        found, seen = [], set()
+        for config in list(self.__instances.keys()):
+            for overlap in self.__overlaps(config):
+                pair = frozenset(((overlap["config"], overlap["network"]), (overlap["other_config"], overlap["other_network"])))
+                if pair not in seen:
+                    seen.add(pair)
+                    found.append(overlap)
+        return found
+
+    def start_sampler(self, interval: float, capacity: int = None) -> None:
+        capacity = capacity or Settings.WG_SAMPLE_CAPACITY
+        self.__sampler.start(interval, lambda: self.asample(capacity, retention=interval * capacity))
+
+    async def astop_sampler(self) -> None:
+        await self.__sampler.astop()
+
+    async def asample(self, capacity: int, retention: float) -> None:
+        snapshot = await self.asnapshot()
+        now = time.time()
+        for config, instance in self.__instances.items():
+            if (interface := snapshot[instance.interface]) is None:
+                continue
+            for public_key, peer in interface["peers"].items():
+                if (ring := self.__series.get((config, public_key), None)) is None:
+                    ring = self.__series[(config, public_key)] = SeriesRing(capacity, 3)
+                ring.append(now, peer["transfer_rx"], peer["transfer_tx"], peer["latest_handshake"])
+        for key, ring in list(self.__series.items()):
+            if key[0] not in self.__instances or ring.last_time < now - retention:
+                del self.__series[key]
+
+    async def __acheck(self) -> None:
+        requested = time.time()
+        snapshot = await self.asnapshot()
+        self.__check(snapshot, requested, time.time())
+
+    def __check(self, snapshot: WireGuardDump, requested: float, now: float) -> None:
+        for config, instance in self.__instances.items():
+            # tunnels (re)started after the snapshot was asked for are judged on the next one
+            if (state := self.__supervisor.state(config)) is None or state["state"] != "running" or state["since"] > requested:
+                continue
+            if (interface := snapshot[instance.interface]) is None:
+                self.__supervisor.failed(config, "interface is down")
+                continue
+            handshakes = [peer["latest_handshake"] for peer in interface["peers"].values() if peer["latest_handshake"]]
+            age = now - max(handshakes) if handshakes else None
+            self.__supervisor.update(config, handshake_age=age)
+            if Settings.WG_STALE_HANDSHAKE > 0 and age is not None and age > Settings.WG_STALE_HANDSHAKE:
+                self.__supervisor.failed(config, f"no handshake for {age:.0f}s")
+
+    def stats(self, window: float, resolution: float) -> dict:
+        now = time.time()
+        stats = {config: {} for config in self.__instances}
+        for (config, public_key), ring in list(self.__series.items()):
+            if config not in stats:
+                continue
+            points = ring.rates(now - window, resolution, (self.__RX, self.__TX))
+            last = len(ring) - 1
+            handshake = ring.value(last, self.__HANDSHAKE)
+            stats[config][public_key] = {
+                "rx_bytes": int(ring.value(last, self.__RX)),
+                "tx_bytes": int(ring.value(last, self.__TX)),
+                "rx_rate": points[-1][1] if points else None,
+                "tx_rate": points[-1][2] if points else None,
+                "latest_handshake": int(handshake) or None,
+                "handshake_age": now - handshake if handshake else None,
+                "series": points,
+            }
+        return stats
@@ -4,43 +4,17 @@ import sys
 sys.dont_write_bytecode = True
 
 from pathlib import Path
-import datetime, _io, argparse
+import datetime, argparse, os, shutil, tempfile
 
 from utils import (
-    Format, LogParent, Timer,
+    Format, LogParent, Timer, StartupProfile,
     SuppressPrintouts,
     CliArgs,
     # RedirectPrintouts,
 )
 
-from api import app
-import uvicorn
-
 class log(LogParent):
-    @classmethod
-    def _call(cls, *nargs, **kwargs) -> None:
-        local_nargs = kwargs['all_args'].pop('nargs')
-        local_kwargs = {
-            **{'calledname': calledname, 'scriptname': scriptname, 'verbose': args.verbose, 'force': args.force},
-            **{x : y for x, y in kwargs['all_args'].items() if x not in ['__class__', 'cls']},
-        }
-        kwargs['method'](*local_nargs, **local_kwargs)
-
-    @classmethod
-    def info(cls, *nargs, sep: str = " ", end: str = "\n", flush: bool = False, stream: _io._TextIOBase = None) -> None:
-        cls._call(method=super().info, all_args=locals())
-
-    @classmethod
-    def verbose(cls, *nargs, sep: str = " ", end: str = "\n", flush: bool = False, stream: _io._TextIOBase = None) -> None:
-        cls._call(method=super().verbose, all_args=locals())
-
-    @classmethod
-    def warning(cls, *nargs, sep: str = " ", end: str = "\n", flush: bool = False, stream: _io._TextIOBase = None) -> None:
-        cls._call(method=super().warning, all_args=locals())
-
-    @classmethod
-    def fatal(cls, *nargs, sep: str = " ", end: str = "\n", flush: bool = False, stream: _io._TextIOBase = None, err_code: int = 1) -> None:
-        cls._call(method=super().fatal, all_args=locals())
+    pass
 
 
 def arg_defs() -> CliArgs:
@@ -53,14 +27,49 @@ def arg_defs() -> CliArgs:
     opt.add_argument("--foo", action="store_true", help="Foo option")
     opt.add_argument("--bar", action="store_true", help="Bar option")
 
-    # args = cliargs.add_arg_group("Arguments")
+    args = cliargs.add_arg_group("Arguments")
+    args.add_argument("-w", "--workers", type=int, default=1, help="API worker processes; above 1 a coordinator process owns all state")
 
     flgs = cliargs.add_arg_group("Flags")
     flgs.add_argument("-D", "--dev", action="store_true", help="Enable development mode")
 
     return cliargs
 
+def serve_workers(workers: int) -> None:
+    import multiprocessing, uvicorn
+    from api.restapi import coordinate
+    from utils import Settings
+
+    rundir = Path(tempfile.mkdtemp(prefix="delos-"))
+    shmdir = Path("/dev/shm") if Path("/dev/shm").is_dir() else rundir
+    socket_path, snapshot_path = rundir / "coordinator.sock", shmdir / f"delos-{os.getpid()}.snapshot"
+
+    # spawn, not fork: the coordinator must not inherit this process's threads or imported state
+    ctx = multiprocessing.get_context("spawn")
+    ready = ctx.Event()
+    coordinator = ctx.Process(target=coordinate, args=(str(socket_path), str(snapshot_path), ready), name="delos-coordinator")
+    coordinator.start()
+    try:
+        while not ready.wait(0.1):
+            if not coordinator.is_alive():
+                log.fatal(f"Coordinator exited during startup ({coordinator.exitcode})", err_code=1)
+        os.environ["DELOS_COORDINATOR_SOCKET"] = str(socket_path)
+        os.environ["DELOS_SNAPSHOT_PATH"] = str(snapshot_path)
+        uvicorn.run("api:app", workers=workers, host="127.0.0.1", port=8001)
+    finally:
+        coordinator.terminate()
+        coordinator.join(Settings.SHUTDOWN_DEADLINE + 5)
+        shutil.rmtree(rundir, ignore_errors=True)
+
 def main(*nargs, **kwargs) -> None:
+    if args.workers > 1 and not args.dev:
+        return serve_workers(args.workers)
+    # deferred so --help and argument errors never pay for the web stack
+    with StartupProfile.phase("import", "uvicorn"):
+        import uvicorn
+    if not args.dev:
+        with StartupProfile.phase("import", "api"):
+            from api import app
     uvicorn.run(
         "api:app" if args.dev else app,
         reload=True if args.dev else False,
@@ -81,6 +90,7 @@ if __name__ == "__main__":
     scriptdir  = scriptpath.parent
 
     args, nargs, kwargs = arg_defs().parse_args()
+    log.defaults(calledname=calledname, scriptname=scriptname, verbose=args.verbose, force=args.force)
 
     with SuppressPrintouts(args.quiet, args.quiet), Timer(f"{Format.BLUE}Runtime{Format.END}"):
         try: main(*globals().pop("nargs"), **globals().pop("kwargs"))
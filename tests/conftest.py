@@ -0,0 +1,30 @@
+import os, socket, sys
+from pathlib import Path
+
+import pytest
+
+repodir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(repodir))
+
+from utils import Settings
+
+
+@pytest.fixture
+def fakes(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    # the bench stand-ins for rclone, wg and friends, first on PATH; mounts are recorded in a private mountinfo
+    (tmp_path / "mountinfo").touch()
+    monkeypatch.setenv("PATH", f"{repodir / 'bench' / 'fakes'}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("BENCH_STATE", str(tmp_path))
+    monkeypatch.setattr(Settings, "MOUNTINFO", str(tmp_path / "mountinfo"))
+    monkeypatch.setattr(Settings, "RCLONE_STATS_INTERVAL", 0.0)
+    return tmp_path
+
+
+@pytest.fixture
+def rc_addr(monkeypatch: pytest.MonkeyPatch) -> str:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        addr = f"127.0.0.1:{sock.getsockname()[1]}"
+    monkeypatch.setattr(Settings, "RCLONE_RC_URL", None)
+    monkeypatch.setattr(Settings, "RCLONE_RC_ADDR", addr)
+    return addr
@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+
+from core.locks import SingleFlight
+
+
+def test_concurrent_callers_share_one_flight():
+    calls = []
+
+    async def run():
+        flights = SingleFlight()
+        gate = asyncio.Event()
+
+        async def start():
+            calls.append("start")
+            await gate.wait()
+            return len(calls)
+
+        waiters = [asyncio.ensure_future(flights.ado("r1", "start", start)) for _ in range(5)]
+        await asyncio.sleep(0)
+        assert flights.inflight("r1", "start")
+        gate.set()
+        results = await asyncio.gather(*waiters)
+        return results, flights.inflight("r1", "start")
+
+    results, inflight = asyncio.run(run())
+    assert calls == ["start"]
+    assert results == [1] * 5
+    assert not inflight
+
+
+def test_shared_failure_reaches_every_caller():
+    async def run():
+        flights = SingleFlight()
+
+        async def start():
+            await asyncio.sleep(0.01)
+            raise KeyError("r1")
+
+        return await asyncio.gather(*(flights.ado("r1", "start", start) for _ in range(3)), return_exceptions=True)
+
+    assert all(isinstance(e, KeyError) for e in asyncio.run(run()))
+
+
+def test_cancelled_caller_does_not_cancel_the_flight():
+    async def run():
+        flights = SingleFlight()
+        gate = asyncio.Event()
+
+        async def start():
+            await gate.wait()
+            return "mounted"
+
+        impatient = asyncio.ensure_future(flights.ado("r1", "start", start))
+        patient = asyncio.ensure_future(flights.ado("r1", "start", start))
+        await asyncio.sleep(0)
+        impatient.cancel()
+        await asyncio.sleep(0)
+        gate.set()
+        with pytest.raises(asyncio.CancelledError):
+            await impatient
+        return await patient
+
+    assert asyncio.run(run()) == "mounted"
+
+
+def test_late_caller_after_seal_starts_a_new_flight():
+    calls = []
+
+    async def run():
+        flights = SingleFlight()
+        gates = [asyncio.Event(), asyncio.Event()]
+
+        def action(name, gate):
+            async def fly():
+                calls.append(name)
+                await gate.wait()
+                return name
+            return fly
+
+        first = asyncio.ensure_future(flights.ado("r1", "start", action("start", gates[0])))
+        await asyncio.sleep(0)
+        stop = asyncio.ensure_future(flights.ado("r1", "stop", action("stop", gates[1])))
+        await asyncio.sleep(0)
+        # the stop sealed the first start, so this one must not join it
+        late = asyncio.ensure_future(flights.ado("r1", "start", action("restart", gates[1])))
+        await asyncio.sleep(0)
+        gates[0].set()
+        gates[1].set()
+        return await asyncio.gather(first, stop, late)
+
+    assert asyncio.run(run()) == ["start", "stop", "restart"]
+    assert calls == ["start", "stop", "restart"]
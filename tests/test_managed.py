@@ -0,0 +1,58 @@
+import asyncio
+
+from core.cache import StatusVersions
+from core.journal import StateJournal
+from core.managed import Lifecycle, Periodic
+from core.registry import Registry
+from utils import LogParent
+
+
+def test_periodic_outlives_failed_and_hung_rounds(monkeypatch):
+    warnings, rounds = [], []
+    monkeypatch.setattr(LogParent, "warning", lambda message, **kwargs: warnings.append(message))
+
+    async def sample():
+        rounds.append(len(rounds))
+        if len(rounds) == 1:
+            raise OSError("listener not up")
+        if len(rounds) == 2:
+            await asyncio.sleep(60)
+
+    async def run():
+        periodic = Periodic("Test sample", "test")
+        periodic.start(0.01, sample, timeout=0.05)
+        periodic.start(0.01, sample, timeout=0.05)  # already running, ignored
+        while len(rounds) < 4:
+            await asyncio.sleep(0.01)
+        await periodic.astop()
+        return periodic.running
+
+    assert asyncio.run(run()) is False
+    assert warnings[0] == "Test sample failed: listener not up"
+    assert len(warnings) == 2 and warnings[1].startswith("Test sample failed")
+
+
+def test_restore_supervises_adopted_and_reports_failures(tmp_path, monkeypatch):
+    warnings = []
+    monkeypatch.setattr(LogParent, "warning", lambda message, **kwargs: warnings.append(message))
+    monkeypatch.setattr(LogParent, "info", lambda message, **kwargs: None)
+    instances, versions, watched = Registry("Test"), StatusVersions(), []
+    journal = StateJournal(str(tmp_path / "journal.json"))
+    lifecycle = Lifecycle("test", "Test", instances, versions, {"up": "up"}, watched.append, journal)
+    for key in ("a", "b", "c"):
+        instances.add(key, object(), "down")
+        lifecycle.record(key, {"up": key != "c"})
+
+    async def restore(key, state):
+        if key == "b":
+            raise KeyError("b is gone")
+        return lifecycle.adopt(key, "up") if state["up"] else "added"
+
+    report = asyncio.run(lifecycle.arestore(lifecycle.entries(), restore, {"z": "failed"}))
+    assert report == {"z": "failed", "a": "adopted", "b": "failed", "c": "added"}
+    assert watched == ["a"] and instances.state("a") == "up" and versions.generation == 1
+    assert warnings == ["Unable to restore Test [ b ]: 'b is gone'"]
+    # teardown on exit keeps the journal for the next start
+    lifecycle.closing = True
+    lifecycle.record("a")
+    assert "a" in lifecycle.entries()
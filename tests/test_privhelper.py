@@ -0,0 +1,79 @@
+import os, pwd, struct
+from types import SimpleNamespace
+
+import pytest
+
+from core.privhelper import PrivHelper
+
+
+class _Peer:
+    # stands in for an accepted connection; only the SO_PEERCRED lookup is used
+    def __init__(self, uid: int, gid: int) -> None:
+        self.creds = struct.pack("3i", 4242, uid, gid)
+
+    def getsockopt(self, level: int, option: int, size: int) -> bytes:
+        return self.creds
+
+
+@pytest.fixture
+def config_dir(fakes):
+    path = fakes / "wireguard"
+    path.mkdir()
+    (path / "wg0.conf").write_text("[Interface]\n")
+    return path
+
+
+def test_config_names_and_paths(fakes, config_dir):
+    helper = PrivHelper(str(fakes / "helper.sock"), config_dir=str(config_dir))
+    assert helper.config("wg0") == "wg0"
+    assert helper.config(str(config_dir / "wg0.conf")) == str(config_dir / "wg0.conf")
+    assert helper.config(str(config_dir / "sub" / ".." / "wg0.conf")) == str(config_dir / "wg0.conf")
+
+
+@pytest.mark.parametrize("value", [
+    "/etc/passwd",
+    "../wg0.conf",
+    "wg0; reboot",
+    "an-interface-name-too-long",
+    "{dir}/wg0.txt",
+    "{dir}/../escape.conf",
+    "{dir}/link.conf",
+])
+def test_config_rejects_paths_outside_config_dir(fakes, config_dir, value):
+    (fakes / "escape.conf").write_text("[Interface]\nPostUp = id\n")
+    (config_dir / "link.conf").symlink_to(fakes / "escape.conf")
+    helper = PrivHelper(str(fakes / "helper.sock"), config_dir=str(config_dir))
+    with pytest.raises(ValueError):
+        helper.config(value.format(dir=config_dir))
+
+
+def test_allowed_uids(fakes):
+    helper = PrivHelper(str(fakes / "helper.sock"), allow_uids=[12345])
+    assert helper.allowed(_Peer(0, 0))
+    assert helper.allowed(_Peer(12345, 12345))
+    assert not helper.allowed(_Peer(12346, 12345))
+
+
+def test_allowed_group_members(fakes):
+    helper = PrivHelper(str(fakes / "helper.sock"), allow_uids=[12345], group="root")
+    assert helper.allowed(_Peer(12345, 999))
+    # not listed, but root is its primary group
+    assert helper.allowed(_Peer(12346, 0))
+    assert not helper.allowed(_Peer(12346, 999))
+
+
+def test_allowed_supplementary_groups(fakes, monkeypatch):
+    # SO_PEERCRED only carries the primary gid; membership through /etc/group has to count too
+    monkeypatch.setattr(pwd, "getpwuid", lambda uid: SimpleNamespace(pw_name=f"user{uid}"))
+    monkeypatch.setattr(os, "getgrouplist", lambda user, gid: [gid, 0] if user == "user12346" else [gid])
+    helper = PrivHelper(str(fakes / "helper.sock"), group="root")
+    assert helper.allowed(_Peer(12346, 999))
+    assert not helper.allowed(_Peer(12347, 999))
+
+
+def test_several_uids_need_a_group(fakes):
+    with pytest.raises(ValueError):
+        PrivHelper(str(fakes / "helper.sock"), allow_uids=[12345, 12346])
+    with pytest.raises(ValueError):
+        PrivHelper(str(fakes / "helper.sock"), allow_uids=[12345], group="no-such-group-here")
+    PrivHelper(str(fakes / "helper.sock"), allow_uids=[12345, 12346], group="root")
@@ -0,0 +1,28 @@
+import asyncio
+
+from core.rclone import RcloneManager
+
+
+def test_rcd_mount_unmount(fakes, rc_addr):
+    async def run():
+        async with RcloneManager(backend="rcd") as rcm:
+            rcm.add("r1", fakes / "r1")
+            rcm.add("r2", fakes / "r2")
+            await rcm.amount("r1")
+            await rcm.amount("r2")
+            status, _ = await rcm.acached_status()
+            assert status["r1"]["mounted"] and status["r1"]["state"] == "mounted"
+            assert status["r2"]["mounted"]
+
+            await rcm.aunmount("r1")
+            status, _ = await rcm.acached_status()
+            assert not status["r1"]["mounted"] and status["r1"]["state"] == "unmounted"
+            assert status["r2"]["mounted"]
+
+            # a second mount of a mounted remote is a no-op, not a second rc mount
+            assert await rcm.amount("r2") == 0.0
+            await rcm.aremove("r2")
+            status, _ = await rcm.acached_status()
+            assert list(status) == ["r1"]
+
+    asyncio.run(run())
@@ -0,0 +1,79 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api import rclone
+from core.rclone import RcloneManager
+from core.registry import Registry
+
+
+@pytest.fixture
+def registry() -> Registry:
+    registry = Registry("Rclone")
+    registry.add("r1", object(), "unmounted", path="/mnt/r1", tags=["media", "nightly"])
+    registry.add("r2", object(), "unmounted", path="/mnt/r2", tags=["media"])
+    registry.add("r3", object(), "mounted", tags=["nightly", "nightly"])
+    return registry
+
+
+def test_indexes_follow_state_transitions(registry):
+    assert registry.counts() == {"unmounted": 2, "mounted": 1}
+    assert registry.mark("r1", "mounted") is True
+    assert registry.mark("r1", "mounted") is False
+    assert registry.mark("missing", "mounted") is False
+    assert registry.state("r1") == "mounted"
+    assert sorted(registry.select("mounted")) == ["r1", "r3"]
+    assert registry.select("unmounted") == ["r2"]
+    assert sorted(registry.select("mounted", "nightly")) == ["r1", "r3"]
+    assert registry.select("unmounted", "nightly") == []
+    assert registry.mark("r2", "failed") is True
+    # a state nobody is in any more disappears from the counts rather than lingering at zero
+    assert registry.counts() == {"mounted": 2, "failed": 1}
+    assert registry.select("unmounted") == []
+
+
+def test_removal_clears_every_index(registry):
+    del registry["r1"]
+    assert "r1" not in registry and registry.state("r1") is None and registry.tags("r1") == ()
+    assert registry.owner("/mnt/r1") is None
+    assert registry.select(tag="media") == ["r2"]
+    assert registry.select(tag="nightly") == ["r3"]
+    assert registry.counts() == {"unmounted": 1, "mounted": 1}
+    del registry["r3"]
+    assert registry.select(tag="nightly") == []
+    with pytest.raises(KeyError):
+        del registry["r3"]
+
+
+def test_path_changes_move_ownership(registry):
+    assert registry.owner("/mnt/r1/") == "r1" and registry.owner("/mnt/x/../r1") == "r1"
+    assert registry.tags("r3") == ("nightly",)
+    # a new mount path is a remove and re-add; the old path is free again afterwards
+    item = registry["r1"]
+    del registry["r1"]
+    registry.add("r1", item, "unmounted", path="/mnt/elsewhere", tags=["media"])
+    assert registry.owner("/mnt/elsewhere") == "r1" and registry.owner("/mnt/r1") is None
+    registry.add("r4", object(), "unmounted", path="/mnt/r1")
+    assert registry.owner("/mnt/r1") == "r4"
+    assert sorted(registry.select("unmounted", "media")) == ["r1", "r2"]
+
+
+def test_rejected_add_leaves_indexes_alone(registry):
+    with pytest.raises(KeyError, match="already exists"):
+        registry.add("r1", object(), "mounted", path="/mnt/new", tags=["new"])
+    with pytest.raises(KeyError, match="already used by Rclone instance r2"):
+        registry.add("r4", object(), "mounted", path="/mnt/./r2", tags=["new"])
+    assert "r4" not in registry and registry.owner("/mnt/new") is None
+    assert registry.select(tag="new") == [] and registry.counts() == {"unmounted": 2, "mounted": 1}
+
+
+def test_path_collision_is_a_conflict(fakes):
+    app = FastAPI()
+    app.include_router(rclone.router)
+    app.state.rcm = RcloneManager()
+    with TestClient(app) as client:
+        ok = client.post("/add", params={"remote_name": "r1", "mount_path": str(fakes / "shared")})
+        clash = client.post("/add", params={"remote_name": "r2", "mount_path": f"{fakes}/./shared/"})
+    assert ok.status_code == 201
+    assert clash.status_code == 409 and "already used by" in clash.json()["detail"]
+    assert app.state.rcm.remotes == ["r1"]
@@ -0,0 +1,93 @@
+import asyncio, json
+import subprocess as sp
+
+import pytest
+from fastapi import HTTPException, Request
+
+from api.response import batch_result, status_response
+from core.cache import StatusVersions
+
+
+async def _raise(e: Exception) -> dict:
+    raise e
+
+
+@pytest.mark.parametrize("error, status", [
+    (HTTPException(status_code=404, detail="gone"), 404),
+    (sp.CalledProcessError(1, "wg-quick up wg0"), 500),
+    (sp.TimeoutExpired("wg-quick up wg0", 5), 504),
+    (ConnectionError("coordinator closed the connection"), 503),
+    (asyncio.TimeoutError(), 504),
+    (TimeoutError("lock wait"), 504),
+    (KeyError("wg0"), 500),
+    (RuntimeError("boom"), 500),
+])
+def test_batch_item_failures_stay_per_item(error, status):
+    result = asyncio.run(batch_result(_raise(error)))
+    assert result["ok"] is False and result["status"] == status and result["error"]
+
+
+def test_batch_item_success():
+    async def ok() -> dict:
+        return {"action": "start", "message": "started"}
+
+    assert asyncio.run(batch_result(ok())) == {"action": "start", "message": "started"}
+
+
+def _request(etag: str = None) -> Request:
+    headers = [] if etag is None else [(b"if-none-match", etag.encode())]
+    return Request({"type": "http", "method": "GET", "path": "/status", "headers": headers})
+
+
+def _status(status: dict, view: dict, **params) -> tuple[int, str, dict]:
+    response = status_response(_request(params.pop("etag", None)), "status", status, {"versions": view}, **params)
+    return response.status_code, response.headers["ETag"], json.loads(response.body) if response.body else None
+
+
+def test_versions_only_move_on_change():
+    versions = StatusVersions()
+    first = versions.observe({"r1": {"mounted": False}, "r2": {"mounted": False}})
+    assert first["generation"] == 1 and first["instances"] == {"r1": 1, "r2": 1}
+    assert versions.observe({"r1": {"mounted": False}, "r2": {"mounted": False}}) is first
+    second = versions.observe({"r1": {"mounted": True}, "r2": {"mounted": False}})
+    assert second["generation"] == 2 and second["instances"] == {"r1": 2, "r2": 1}
+    # a filtered observation leaves the entries it does not contain alone
+    assert versions.observe({"r2": {"mounted": False}}, partial=True) is second
+    versions.discard("r2")
+    assert versions.generation == 3 and versions.observe({"r1": {"mounted": True}})["removed"] == {"r2": 3}
+
+
+def test_matching_etag_is_not_modified():
+    versions = StatusVersions()
+    status = {"r1": {"mounted": True}}
+    code, etag, content = _status(status, versions.observe(status))
+    assert code == 200 and content["instances"] == status and content["delta"] is False
+    code, again, content = _status(status, versions.observe(status), etag=etag)
+    assert code == 304 and again == etag and content is None
+    status = {"r1": {"mounted": False}}
+    code, changed, _ = _status(status, versions.observe(status), etag=etag)
+    assert code == 200 and changed != etag
+
+
+def test_cursor_from_another_boot_gets_everything():
+    versions = StatusVersions()
+    status = {"r1": {"mounted": True}, "r2": {"mounted": False}}
+    view = versions.observe(status)
+    _, _, content = _status(status, view, since=view["generation"], boot=versions.boot)
+    assert content["delta"] is True and content["instances"] == {} and content["removed"] == []
+    _, _, content = _status(status, view, since=view["generation"], boot="elsewhere")
+    assert content["delta"] is False and content["instances"] == status and "removed" not in content
+
+
+def test_filtered_delta_lists_entries_that_left_the_filter():
+    versions = StatusVersions()
+    versions.observe({"r1": {"state": "mounted"}, "r2": {"state": "mounted"}, "r3": {"state": "mounted"}})
+    since = versions.generation
+    # r2 is unmounted, which a state=mounted view cannot see in its own entries, and r3 is removed
+    versions.touch("r2")
+    versions.discard("r3")
+    status = {"r1": {"state": "mounted"}}
+    view = versions.observe(status, partial=True)
+    _, _, content = _status(status, view, since=since, boot=versions.boot, state="mounted")
+    assert content["delta"] is True and content["instances"] == {}
+    assert sorted(content["removed"]) == ["r2", "r3"]
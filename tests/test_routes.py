@@ -0,0 +1,67 @@
+import pytest
+
+from core.routes import RouteIndex
+
+
+def _config(path, *peers: tuple[str, str]):
+    path.write_text("[Interface]\nPrivateKey = x\n" + "".join(
+        f"\n[Peer]\nPublicKey = {key}\nAllowedIPs = {allowed}  # routed\n" for key, allowed in peers
+    ))
+    return path
+
+
+@pytest.fixture
+def routes(tmp_path) -> RouteIndex:
+    routes = RouteIndex()
+    routes.update("office", _config(tmp_path / "office.conf", ("gw", "10.0.0.0/8, fd00::/16"), ("db", "10.1.2.0/24")))
+    routes.update("home", _config(tmp_path / "home.conf", ("nas", "10.1.2.3/32, 192.168.1.0/24")))
+    routes.update("all", _config(tmp_path / "all.conf", ("exit", "0.0.0.0/0")))
+    return routes
+
+
+@pytest.mark.parametrize("ip, config, peer", [
+    ("10.1.2.3", "home", "nas"),
+    ("10.1.2.4", "office", "db"),
+    ("10.9.9.9", "office", "gw"),
+    ("192.168.1.77", "home", "nas"),
+    ("8.8.8.8", "all", "exit"),
+    ("fd00:1::1", "office", "gw"),
+])
+def test_longest_prefix(routes, ip, config, peer):
+    [route] = routes.lookup(ip)
+    assert (route["config"], route["peer"]) == (config, peer)
+
+
+def test_no_route(routes):
+    assert routes.lookup("fe80::1") == []
+    with pytest.raises(ValueError):
+        routes.lookup("10.0.0.256")
+
+
+def test_overlaps(routes):
+    found = {(a["config"], str(a["network"]), b["config"], str(b["network"])) for a, b in routes.overlaps("home")}
+    assert found == {
+        ("home", "10.1.2.3/32", "office", "10.1.2.0/24"),
+        ("home", "10.1.2.3/32", "office", "10.0.0.0/8"),
+        ("home", "10.1.2.3/32", "all", "0.0.0.0/0"),
+        ("home", "192.168.1.0/24", "all", "0.0.0.0/0"),
+    }
+    # the narrower routes of the other configs are found from the wide one too
+    assert {b["config"] for _, b in routes.overlaps("all")} == {"office", "home"}
+
+
+def test_update_and_discard(routes, tmp_path):
+    # an unchanged file is not re-read
+    assert not routes.update("home", tmp_path / "home.conf")
+    routes.discard("home")
+    [route] = routes.lookup("10.1.2.3")
+    assert route["config"] == "office"
+    assert routes.overlaps("home") == []
+    assert len(routes) == 4
+
+
+def test_invalid_allowed_ips(tmp_path):
+    routes = RouteIndex()
+    with pytest.raises(ValueError):
+        routes.update("bad", _config(tmp_path / "bad.conf", ("x", "10.0.0.0/33")))
+    assert routes.lookup("10.0.0.1") == []
@@ -0,0 +1,34 @@
+import asyncio, os, signal, time
+
+from core.runner import CommandRunner
+from core.supervisor import await_exit
+
+
+def test_exit_is_seen_while_a_grandchild_holds_the_pipes():
+    # the shell exits at once, the sleep it leaves behind keeps stdout open
+    async def run():
+        runner = CommandRunner()
+        proc = await runner.spawn(["sh", "-c", "sleep 30 & echo $!"])
+        grandchild = int(await proc.stdout.readline())
+        drain = asyncio.create_task(proc.stdout.read())
+        tic = time.monotonic()
+        try:
+            assert await asyncio.wait_for(await_exit(proc), 5) == 0
+            assert await CommandRunner.aexited(proc, 1)
+            await CommandRunner.areap(proc, drain)
+            assert proc._transport.is_closing()
+            return time.monotonic() - tic
+        finally:
+            os.kill(grandchild, signal.SIGKILL)
+
+    assert asyncio.run(run()) < 5
+
+
+def test_reap_kills_a_process_still_running():
+    async def run():
+        proc = await CommandRunner().spawn(["sleep", "30"])
+        assert not await CommandRunner.aexited(proc, 0.1)
+        await asyncio.wait_for(CommandRunner.areap(proc), 5)
+        return proc.returncode
+
+    assert asyncio.run(run()) == -9
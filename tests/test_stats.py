@@ -0,0 +1,59 @@
+import asyncio, math, stat
+import subprocess as sp
+
+import pytest
+
+from core.rcd import RcClient
+from core.rclone import RcloneManager
+from utils import Settings
+
+
+def test_rcd_stats_leave_server_wide_counters_empty(fakes, rc_addr):
+    async def run():
+        async with RcloneManager(backend="rcd") as rcm:
+            rcm.add("r1", fakes / "r1")
+            rcm.add("r2", fakes / "r2")
+            rcm.add("idle", fakes / "idle")
+            await rcm.amount("r1")
+            await rcm.amount("r2")
+            for _ in range(2):
+                await rcm.asample(capacity=8, retention=60)
+            return rcm.stats(window=60, resolution=0)
+
+    stats, total = asyncio.run(run())
+    assert stats["idle"] == {}
+    for remote_name in ("r1", "r2"):
+        # rcd reports transfers for the whole server, so they are sampled as NaN and shown as missing
+        assert stats[remote_name]["bytes"] is None and stats[remote_name]["transfers"] is None
+        assert stats[remote_name]["bytes_rate"] is None and stats[remote_name]["series"] == []
+        assert stats[remote_name]["cache_bytes"] == 4096 and stats[remote_name]["open_files"] == 1
+    assert total["bytes"] == 0 and total["bytes_rate"] == 0
+    assert total["cache_bytes"] == 8192 and total["cache_files"] == 2
+    assert total["mounts"] == 3
+    assert not any(isinstance(x, float) and math.isnan(x) for x in total.values())
+
+
+def test_mount_rc_listener_requires_its_own_credentials(fakes, monkeypatch):
+    rc_dir = fakes / "rc"
+    rc_dir.mkdir(mode=0o755)
+    monkeypatch.setattr(Settings, "RCLONE_STATS_INTERVAL", 60.0)
+    monkeypatch.setattr(Settings, "RCLONE_RC_DIR", str(rc_dir))
+
+    async def run():
+        async with RcloneManager() as rcm:
+            assert stat.S_IMODE(rc_dir.stat().st_mode) == 0o700
+            rcm.add("r1", fakes / "r1")
+            await rcm.amount("r1")
+            for _ in range(100):
+                await rcm.asample(capacity=8, retention=60)
+                if (stats := rcm.stats(window=60, resolution=0)[0])["r1"]:
+                    break
+                await asyncio.sleep(0.05)
+            socket, = rc_dir.glob("*.sock")
+            with pytest.raises(sp.CalledProcessError) as e:
+                await RcClient(f"unix://{socket}", timeout=5).acall("core/stats")
+            return stats, e.value.returncode
+
+    stats, status = asyncio.run(run())
+    assert stats["r1"]["cache_bytes"] == 4096 and stats["r1"]["open_files"] == 1
+    assert status == 401
@@ -0,0 +1,64 @@
+import asyncio, os, time
+
+from core.runner import CommandRunner
+from core.wgdump import WireGuardDump
+
+
+DUMP = "\n".join("\t".join(fields) for fields in [
+    ("wg0", "cHJpdmF0ZTA=", "cHVibGljMA==", "51820", "off"),
+    ("wg0", "cGVlckE=", "(none)", "203.0.113.1:51820", "10.0.0.0/16,fd00::/64", "1760000000", "1024", "2048", "25"),
+    ("wg0", "cGVlckI=", "cHNr", "(none)", "(none)", "0", "0", "0", "off"),
+    ("wg1", "cHJpdmF0ZTE=", "cHVibGljMQ==", "0", "0xca6c"),
+    ("wg1", "cGVlckM=", "(none)", "[2001:db8::1]:51821", "192.168.7.0/24", "0", "0", "0", "(none)"),
+])
+
+
+def test_parse_keeps_interfaces_apart():
+    dump = WireGuardDump.parse(DUMP + "\n")
+    assert sorted(dump.interfaces) == ["wg0", "wg1"]
+    assert "wg0" in dump and "wg2" not in dump and dump["wg2"] is None
+    assert dump["wg0"]["public_key"] == "cHVibGljMA==" and dump["wg0"]["listen_port"] == 51820 and dump["wg0"]["fwmark"] is None
+    assert dump["wg1"]["listen_port"] == 0 and dump["wg1"]["fwmark"] == "0xca6c"
+    assert sorted(dump["wg0"]["peers"]) == ["cGVlckE=", "cGVlckI="]
+    assert list(dump["wg1"]["peers"]) == ["cGVlckM="]
+
+
+def test_parse_peers_without_endpoint_or_handshake():
+    peers = WireGuardDump.parse(DUMP)["wg0"]["peers"]
+    assert peers["cGVlckE="] == {
+        "endpoint": "203.0.113.1:51820", "allowed_ips": ["10.0.0.0/16", "fd00::/64"], "latest_handshake": 1760000000,
+        "transfer_rx": 1024, "transfer_tx": 2048, "persistent_keepalive": 25,
+    }
+    # a peer that never completed a handshake reports 0, and (none) for anything it does not have
+    assert peers["cGVlckI="] == {
+        "endpoint": None, "allowed_ips": [], "latest_handshake": 0,
+        "transfer_rx": 0, "transfer_tx": 0, "persistent_keepalive": None,
+    }
+    assert WireGuardDump.parse(DUMP)["wg1"]["peers"]["cGVlckM="]["endpoint"] == "[2001:db8::1]:51821"
+
+
+def test_parse_ignores_peers_of_unknown_interfaces_and_stray_lines():
+    text = "\n".join([
+        "\t".join(("wg9", "cGVlckQ=", "(none)", "(none)", "(none)", "0", "0", "0", "off")),
+        "interface: wg0",
+        "",
+    ])
+    assert WireGuardDump.parse(text).interfaces == {}
+    assert WireGuardDump.parse("").interfaces == {}
+
+
+def test_capture_reads_the_dump(fakes):
+    (fakes / "wg").mkdir()
+    (fakes / "wg" / "wg0").write_text(str(int(time.time())))
+    dump = asyncio.run(WireGuardDump.acapture(CommandRunner()))
+    peer, = dump["wg0"]["peers"].values()
+    assert peer["endpoint"] == "203.0.113.1:51820" and peer["allowed_ips"] == ["10.0.0.0/16"]
+    assert peer["persistent_keepalive"] == 25
+
+
+def test_capture_failure_is_an_empty_dump(fakes, monkeypatch):
+    (bindir := fakes / "bin").mkdir()
+    (bindir / "wg").write_text("#!/bin/sh\necho 'Unable to access interface: Operation not permitted'\nexit 1\n")
+    (bindir / "wg").chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bindir}{os.pathsep}{os.environ['PATH']}")
+    assert asyncio.run(WireGuardDump.acapture(CommandRunner())).interfaces == {}
@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+
+from core.journal import StateJournal
+from core.wireguard import WireGuardManager
+from utils import LogParent, Settings
+
+
+@pytest.fixture
+def wg(fakes, monkeypatch):
+    # the fake wg-quick keeps one file per interface that is up under $BENCH_STATE/wg
+    (fakes / "wg").mkdir()
+    (fakes / "conf").mkdir()
+    monkeypatch.setattr(Settings, "WG_CONFIG_DIR", str(fakes / "conf"))
+    monkeypatch.setattr(Settings, "STATUS_TTL", 0.01)
+    monkeypatch.setattr(Settings, "SUPERVISE", True)
+    monkeypatch.setattr(Settings, "RESTART_BACKOFF", 0.01)
+    monkeypatch.setattr(Settings, "WG_CHECK_INTERVAL", 0.05)
+    monkeypatch.setattr(Settings, "WG_SAMPLE_INTERVAL", 0.0)
+    return fakes / "wg"
+
+
+async def _supervisor(wgm: WireGuardManager, config: str, timeout: float = 5.0) -> dict:
+    # the supervisor state once the tunnel has been restarted at least once
+    deadline = asyncio.get_running_loop().time() + timeout
+    while True:
+        status, _ = await wgm.acached_status()
+        if (state := status[config].get("supervisor", None)) is not None and state["restarts"] > 0:
+            return state
+        assert asyncio.get_running_loop().time() < deadline, f"{config} was not restarted"
+        await asyncio.sleep(0.02)
+
+
+def test_adopted_tunnel_is_supervised(fakes, wg):
+    # a tunnel left up by the previous run
+    journal = StateJournal(fakes / "state.jsonl")
+    journal.put("wireguard", "wg0", {"tags": [], "started": True})
+    (wg / "wg0").write_text("0\n")
+
+    async def run():
+        async with WireGuardManager(journal=journal) as wgm:
+            assert await wgm.arestore() == {"wg0": "adopted"}
+            status, _ = await wgm.acached_status()
+            assert status["wg0"]["supervisor"]["state"] == "running"
+
+            (wg / "wg0").unlink()
+            state = await _supervisor(wgm, "wg0")
+            assert state["state"] == "running" and state["last_failure"] == "interface is down"
+            assert (wg / "wg0").exists()
+
+    asyncio.run(run())
+
+
+def test_unchecked_supervision_is_reported(wg, monkeypatch):
+    warnings = []
+    monkeypatch.setattr(Settings, "WG_CHECK_INTERVAL", 0.0)
+    monkeypatch.setattr(LogParent, "warning", lambda message, **kwargs: warnings.append(message))
+
+    async def run():
+        async with WireGuardManager():
+            pass
+
+    asyncio.run(run())
+    assert any("DELOS_WG_CHECK_INTERVAL is 0" in x for x in warnings)
@@ -1,3 +1,6 @@
+from .startup import (
+    StartupProfile,
+)
 from .logging import (
     LogParent,
     Format,
@@ -11,3 +14,15 @@ from .context import (
 from .arghelper import (
     CliArgs,
 )
+from .config import (
+    Settings,
+)
+from .ringbuffer import (
+    ByteRing,
+)
+from .metrics import (
+    Counter,
+    Gauge,
+    Histogram,
+    MetricsRegistry,
+)
@@ -1,5 +1,5 @@
 import sys
-import argparse, regex, shutil
+import argparse, shutil
 from .logging import Format
 
 
@@ -30,6 +30,7 @@ class CliArgs:
             return help
 
         def _format_usage(self, *args, **kwargs) -> str:
+            import regex  # only needed when usage is actually printed
             text = super()._format_usage(*args, **kwargs)
             extra_args_string = '[-- <nargs: str ...> <kwargs: str=str ...>]'
             text = text.strip() + f' {extra_args_string}\n\n'
@@ -0,0 +1,55 @@
+import os
+
+
+def _env(name: str, cast: type, default):
+    value = os.environ.get(name, None)
+    if value is None or value == "":
+        return default
+    if cast is bool:
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    return cast(value)
+
+
+class Settings:
+    PLUGINS = _env("DELOS_PLUGINS", str, "wireguard,rclone")
+    STATUS_TTL = _env("DELOS_STATUS_TTL", float, 1.0)
+    SUBPROCESS_CONCURRENCY = _env("DELOS_SUBPROCESS_CONCURRENCY", int, 32)
+    COMMAND_TIMEOUT = _env("DELOS_COMMAND_TIMEOUT", float, 30.0)
+    MOUNT_TIMEOUT = _env("DELOS_MOUNT_TIMEOUT", float, 15.0)
+    MOUNTINFO = _env("DELOS_MOUNTINFO", str, "/proc/self/mountinfo")
+    MOUNT_POLL_INTERVAL = _env("DELOS_MOUNT_POLL_INTERVAL", float, 0.25)
+    LOG_LEVEL = _env("DELOS_LOG_LEVEL", str, "info")
+    LOG_FORMAT = _env("DELOS_LOG_FORMAT", str, "text")
+    LOG_ASYNC = _env("DELOS_LOG_ASYNC", bool, True)
+    LOG_BUFFER_SIZE = _env("DELOS_LOG_BUFFER_SIZE", int, 256 * 1024)
+    SSE_KEEPALIVE = _env("DELOS_SSE_KEEPALIVE", float, 15.0)
+    EVENT_HISTORY = _env("DELOS_EVENT_HISTORY", int, 1024)
+    BATCH_PARALLELISM = _env("DELOS_BATCH_PARALLELISM", int, 8)
+    RCLONE_BACKEND = _env("DELOS_RCLONE_BACKEND", str, "process")
+    RCLONE_RC_ADDR = _env("DELOS_RCLONE_RC_ADDR", str, "127.0.0.1:5572")
+    RCLONE_RC_URL = _env("DELOS_RCLONE_RC_URL", str, None)
+    RCLONE_RC_USER = _env("DELOS_RCLONE_RC_USER", str, None)
+    RCLONE_RC_PASS = _env("DELOS_RCLONE_RC_PASS", str, None)
+    WG_SAMPLE_INTERVAL = _env("DELOS_WG_SAMPLE_INTERVAL", float, 5.0)
+    WG_SAMPLE_CAPACITY = _env("DELOS_WG_SAMPLE_CAPACITY", int, 720)
+    RCLONE_PROFILES = _env("DELOS_RCLONE_PROFILES", str, None)
+    RCLONE_STATS_INTERVAL = _env("DELOS_RCLONE_STATS_INTERVAL", float, 10.0)
+    RCLONE_STATS_CAPACITY = _env("DELOS_RCLONE_STATS_CAPACITY", int, 360)
+    RCLONE_RC_DIR = _env("DELOS_RCLONE_RC_DIR", str, None)
+    PREWARM_PARALLELISM = _env("DELOS_PREWARM_PARALLELISM", int, 8)
+    PREWARM_BUDGET = _env("DELOS_PREWARM_BUDGET", int, 1024 ** 3)
+    STATE_PATH = _env("DELOS_STATE_PATH", str, None)
+    DETACH_ON_EXIT = _env("DELOS_DETACH_ON_EXIT", bool, False)
+    SHUTDOWN_DEADLINE = _env("DELOS_SHUTDOWN_DEADLINE", float, 20.0)
+    COORDINATOR_SOCKET = _env("DELOS_COORDINATOR_SOCKET", str, None)
+    SNAPSHOT_PATH = _env("DELOS_SNAPSHOT_PATH", str, None)
+    SNAPSHOT_INTERVAL = _env("DELOS_SNAPSHOT_INTERVAL", float, 0.5)
+    SNAPSHOT_SIZE = _env("DELOS_SNAPSHOT_SIZE", int, 4 * 1024 * 1024)
+    SUPERVISE = _env("DELOS_SUPERVISE", bool, True)
+    RESTART_BACKOFF = _env("DELOS_RESTART_BACKOFF", float, 1.0)
+    RESTART_BACKOFF_MAX = _env("DELOS_RESTART_BACKOFF_MAX", float, 300.0)
+    RESTART_LIMIT = _env("DELOS_RESTART_LIMIT", int, 0)
+    WG_STALE_HANDSHAKE = _env("DELOS_WG_STALE_HANDSHAKE", float, 0.0)
+    WG_CHECK_INTERVAL = _env("DELOS_WG_CHECK_INTERVAL", float, 5.0)
+    WG_CONFIG_DIR = _env("DELOS_WG_CONFIG_DIR", str, "/etc/wireguard")
+    WG_HELPER_SOCKET = _env("DELOS_WG_HELPER_SOCKET", str, None)
@@ -68,6 +68,7 @@ class RedirectPrintouts:
         if self.stderr is not None: sys.stderr = self.stderr
 
     def __exit__(self, type, value, traceback) -> None:
+        LogParent.flush()
         sys.stdout = self.stdout_prev
         sys.stderr = self.stderr_prev
 
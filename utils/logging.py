@@ -1,5 +1,6 @@
 import sys, _io
-import regex, shutil, datetime
+import atexit, json, queue, shutil, threading, time
+from .config import Settings
 
 
 class Format:
@@ -17,68 +18,210 @@ class Format:
 
     ff_cyan = [ CYAN, DARK_CYAN ]; ff_green = [ GREEN, DARK_GREEN ]; ff_red =   [ RED, DARK_RED ]
 
+    @staticmethod
+    def strip(text: str) -> str:
+        if "\033" not in text:
+            return text
+        out, i = [], 0
+        while (j := text.find("\033", i)) != -1:
+            out.append(text[i:j])
+            i = j + 1
+            if text.startswith("[", i):
+                while i < len(text) and not text[i].isalpha():
+                    i += 1
+            i += 1
+        out.append(text[i:])
+        return "".join(out)
+
+
+class _LogWriter:
+    def __init__(self) -> None:
+        self.__queue = queue.Queue()
+        self.__lock = threading.Lock()
+        self.__thread = None
+
+    def __write(self, stream: _io._TextIOBase, text: str) -> None:
+        try:
+            stream.write(text)
+        except (ValueError, OSError):
+            pass  # stream was closed or redirected away while the line was queued
+
+    def __flush(self, streams: set) -> None:
+        for stream in streams:
+            try:
+                stream.flush()
+            except (ValueError, OSError):
+                pass
+
+    def __run(self) -> None:
+        dirty = set()
+        while True:
+            try:
+                item = self.__queue.get(block=not dirty)
+            except queue.Empty:
+                # queue drained, flush once for the whole burst instead of per line
+                self.__flush(dirty)
+                dirty.clear()
+                continue
+            stream, text, flush = item
+            if text is not None:
+                self.__write(stream, text)
+                dirty.add(stream)
+            if flush or text is None:
+                self.__flush(dirty)
+                dirty.clear()
+            self.__queue.task_done()
+
+    def __start(self) -> None:
+        with self.__lock:
+            if self.__thread is None or not self.__thread.is_alive():
+                self.__thread = threading.Thread(target=self.__run, name="delos-log", daemon=True)
+                self.__thread.start()
+
+    def put(self, stream: _io._TextIOBase, text: str, flush: bool = False) -> None:
+        if self.__thread is None or not self.__thread.is_alive():
+            self.__start()
+        self.__queue.put((stream, text, flush))
+
+    def drain(self) -> None:
+        if self.__thread is None or not self.__thread.is_alive():
+            return
+        self.__queue.put((None, None, True))
+        self.__queue.join()
+
 
 class LogParent:
+    VERBOSE, INFO, WARNING, FATAL = 10, 20, 30, 40
+    __levels = {"verbose": VERBOSE, "info": INFO, "warning": WARNING, "fatal": FATAL}
+    __prefixes = {
+        VERBOSE: f"{Format.PURPLE}-V-{Format.END}",
+        INFO: f"{Format.GREEN}-I-{Format.END}",
+        WARNING: f"{Format.YELLOW}-W-{Format.END}",
+        FATAL: f"{Format.RED}-F-{Format.END}",
+    }
+    __names = {value: name for name, value in __levels.items()}
+
+    __level = __levels.get(Settings.LOG_LEVEL.lower(), INFO)
+    __json = Settings.LOG_FORMAT.lower() == "json"
+    __writer = _LogWriter() if Settings.LOG_ASYNC else None
+    __columns = None
+    __second, __stamp = None, ""
+    _defaults = {}
+
     @classmethod
-    def __print_newlines(cls, msg: str, stream: _io._TextIOBase) -> str:
-        if (n := regex.findall(r"^\n+", msg)):
-            print(n[0], end="", file=stream)
-        return regex.sub(r"^\n+", "", msg)
+    def configure(cls, level: str = None, format: str = None, asynchronous: bool = None) -> None:
+        if level is not None:
+            if level.lower() not in LogParent.__levels:
+                raise ValueError(f"unknown log level {level!r}, expected one of {', '.join(LogParent.__levels)}")
+            LogParent.__level = LogParent.__levels[level.lower()]
+        if format is not None:
+            if format.lower() not in ("text", "json"):
+                raise ValueError(f"unknown log format {format!r}, expected text or json")
+            LogParent.__json = format.lower() == "json"
+        if asynchronous is not None:
+            LogParent.flush()
+            LogParent.__writer = _LogWriter() if asynchronous else None
 
     @classmethod
-    def __print_returns(cls, msg: str, stream: _io._TextIOBase) -> str:
-        if (r := regex.findall(r"^\r+", msg)):
-            w = shutil.get_terminal_size().columns - 2
-            print(r[0].ljust(w, " "), end="\r", file=stream)
-        return regex.sub(r"^\r+", "", msg)
+    def defaults(cls, **kwargs) -> None:
+        cls._defaults = {**cls._defaults, **kwargs}
 
     @classmethod
-    def _base(cls, *nargs, **kwargs) -> None:
-        flush = kwargs.get("flush", False)
-        stream = kwargs.get("stream", sys.stdout)
+    def enabled(cls, level: int) -> bool:
+        return level >= LogParent.__level
+
+    @classmethod
+    def flush(cls) -> None:
+        if LogParent.__writer is not None:
+            LogParent.__writer.drain()
+
+    @classmethod
+    def __timestamp(cls) -> str:
+        # strftime once per second; every other line in the same second reuses the string
+        now = int(time.time())
+        if now != LogParent.__second:
+            LogParent.__second = now
+            LogParent.__stamp = time.strftime("%m%d%y-%H%M%S", time.localtime(now)) + " | "
+        return LogParent.__stamp
+
+    @classmethod
+    def __width(cls) -> int:
+        if LogParent.__columns is None:
+            LogParent.__columns = shutil.get_terminal_size().columns - 2
+        return LogParent.__columns
+
+    @classmethod
+    def __emit(cls, stream: _io._TextIOBase, text: str, flush: bool, sync: bool = False) -> None:
+        if sync or LogParent.__writer is None:
+            stream.write(text)
+            if flush: stream.flush()
+        else:
+            LogParent.__writer.put(stream, text, flush)
+
+    @classmethod
+    def __text(cls, msg: str, pre: str, sname: str, kwargs: dict) -> str:
+        head = ""
+        if msg.startswith("\n"):
+            body = msg.lstrip("\n")
+            head, msg = msg[:len(msg) - len(body)], body
+        if msg.startswith("\r"):
+            body = msg.lstrip("\r")
+            head, msg = head + msg[:len(msg) - len(body)].ljust(cls.__width(), " ") + "\r", body
         end = kwargs.get("end", "\n")
-        pre = kwargs.get("pre", "")
-        sname = kwargs.get("called_name", kwargs.get("scriptname", "_anon_"))
-        tstamp = f'{datetime.datetime.now().strftime("%m%d%y-%H%M%S")} | ' if kwargs.get("timestamp", False) else ""
+        if kwargs.get("plain", False):
+            return head + end
+        tstamp = cls.__timestamp() if kwargs.get("timestamp", False) else ""
+        return f"{head}{pre} {Format.DARK_GRAY}[ {tstamp}{sname} ]{Format.END} {msg}{end}"
 
-        msg = kwargs.get("sep", " ").join([str(x) for x in nargs])
-        msg = cls.__print_newlines(msg, stream=stream)
-        msg = cls.__print_returns(msg, stream=stream)
-        msg = f"{pre} {Format.DARK_GRAY}[ {tstamp}{sname} ]{Format.END} {msg}"
+    @classmethod
+    def __record(cls, msg: str, level: int, sname: str, kwargs: dict) -> str:
+        if kwargs.get("plain", False):
+            return ""
+        msg = Format.strip(msg.lstrip("\n\r"))
+        record = {"ts": round(time.time(), 6), "level": LogParent.__names.get(level, "info"), "name": sname, "msg": msg}
+        return json.dumps(record, ensure_ascii=False) + "\n"
 
-        print("" if kwargs.get("plain", False) else msg, flush=flush, end=end, file=stream)
+    @classmethod
+    def _base(cls, *nargs, **kwargs) -> None:
+        if cls._defaults:
+            kwargs = {**cls._defaults, **kwargs}
+        level = kwargs.get("level", LogParent.INFO)
+        stream = kwargs.get("stream") or sys.stdout
+        sname = kwargs.get("called_name", kwargs.get("scriptname", "_anon_"))
+        msg = nargs[0] if len(nargs) == 1 and type(nargs[0]) is str else kwargs.get("sep", " ").join([str(x) for x in nargs])
+        if LogParent.__json:
+            text = cls.__record(msg, level, sname, kwargs)
+        else:
+            text = cls.__text(msg, kwargs.get("pre", LogParent.__prefixes.get(level, "")), sname, kwargs)
+        if text:
+            cls.__emit(stream, text, kwargs.get("flush", False), kwargs.get("sync", False))
 
     @classmethod
     def info(cls, *nargs, **kwargs) -> None:
-        kwargs = {
-            **{"pre": f"{Format.GREEN}-I-{Format.END}", "stream": kwargs.get("stream") or sys.stdout},
-            **kwargs,
-        }
-        cls._base(*nargs, **kwargs)
+        if LogParent.INFO < LogParent.__level: return
+        cls._base(*nargs, level=LogParent.INFO, **kwargs)
 
     @classmethod
     def verbose(cls, *nargs, **kwargs) -> None:
-        if kwargs.pop("verbose"):
-            kwargs = {
-                **{"pre": f"{Format.PURPLE}-V-{Format.END}", "stream": kwargs.get("stream") or sys.stdout},
-                **kwargs,
-            }
-            cls._base(*nargs, **kwargs)
+        verbose = kwargs.pop("verbose", cls._defaults.get("verbose", False))
+        if not verbose and LogParent.VERBOSE < LogParent.__level: return
+        cls._base(*nargs, level=LogParent.VERBOSE, **kwargs)
 
     @classmethod
     def warning(cls, *nargs, **kwargs) -> None:
-        kwargs = {
-            **{"pre": f"{Format.YELLOW}-W-{Format.END}", "stream": kwargs.get("stream") or sys.stderr},
-            **kwargs,
-        }
-        cls._base(*nargs, **kwargs)
+        if LogParent.WARNING < LogParent.__level: return
+        kwargs.setdefault("stream", sys.stderr)
+        cls._base(*nargs, level=LogParent.WARNING, **kwargs)
 
     @classmethod
     def fatal(cls, *nargs, **kwargs) -> None:
-        if kwargs.get("force"): cls.warning(*nargs, **kwargs); return
-        kwargs = {
-            **{"pre": f"{Format.RED}-F-{Format.END}", "stream": kwargs.get("stream") or sys.stderr},
-            **kwargs,
-        }
-        cls._base(*nargs, **kwargs)
-        exit(kwargs["err_code"])
+        if kwargs.get("force", cls._defaults.get("force", False)): cls.warning(*nargs, **kwargs); return
+        # everything queued so far goes out first, then the fatal line is written inline so it is
+        # never lost to the exit below
+        LogParent.flush()
+        kwargs.setdefault("stream", sys.stderr)
+        cls._base(*nargs, level=LogParent.FATAL, sync=True, flush=True, **{k: v for k, v in kwargs.items() if k != "flush"})
+        exit(kwargs.get("err_code", 1))
+
+
+atexit.register(LogParent.flush)
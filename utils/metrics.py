@@ -0,0 +1,157 @@
+import asyncio, functools, time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()) -> None:
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self._children = {}
+        MetricsRegistry.register(self)
+
+    def labels(self, *values: str):
+        if (child := self._children.get(values, None)) is None:
+            child = self._children[values] = self._new_child()
+        return child
+
+    @classmethod
+    def _escape(cls, value: str) -> str:
+        return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+    def _label_str(self, values: tuple, extra: str = "") -> str:
+        pairs = [f'{k}="{self._escape(v)}"' for k, v in zip(self.label_names, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in list(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    class _Child:
+        __slots__ = ("value",)
+
+        def __init__(self) -> None:
+            self.value = 0.0
+
+        def inc(self, amount: float = 1.0) -> None:
+            self.value += amount
+
+    def _new_child(self) -> _Child:
+        return self._Child()
+
+    def _render_child(self, values: tuple, child: _Child) -> list[str]:
+        return [f"{self.name}{self._label_str(values)} {child.value}"]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    class _Child:
+        __slots__ = ("value", "function")
+
+        def __init__(self) -> None:
+            self.value, self.function = 0.0, None
+
+        def set(self, value: float) -> None:
+            self.value = value
+
+        def inc(self, amount: float = 1.0) -> None:
+            self.value += amount
+
+        def dec(self, amount: float = 1.0) -> None:
+            self.value -= amount
+
+        def set_function(self, function: Callable[[], float]) -> None:
+            self.function = function
+
+    def _new_child(self) -> _Child:
+        return self._Child()
+
+    def _render_child(self, values: tuple, child: _Child) -> list[str]:
+        value = child.function() if child.function is not None else child.value
+        return [f"{self.name}{self._label_str(values)} {value}"]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+    DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+    class _Child:
+        __slots__ = ("buckets", "counts", "sum")
+
+        def __init__(self, buckets: tuple[float, ...]) -> None:
+            self.buckets = buckets
+            self.counts = [0] * (len(buckets) + 1)
+            self.sum = 0.0
+
+        def observe(self, value: float) -> None:
+            self.counts[bisect_left(self.buckets, value)] += 1
+            self.sum += value
+
+        @contextmanager
+        def time(self):
+            tic = time.perf_counter()
+            try:
+                yield
+            finally:
+                self.observe(time.perf_counter() - tic)
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), buckets: tuple[float, ...] = None) -> None:
+        self.buckets = tuple(sorted(buckets or self.DEFAULT_BUCKETS))
+        super().__init__(name, help, labels)
+
+    def _new_child(self) -> _Child:
+        return self._Child(self.buckets)
+
+    def timed(self, *values: str) -> Callable:
+        child = self.labels(*values)
+
+        def decorator(function: Callable) -> Callable:
+            if asyncio.iscoroutinefunction(function):
+                @functools.wraps(function)
+                async def awrapper(*nargs, **kwargs):
+                    with child.time():
+                        return await function(*nargs, **kwargs)
+                return awrapper
+
+            @functools.wraps(function)
+            def wrapper(*nargs, **kwargs):
+                with child.time():
+                    return function(*nargs, **kwargs)
+            return wrapper
+        return decorator
+
+    def _render_child(self, values: tuple, child: _Child) -> list[str]:
+        lines, total = [], 0
+        for bound, count in zip((*self.buckets, "+Inf"), child.counts):
+            total += count
+            le = 'le="' + str(bound) + '"'
+            lines.append(f"{self.name}_bucket{self._label_str(values, le)} {total}")
+        lines.append(f"{self.name}_sum{self._label_str(values)} {child.sum}")
+        lines.append(f"{self.name}_count{self._label_str(values)} {total}")
+        return lines
+
+
+class MetricsRegistry:
+    __metrics = {}
+
+    @classmethod
+    def register(cls, metric: _Metric) -> None:
+        cls.__metrics[metric.name] = metric
+
+    @classmethod
+    def render(cls) -> str:
+        lines = []
+        for metric in list(cls.__metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
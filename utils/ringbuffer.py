@@ -0,0 +1,72 @@
+import asyncio, threading
+
+
+class ByteRing:
+    def __init__(self, capacity: int = 256 * 1024) -> None:
+        self.capacity = capacity
+        self.__buffer = bytearray(capacity)
+        self.__view = memoryview(self.__buffer)
+        self.__written = 0
+        self.__lock = threading.Lock()
+        self.__waiters = []
+
+    @property
+    def offset(self) -> int:
+        return self.__written
+
+    def write(self, data: bytes | memoryview) -> None:
+        data = memoryview(data)
+        size = len(data)
+        with self.__lock:
+            if size > self.capacity:
+                self.__written += size - self.capacity
+                data, size = data[-self.capacity:], self.capacity
+            pos = self.__written % self.capacity
+            first = min(size, self.capacity - pos)
+            self.__view[pos:pos + first] = data[:first]
+            self.__view[:size - first] = data[first:]
+            self.__written += size
+            waiters, self.__waiters = self.__waiters, []
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(lambda f=future: f.done() or f.set_result(None))
+
+    def read(self, since: int = 0) -> tuple[bytes, int]:
+        with self.__lock:
+            end = self.__written
+            start = min(max(since, end - self.capacity, 0), end)
+            a, b = start % self.capacity, end % self.capacity
+            if start == end:
+                return b"", end
+            if a < b:
+                return bytes(self.__view[a:b]), end
+            return bytes(self.__view[a:]) + bytes(self.__view[:b]), end
+
+    def tail(self, lines: int) -> tuple[bytes, int]:
+        data, end = self.read(0)
+        cut = len(data)
+        if data.endswith(b"\n"):
+            cut -= 1
+        for _ in range(lines):
+            if (cut := data.rfind(b"\n", 0, cut)) < 0:
+                return data, end
+        return data[cut + 1:], end
+
+    async def wait(self, since: int, timeout: float) -> bool:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self.__lock:
+            if self.__written > since:
+                return True
+            self.__waiters.append((loop, future))
+        try:
+            await asyncio.wait_for(future, timeout)
+            return True
+        except asyncio.TimeoutError:
+            with self.__lock:
+                if (loop, future) in self.__waiters:
+                    self.__waiters.remove((loop, future))
+            return self.__written > since
+
+    async def adrain(self, stream: asyncio.StreamReader, chunk: int = 64 * 1024) -> None:
+        while (data := await stream.read(chunk)):
+            self.write(data)
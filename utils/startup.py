@@ -0,0 +1,34 @@
+import time
+from contextlib import contextmanager
+
+
+class StartupProfile:
+    __origin = time.perf_counter()
+    __phases = []
+    __ready = None
+
+    @classmethod
+    @contextmanager
+    def phase(cls, kind: str, name: str):
+        tic = time.perf_counter()
+        try:
+            yield
+        finally:
+            StartupProfile.__phases.append((kind, name, time.perf_counter() - tic))
+
+    @classmethod
+    def ready(cls) -> None:
+        if StartupProfile.__ready is None:
+            StartupProfile.__ready = time.perf_counter() - StartupProfile.__origin
+
+    @classmethod
+    def report(cls) -> dict:
+        totals = {}
+        for kind, _, seconds in StartupProfile.__phases:
+            totals[kind] = totals.get(kind, 0.0) + seconds
+        return {
+            # measured from the first import of utils, which is as close to interpreter start as we get
+            "ready": StartupProfile.__ready,
+            "totals": totals,
+            "phases": [{"kind": kind, "name": name, "seconds": seconds} for kind, name, seconds in StartupProfile.__phases],
+        }
@@ -0,0 +1,39 @@
+#!/usr/bin/python
+
+import sys
+sys.dont_write_bytecode = True
+
+import signal
+
+from utils import (
+    Format, LogParent as log,
+    CliArgs,
+)
+from core.privhelper import PrivHelper
+
+
+def arg_defs() -> CliArgs:
+    cliargs = CliArgs(args_width = 50, total_width = 150)
+    cliargs.description = f"{Format.BOLD}{Format.DARK_GREEN}Delos Privileged WireGuard Helper{Format.END}"
+    cliargs.epilog = f"Run as root, then point the service at the socket with DELOS_WG_HELPER_SOCKET."
+
+    args = cliargs.add_arg_group("Arguments")
+    args.add_argument("-s", "--socket", type=str, required=True, help="Unix socket to listen on")
+    args.add_argument("-u", "--allow-uid", type=int, action="append", default=[], help="Non-root uid allowed to connect (repeatable)")
+    args.add_argument("-g", "--group", type=str, default=None, help="Group given access to the socket (mode 0660)")
+    args.add_argument("-c", "--config-dir", type=str, default="/etc/wireguard", help="Directory config file paths must live in")
+    args.add_argument("-t", "--timeout", type=float, default=30.0, help="Maximum seconds per command")
+
+    return cliargs
+
+if __name__ == "__main__":
+    args, nargs, kwargs = arg_defs().parse_args()
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        helper = PrivHelper(args.socket, args.allow_uid, args.group, args.config_dir, args.timeout)
+        log.info(f"{Format.PURPLE}WireGuard helper listening on [ {args.socket} ]{Format.END}", called_name="wghelper", timestamp=True)
+        helper.serve_forever()
+    except (FileNotFoundError, ValueError) as e:
+        log.fatal(str(e), called_name="wghelper", err_code=1)
+    except KeyboardInterrupt:
+        pass